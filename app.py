@@ -1,13 +1,105 @@
 #!/usr/bin/env python3
+import functools
+import json
+import multiprocessing
 import os
+import queue
 import shutil
 import sys
+import threading
 import time
 from PySide6 import QtWidgets, QtCore, QtGui
 import core
+import organize
+import watcher
+
+# Quiet time after the last keystroke before a typed path is looked up.
+_PROBE_DELAY_MS = 250
+
+# How often progress held by the workers is shown, about 20 updates a second.
+_PROGRESS_INTERVAL_MS = 50
+
+
+class BackgroundProbe(QtCore.QObject):
+    """ Runs filesystem lookups off the GUI thread and hands the latest result for each key back to it.
+
+    Each key gets its own daemon thread, so a path on a slow or unreachable share only delays its
+    own lookups and never the window or quitting. submit() with a delay debounces, and a result is
+    dropped when a newer lookup for the same key was submitted in the meantime.
+    """
+    _finished = QtCore.Signal(object, int, object)
+    _failed = QtCore.Signal(object, int, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._lock = threading.Lock()
+        self._generations = {}
+        self._queues = {}
+        self._callbacks = {}
+        self._delayed = {}
+        self._timers = {}
+        self._finished.connect(self._deliver)
+        self._failed.connect(self._deliverError)
+
+    def submit(self, key, function, callback, delay_ms=0, error_callback=None):
+        """ Calls function() on key's thread and callback(result) on the GUI thread.
+
+        When function raises, error_callback(exception) is called instead, if given.
+        """
+        with self._lock:
+            generation = self._generations.get(key, 0) + 1
+            self._generations[key] = generation
+        self._callbacks[key] = (callback, error_callback)
+        if delay_ms <= 0:
+            self._start(key, generation, function)
+            return
+        self._delayed[key] = (generation, function)
+        timer = self._timers.get(key)
+        if timer is None:
+            timer = QtCore.QTimer(self)
+            timer.setSingleShot(True)
+            timer.timeout.connect(lambda key=key: self._start(key, *self._delayed.pop(key)))
+            self._timers[key] = timer
+        timer.start(delay_ms)
+
+    def _isLatest(self, key, generation):
+        with self._lock:
+            return self._generations.get(key) == generation
+
+    def _start(self, key, generation, function):
+        work = self._queues.get(key)
+        if work is None:
+            work = self._queues[key] = queue.Queue()
+            threading.Thread(target=self._run, args=(key, work), name="probe", daemon=True).start()
+        work.put((generation, function))
+
+    def _run(self, key, work):
+        while True:
+            generation, function = work.get()
+            if not self._isLatest(key, generation):
+                continue
+            try:
+                result = function()
+            except Exception as e:
+                print(f"Exception in background probe {key}:", e, file=sys.stderr)
+                self._failed.emit(key, generation, e)
+                continue
+            self._finished.emit(key, generation, result)
+
+    def _deliver(self, key, generation, result):
+        if self._isLatest(key, generation):
+            callback, error_callback = self._callbacks.pop(key)
+            callback(result)
+
+    def _deliverError(self, key, generation, error):
+        if self._isLatest(key, generation):
+            callback, error_callback = self._callbacks.pop(key)
+            if error_callback is not None:
+                error_callback(error)
 
 
 class FilePicker(QtWidgets.QWidget):
+    # Emitted once the new text was looked up, fileExists() then tells whether it exists.
     textChanged = QtCore.Signal(str)
 
     def __init__(self,
@@ -15,9 +107,12 @@ class FilePicker(QtWidgets.QWidget):
                  placeholder_text=None,
                  filepath_root=None,
                  is_directory=False,
-                 parent=None):
+                 parent=None,
+                 probe=None):
         QtWidgets.QWidget.__init__(self, parent)
         self.is_directory = is_directory
+        self.probe = probe
+        self.exists = False
         self.button = QtWidgets.QPushButton("Select File" if label is None else label)
         self.button.clicked.connect(self.open_file_dialog)
         self.line_edit = QtWidgets.QLineEdit()
@@ -54,9 +149,17 @@ class FilePicker(QtWidgets.QWidget):
         # self.updateLabel()
 
     def updateLabel(self, current_text):
+        if current_text.strip() == "" or self.probe is None:
+            self._setExists(current_text, current_text.strip() != "" and os.path.exists(current_text))
+            return
+        self.probe.submit(self, lambda: os.path.exists(current_text),
+                          lambda exists: self._setExists(current_text, exists), _PROBE_DELAY_MS)
+
+    def _setExists(self, current_text, exists):
+        self.exists = exists
         if current_text.strip() == "":
             icon_name = "SP_FileIcon"
-        elif os.path.exists(current_text):
+        elif exists:
             icon_name = "SP_DialogApplyButton"
         else:
             icon_name = "SP_MessageBoxWarning"
@@ -72,18 +175,102 @@ class FilePicker(QtWidgets.QWidget):
         self.line_edit.setText(text)
 
     def fileExists(self):
-        return os.path.exists(self.line_edit.text())
+        """ Whether the text existed when it was last looked up. """
+        return self.exists
+
+
+class ProgressWorker(QtCore.QObject):
+    """ Base of the engine adapters, holds the engine's progress until the GUI thread flushes it.
+
+    Engines report progress per file from their worker threads. Queued as one signal each they
+    flood the GUI thread's event loop, so only the latest value of each is kept and flush(),
+    called from a GUI timer, emits those.
+    """
+    progress = QtCore.Signal(int)
+    prange = QtCore.Signal(int, int)
+
+    def __init__(self):
+        super().__init__()
+        self._held_lock = threading.Lock()
+        self._held = {}
+
+    def _hold(self, signal_name, key, *args):
+        with self._held_lock:
+            self._held[(signal_name, key)] = args
+
+    def flush(self):
+        with self._held_lock:
+            held = self._held
+            self._held = {}
+        # The range goes first so the value that comes with it isn't clamped to the old one.
+        for (signal_name, key), args in sorted(held.items(), key=lambda item: item[0][0] != "prange"):
+            getattr(self, signal_name).emit(*args)
+
+
+class Worker(ProgressWorker):
+    """ Qt adapter that runs a core.ImportEngine on a QThread and forwards its callbacks as signals. """
+    status = QtCore.Signal(str)
+    stats = QtCore.Signal(object)
+    card_progress = QtCore.Signal(int, str, int, int)
+    finished = QtCore.Signal()
+    canceled = QtCore.Signal()
+
+    def __init__(self, engine):
+        super().__init__()
+        self.engine = engine
+        self.engine.on_progress = lambda done: self._hold("progress", None, done)
+        self.engine.on_status = self.status.emit
+        self.engine.on_range = lambda minimum, maximum: self._hold("prange", None, minimum, maximum)
+        self.engine.on_stats = self.stats.emit
+        self.engine.on_card_progress = lambda index, name, done, found: self._hold(
+            "card_progress", index, index, name, done, found)
+        self.engine.on_finished = self.finished.emit
+        self.engine.on_canceled = self.canceled.emit
+
+    def cancel(self):
+        self.engine.cancel()
+
+    def run(self):
+        self.engine.run()
+
+
+class OrganizeWorker(ProgressWorker):
+    """ Qt adapter that runs an organize.OrganizeEngine on a QThread. """
+    status = QtCore.Signal(str)
+    finished = QtCore.Signal()
+    canceled = QtCore.Signal()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.engine = organize.OrganizeEngine(*args, **kwargs)
+        self.engine.on_progress = lambda done: self._hold("progress", None, done)
+        self.engine.on_status = self.status.emit
+        self.engine.on_range = lambda minimum, maximum: self._hold("prange", None, minimum, maximum)
+        self.engine.on_finished = self.finished.emit
+        self.engine.on_canceled = self.canceled.emit
+
+    def cancel(self):
+        self.engine.cancel()
+
+    def run(self):
+        self.engine.run()
+
 
+class PlanWorker(QtCore.QObject):
+    """ Runs core.ImportEngine.plan() on a QThread, the engine then goes on to a Worker to import. """
+    status = QtCore.Signal(str)
+    planned = QtCore.Signal(object)
 
-def list_volumes():
-    """ Lists mounted volumes found in /Volumes directory on macOS """
-    volumes_path = "/Volumes"
-    try:
-        # List directories in /Volumes, which are the mounted volumes
-        return [volume for volume in os.listdir(volumes_path) if os.path.isdir(os.path.join(volumes_path, volume))]
-    except FileNotFoundError:
-        # In case the /Volumes directory does not exist
-        return []
+    def __init__(self, engine):
+        super().__init__()
+        self.engine = engine
+        self.engine.on_status = self.status.emit
+
+    def cancel(self):
+        self.engine.cancel()
+
+    def run(self):
+        self.planned.emit(self.engine.plan())
 
 
 class SettingsDialog(QtWidgets.QDialog):
@@ -95,17 +282,42 @@ class SettingsDialog(QtWidgets.QDialog):
         self.setWindowTitle("Settings")
         layout = QtWidgets.QVBoxLayout(self)
 
-        # Integer SpinBox for number of threads
-        self.thread_spinbox = QtWidgets.QSpinBox(self)
-        self.thread_spinbox.setRange(1, 64)  # Assuming 1 to 64 threads
-        self.thread_spinbox.setValue(8)  # Default value
-        self.thread_spinbox.setToolTip("Number of worker threads to run Graphics Magick compression.")
-        layout.addWidget(QtWidgets.QLabel("Number of Threads:"))
-        layout.addWidget(self.thread_spinbox)
+        # Integer SpinBoxes for the card read, library write and encoder pools
+        self.card_readers_spinbox = QtWidgets.QSpinBox(self)
+        self.card_readers_spinbox.setRange(1, 16)
+        self.card_readers_spinbox.setValue(1)  # Default value
+        self.card_readers_spinbox.setToolTip("Files read from the card at the same time. One reads the card in a single sequential sweep.")
+        self.card_readers_rate = QtWidgets.QLabel(self)
+        layout.addWidget(QtWidgets.QLabel("Card Readers:"))
+        layout.addWidget(self.card_readers_spinbox)
+        layout.addWidget(self.card_readers_rate)
+
+        self.dest_writers_spinbox = QtWidgets.QSpinBox(self)
+        self.dest_writers_spinbox.setRange(1, 32)
+        self.dest_writers_spinbox.setValue(4)  # Default value
+        self.dest_writers_spinbox.setToolTip("Files written to the library at the same time.")
+        self.dest_writers_rate = QtWidgets.QLabel(self)
+        layout.addWidget(QtWidgets.QLabel("Library Writers:"))
+        layout.addWidget(self.dest_writers_spinbox)
+        layout.addWidget(self.dest_writers_rate)
+
+        self.encoder_workers_spinbox = QtWidgets.QSpinBox(self)
+        self.encoder_workers_spinbox.setRange(1, 64)
+        self.encoder_workers_spinbox.setValue(core.defaultEncoderWorkers())  # Default value
+        self.encoder_workers_spinbox.setToolTip("Images compressed at the same time, about one per CPU core.")
+        self.encoder_workers_rate = QtWidgets.QLabel(self)
+        layout.addWidget(QtWidgets.QLabel("Compression Workers:"))
+        layout.addWidget(self.encoder_workers_spinbox)
+        layout.addWidget(self.encoder_workers_rate)
+
+        self.auto_tune_checkbox = QtWidgets.QCheckBox("Auto-Tune Workers", self)
+        self.auto_tune_checkbox.setToolTip(
+            "Adjust the three worker counts while the first few hundred images import and keep the best ones.")
+        layout.addWidget(self.auto_tune_checkbox)
 
         # Double SpinBox for compression amount (float)
         self.compression_enabled = QtWidgets.QCheckBox("Enable Compression")
-        self.compression_enabled.setToolTip("Enable or disable Graphics Magick compression.")
+        self.compression_enabled.setToolTip("Enable or disable image compression.")
         self.compression_spinbox = QtWidgets.QDoubleSpinBox(self)
         self.compression_spinbox.setRange(0.0, 100.0)  # Compression range
         self.compression_spinbox.setSingleStep(1.0)
@@ -114,12 +326,60 @@ class SettingsDialog(QtWidgets.QDialog):
         layout.addWidget(self.compression_enabled)
         layout.addWidget(self.compression_spinbox)
 
+        # Integer SpinBox for the long edge of compressed images
+        self.max_edge_spinbox = QtWidgets.QSpinBox(self)
+        self.max_edge_spinbox.setRange(0, 20000)
+        self.max_edge_spinbox.setSingleStep(500)
+        self.max_edge_spinbox.setValue(0)  # Default value
+        self.max_edge_spinbox.setSpecialValueText("Full Resolution")
+        self.max_edge_spinbox.setToolTip(
+            "Longest side of compressed images. Smaller sizes are decoded at reduced scale and compress faster.")
+        layout.addWidget(QtWidgets.QLabel("Compressed Long Edge (px):"))
+        layout.addWidget(self.max_edge_spinbox)
+
+        # ComboBox for the compression backend
+        self.encoder_combo = QtWidgets.QComboBox(self)
+        for name, encoder_class in core.encoders.ENCODERS.items():
+            self.encoder_combo.addItem(encoder_class.label, name)
+        self.encoder_combo.setToolTip("Library used to compress images. GraphicsMagick must be installed separately.")
+        layout.addWidget(QtWidgets.QLabel("Compression Engine:"))
+        layout.addWidget(self.encoder_combo)
+
+        # Integer SpinBox for the scan cache cap
+        self.scan_cache_spinbox = QtWidgets.QSpinBox(self)
+        self.scan_cache_spinbox.setRange(0, 1000000)
+        self.scan_cache_spinbox.setSingleStep(10000)
+        self.scan_cache_spinbox.setValue(50000)  # Default value
+        self.scan_cache_spinbox.setToolTip(
+            "Number of source files whose capture dates are remembered between imports. 0 disables the cache.")
+        layout.addWidget(QtWidgets.QLabel("Scan Cache Size (files):"))
+        layout.addWidget(self.scan_cache_spinbox)
+
         # CheckBox for playing a sound
         self.movies_checkbox = QtWidgets.QCheckBox("Import Movies", self)
         self.movies_checkbox.setToolTip("Enable copying of movie files from Volume.")
         self.movies_checkbox.setChecked(True)  # Default checked
         layout.addWidget(self.movies_checkbox)
 
+        # Integer SpinBox for concurrent movie copies
+        self.movie_copies_spinbox = QtWidgets.QSpinBox(self)
+        self.movie_copies_spinbox.setRange(1, 8)
+        self.movie_copies_spinbox.setValue(2)  # Default value
+        self.movie_copies_spinbox.setToolTip("Number of movie files copied at the same time.")
+        layout.addWidget(QtWidgets.QLabel("Concurrent Movie Copies:"))
+        layout.addWidget(self.movie_copies_spinbox)
+
+        self.verify_checkbox = QtWidgets.QCheckBox("Verify Copies", self)
+        self.verify_checkbox.setToolTip(
+            "Read every copy back from the library and compare it to the checksum taken from the card.")
+        layout.addWidget(self.verify_checkbox)
+
+        self.trace_checkbox = QtWidgets.QCheckBox("Record Trace", self)
+        self.trace_checkbox.setToolTip(
+            "Record where each import spends its time, and a profile, in the library's .photoimporter/traces "
+            "folder to attach to bug reports.")
+        layout.addWidget(self.trace_checkbox)
+
         # CheckBox for playing a sound
         self.sound_checkbox = QtWidgets.QCheckBox("Play Sound on Completion", self)
         self.sound_checkbox.setToolTip("Enable or disable import complete sound.")
@@ -150,19 +410,48 @@ class SettingsDialog(QtWidgets.QDialog):
 
     def saveSettings(self):
         settings = QtCore.QSettings('rischio', 'PhotoImporter')
-        settings.setValue('num_threads', self.thread_spinbox.value())
+        settings.setValue('card_readers', self.card_readers_spinbox.value())
+        settings.setValue('dest_writers', self.dest_writers_spinbox.value())
+        settings.setValue('encoder_workers', self.encoder_workers_spinbox.value())
+        settings.setValue('auto_tune', self.auto_tune_checkbox.isChecked())
         settings.setValue('compression_amount', self.compression_spinbox.value())
         settings.setValue("compression_enabled", self.compression_enabled.isChecked())
+        settings.setValue('max_edge', self.max_edge_spinbox.value())
         settings.setValue('play_sound', self.sound_checkbox.isChecked())
         settings.setValue('import_movies', self.movies_checkbox.isChecked())
+        settings.setValue('scan_cache_size', self.scan_cache_spinbox.value())
+        settings.setValue('encoder', self.encoder_combo.currentData())
+        settings.setValue('movie_copies', self.movie_copies_spinbox.value())
+        settings.setValue('verify_copies', self.verify_checkbox.isChecked())
+        settings.setValue('record_trace', self.trace_checkbox.isChecked())
 
     def load_settings(self):
         settings = QtCore.QSettings('rischio', 'PhotoImporter')
-        self.thread_spinbox.setValue(settings.value('num_threads', 8, int))
+        self.card_readers_spinbox.setValue(settings.value('card_readers', 1, int))
+        self.dest_writers_spinbox.setValue(settings.value('dest_writers', 4, int))
+        self.encoder_workers_spinbox.setValue(settings.value('encoder_workers', core.defaultEncoderWorkers(), int))
+        self.auto_tune_checkbox.setChecked(settings.value('auto_tune', False, bool))
+        pool_rates = json.loads(settings.value('pool_rates', '{}', str))
+        for name, label in (("card_readers", self.card_readers_rate), ("dest_writers", self.dest_writers_rate),
+                            ("encoder_workers", self.encoder_workers_rate)):
+            pool = pool_rates.get(name)
+            if pool is None:
+                label.setText("Last import: --")
+            elif "mb_per_s" in pool:
+                label.setText(f"Last import: {pool['workers']} at {pool['mb_per_s']:.1f} MB/s")
+            else:
+                label.setText(f"Last import: {pool['workers']} at {pool['files_per_s']:.1f} images/s")
         self.compression_spinbox.setValue(settings.value('compression_amount', 90.0, float))
         self.compression_enabled.setChecked(settings.value('compression_enabled', True, bool))
+        self.max_edge_spinbox.setValue(settings.value('max_edge', 0, int))
         self.sound_checkbox.setChecked(settings.value('play_sound', True, bool))
         self.movies_checkbox.setChecked(settings.value('import_movies', True, bool))
+        self.scan_cache_spinbox.setValue(settings.value('scan_cache_size', 50000, int))
+        encoder_index = self.encoder_combo.findData(settings.value('encoder', core.encoders.DEFAULT_ENCODER, str))
+        self.encoder_combo.setCurrentIndex(max(encoder_index, 0))
+        self.movie_copies_spinbox.setValue(settings.value('movie_copies', 2, int))
+        self.verify_checkbox.setChecked(settings.value('verify_copies', False, bool))
+        self.trace_checkbox.setChecked(settings.value('record_trace', False, bool))
 
 
 class MainWindow(QtWidgets.QMainWindow):
@@ -180,12 +469,31 @@ class MainWindow(QtWidgets.QMainWindow):
         self.statusbar.showMessage("Ready")
         self.setStatusBar(self.statusbar)
 
+        # Path lookups and volume listings run here, a slow share never freezes the window
+        self.probe = BackgroundProbe(self)
+        self.worker = None
+        self.organize_worker = None
+        self.import_starting = False
+        self.progress_timer = QtCore.QTimer(self)
+        self.progress_timer.setInterval(_PROGRESS_INTERVAL_MS)
+        self.progress_timer.timeout.connect(self._flushProgress)
+
+        self.thread_import = QtCore.QThread()
+        self.thread_organize = QtCore.QThread()
+        self.thread_plan = QtCore.QThread()
+        self.plan_worker = None
+        self.plan_key = None
+        self.plan_ready = False
+
         self.tab_widget = QtWidgets.QTabWidget()
 
         widget_main = QtWidgets.QWidget()
         main_layout = QtWidgets.QHBoxLayout()
         self.widget_import = self._createImportWidget()
-        main_layout.addWidget(self.widget_import)
+        self.widget_organize = self._createOrganizeWidget()
+        self.tab_widget.addTab(self.widget_import, "Import")
+        self.tab_widget.addTab(self.widget_organize, "Organize")
+        main_layout.addWidget(self.tab_widget)
         widget_main.setLayout(main_layout)
 
         menu_bar = QtWidgets.QMenuBar(self)
@@ -196,8 +504,6 @@ class MainWindow(QtWidgets.QMainWindow):
         settings_action.triggered.connect(self._openSettings)
         settings_menu.addAction(settings_action)
 
-        self.thread_import = QtCore.QThread()
-
         self.setCentralWidget(widget_main)
 
         self._loadWidgetSettings()
@@ -208,6 +514,7 @@ class MainWindow(QtWidgets.QMainWindow):
     def _openSettings(self):
         dialog = SettingsDialog(self)
         dialog.updated.connect(self._updateSettingsHud)
+        dialog.updated.connect(self._replan)
         dialog.exec()
 
     def _createSettingsHudWidget(self):
@@ -246,7 +553,27 @@ class MainWindow(QtWidgets.QMainWindow):
             label="Import Location",
             is_directory=True,
             placeholder_text="/Volumes",
-            filepath_root="/Volumes")
+            filepath_root="/Volumes",
+            probe=self.probe)
+
+        # Cards added here are imported together, each from its own reader
+        self.source_list = QtWidgets.QListWidget()
+        self.source_list.setFixedHeight(70)
+        self.source_list.setToolTip("Volumes to import in one go. When empty the location above is imported.")
+        self.button_add_source = QtWidgets.QPushButton("Add")
+        self.button_add_source.setToolTip("Add the location above to the volumes to import.")
+        self.button_add_source.clicked.connect(self._addSource)
+        self.button_remove_source = QtWidgets.QPushButton("Remove")
+        self.button_remove_source.clicked.connect(self._removeSource)
+        widget_sources = QtWidgets.QWidget()
+        hbox_sources = QtWidgets.QHBoxLayout()
+        vbox_source_buttons = QtWidgets.QVBoxLayout()
+        vbox_source_buttons.addWidget(self.button_add_source)
+        vbox_source_buttons.addWidget(self.button_remove_source)
+        vbox_source_buttons.addStretch()
+        hbox_sources.addWidget(self.source_list)
+        hbox_sources.addLayout(vbox_source_buttons)
+        widget_sources.setLayout(hbox_sources)
 
         widget_storage = QtWidgets.QWidget()
         hbox_storage = QtWidgets.QHBoxLayout()
@@ -268,21 +595,44 @@ class MainWindow(QtWidgets.QMainWindow):
             label="Library Folder",
             is_directory=True,
             placeholder_text=os.path.expandvars(path),
-            filepath_root=os.path.expandvars(path))
+            filepath_root=os.path.expandvars(path),
+            probe=self.probe)
 
         self.file_picker_src.textChanged.connect(self._enableImport)
         self.file_picker_src.textChanged.connect(self._updateStorageBar)
         self.file_picker_dst.textChanged.connect(self._enableImport)
 
+        # Polls the mount points, a card that appears is added to the sources and checked right away
+        self.watch_checkbox = QtWidgets.QCheckBox("Watch for Cards")
+        self.watch_checkbox.setToolTip(
+            "Add cards to the sources as they are mounted and check them against the library in the background.")
+        self.watch_checkbox.toggled.connect(self._setWatching)
+        self.label_plan = QtWidgets.QLabel()
+        self.label_plan.setWordWrap(True)
+        self.card_watcher = watcher.CardWatcher()
+        self.watch_timer = QtCore.QTimer(self)
+        self.watch_timer.setInterval(int(watcher.DEFAULT_INTERVAL * 1000))
+        self.watch_timer.timeout.connect(self._pollCards)
+
         widget_progress = QtWidgets.QWidget()
         hbox_progress = QtWidgets.QHBoxLayout()
         label_progress = QtWidgets.QLabel("Progress")
         self.progress_bar = QtWidgets.QProgressBar()
         self.progress_bar.setTextVisible(True)
+        self.label_stats = QtWidgets.QLabel()
+        self.label_stats.setMinimumWidth(160)
         hbox_progress.addWidget(label_progress)
         hbox_progress.addWidget(self.progress_bar)
+        hbox_progress.addWidget(self.label_stats)
         widget_progress.setLayout(hbox_progress)
 
+        # One bar per card while several cards import
+        self.card_progress_widget = QtWidgets.QWidget()
+        self.card_progress_layout = QtWidgets.QVBoxLayout()
+        self.card_progress_layout.setContentsMargins(0, 0, 0, 0)
+        self.card_progress_widget.setLayout(self.card_progress_layout)
+        self.card_progress_bars = {}
+
         widget_buttons = QtWidgets.QWidget()
         hbox_buttons = QtWidgets.QHBoxLayout()
 
@@ -303,6 +653,9 @@ class MainWindow(QtWidgets.QMainWindow):
 
         vbox_source.addWidget(label_widget)
         vbox_source.addWidget(self.file_picker_src)
+        vbox_source.addWidget(widget_sources)
+        vbox_source.addWidget(self.watch_checkbox)
+        vbox_source.addWidget(self.label_plan)
         vbox_source.addWidget(widget_storage)
         group_box_source.setLayout(vbox_source)
 
@@ -316,6 +669,7 @@ class MainWindow(QtWidgets.QMainWindow):
         vbox_layout.addWidget(group_box_dest)
 
         vbox_layout.addWidget(widget_progress)
+        vbox_layout.addWidget(self.card_progress_widget)
         vbox_layout.addStretch()
 
         widget_container.setLayout(vbox_layout)
@@ -324,83 +678,340 @@ class MainWindow(QtWidgets.QMainWindow):
 
         return widget_container
 
+    def _listedSources(self):
+        return [self.source_list.item(row).text() for row in range(self.source_list.count())]
+
+    def _importSources(self):
+        sources = self._listedSources()
+        return sources if len(sources) > 0 else [self.file_picker_src.text()]
+
+    def _addSource(self):
+        source = self.file_picker_src.text()
+        if not self.file_picker_src.fileExists() or source in self._listedSources():
+            return
+        self.source_list.addItem(source)
+        self._enableImport()
+
+    def _removeSource(self):
+        for item in self.source_list.selectedItems():
+            self.source_list.takeItem(self.source_list.row(item))
+        self._enableImport()
+
+    def _isImporting(self):
+        return self.import_starting or self.thread_import.isRunning()
+
+    def _setWatching(self, watching):
+        if watching:
+            # Cards that are already in count as inserted on the first poll.
+            self.card_watcher = watcher.CardWatcher()
+            self.watch_timer.start()
+            self._pollCards()
+        else:
+            self.watch_timer.stop()
+            self._discardPlan()
+
+    def _pollCards(self):
+        if self._isImporting():
+            return
+        self.probe.submit("cards", self.card_watcher.poll, self._cardsPolled)
+
+    def _cardsPolled(self, changes):
+        inserted, removed = changes
+        for card in removed:
+            for item in self.source_list.findItems(card, QtCore.Qt.MatchExactly):
+                self.source_list.takeItem(self.source_list.row(item))
+        for card in inserted:
+            if card not in self._listedSources():
+                self.source_list.addItem(card)
+        if len(inserted) > 0 or len(removed) > 0:
+            self._enableImport()
+
+    def _planKey(self):
+        return tuple(self._importSources()), self.file_picker_dst.text()
+
+    def _replan(self):
+        """ Starts checking the sources against the library in the background while watching for cards. """
+        if not hasattr(self, "watch_checkbox") or self._isImporting():
+            return
+        self._discardPlan()
+        if not self.watch_checkbox.isChecked() or not self.button_import.isEnabled():
+            return
+        self.plan_key = self._planKey()
+        sources = self._importSources()
+        self.probe.submit("plan_locations", lambda: self._listImportLocations(sources),
+                          functools.partial(self._startPlan, self.plan_key))
+
+    def _startPlan(self, plan_key, import_locations):
+        if self._isImporting() or self.plan_key != plan_key or self.plan_worker is not None:
+            return
+        if len(import_locations) == 0:
+            self.plan_key = None
+            return
+        self.plan_worker = PlanWorker(self._createEngine(import_locations))
+        self.plan_worker.moveToThread(self.thread_plan)
+        self.plan_worker.status.connect(self.statusbar.showMessage)
+        self.plan_worker.planned.connect(self._planReady)
+        self.thread_plan.started.connect(self.plan_worker.run)
+        self.label_plan.setText("Checking cards against the library.")
+        self.thread_plan.start()
+
+    def _planReady(self, import_plan):
+        if self.sender() is not self.plan_worker:
+            # A plan discarded while it ran, finishing its trace again does nothing.
+            self.sender().engine.finishTrace()
+            return
+        self.thread_plan.quit()
+        self.thread_plan.wait()
+        self.thread_plan.started.disconnect(self.plan_worker.run)
+        if import_plan is None:
+            self.plan_worker.engine.finishTrace()
+            self.plan_worker = None
+            self.label_plan.setText("")
+            return
+        self.plan_ready = True
+        self.label_plan.setText(import_plan.summary())
+        self.statusbar.showMessage("Cards checked, ready to import.")
+
+    def _discardPlan(self):
+        if self.plan_worker is not None and not self.plan_ready:
+            self.plan_worker.cancel()
+            self.thread_plan.quit()
+            self.thread_plan.wait()
+            self.thread_plan.started.disconnect(self.plan_worker.run)
+        if self.plan_worker is not None:
+            # Tracing started with the plan would otherwise keep recording every thread until the next import.
+            self.plan_worker.engine.finishTrace()
+        self.plan_worker = None
+        self.plan_key = None
+        self.plan_ready = False
+        self.label_plan.setText("")
+
+    def _createEngine(self, import_locations, encoder_name=None):
+        settings = QtCore.QSettings('rischio', 'PhotoImporter')
+        if encoder_name is None:
+            encoder_name = settings.value('encoder', core.encoders.DEFAULT_ENCODER, str)
+            if encoder_name not in core.encoders.ENCODERS:
+                encoder_name = core.encoders.DEFAULT_ENCODER
+        trace_path = profile_path = None
+        if settings.value('record_trace', False, bool):
+            name = os.path.join(core.getLibraryMetaDir(self.file_picker_dst.text()), "traces",
+                                time.strftime("import-%Y%m%d-%H%M%S"))
+            trace_path, profile_path = f"{name}.trace.json", f"{name}.prof"
+        return core.ImportEngine(
+            self.file_picker_dst.text(), import_locations,
+            settings.value('compression_enabled', True, bool), settings.value('import_movies', True, bool),
+            settings.value('compression_amount', 90.0, float),
+            card_readers=settings.value('card_readers', 1, int),
+            dest_writers=settings.value('dest_writers', 4, int),
+            encoder_workers=settings.value('encoder_workers', core.defaultEncoderWorkers(), int),
+            auto_tune=settings.value('auto_tune', False, bool),
+            scan_cache_size=settings.value('scan_cache_size', 50000, int), encoder_name=encoder_name,
+            movie_copies=settings.value('movie_copies', 2, int), max_edge=settings.value('max_edge', 0, int),
+            verify_copies=settings.value('verify_copies', False, bool),
+            trace_path=trace_path, profile_path=profile_path)
+
     def _enableImport(self):
-        if self.file_picker_src.fileExists() and self.file_picker_dst.fileExists():
+        if self._isImporting():
+            return
+        # A plan of the old sources or library is stale, a new one starts once they are checked.
+        self._discardPlan()
+        sources = self._importSources()
+        library_exists = self.file_picker_dst.fileExists()
+        self.probe.submit("sources", lambda: library_exists and all(os.path.exists(source) for source in sources),
+                          self._sourcesChecked)
+
+    def _sourcesChecked(self, exist):
+        if self._isImporting():
+            return
+        if exist:
             self.button_import.setEnabled(True)
             self.statusbar.showMessage("Ready")
         else:
             self.statusbar.showMessage("Import locations and library paths must exist.")
             self.button_import.setEnabled(False)
+        self._replan()
+
+    @staticmethod
+    def _usedPercentage(directory):
+        if not os.path.exists(directory):
+            return 0
+        total, used, free = shutil.disk_usage(directory)
+        return (used / total) * 100
 
     def _updateStorageBar(self):
-        # Use os.path.abspath to resolve any relative path issues
         directory = self.file_picker_src.text()
-        if not os.path.exists(directory):
-            used_percentage = 0
-        else:
-            total, used, free = shutil.disk_usage(directory)
-            used_percentage = (used / total) * 100
-        self.storage_bar.setToolTip(f"{used_percentage}% Used")
-        self.storage_bar.setValue(used_percentage)
+        self.probe.submit("storage", lambda: self._usedPercentage(directory), self._setStorageBar)
+
+    def _setStorageBar(self, used_percentage):
+        self.storage_bar.setToolTip(f"{used_percentage:.0f}% Used")
+        self.storage_bar.setValue(int(used_percentage))
 
     def _runImport(self):
 
         settings = QtCore.QSettings('rischio', 'PhotoImporter')
-        import_movies = settings.value('import_movies', True, bool)
         run_compress = settings.value('compression_enabled', True, bool)
 
-        if not os.path.exists("/opt/homebrew/bin/gm") and run_compress is True:
-            if self.promptUser("PhotoImporter", "Graphics Magick is required to compress images. It isnt installed. Install it now?"):
+        encoder_name = settings.value('encoder', core.encoders.DEFAULT_ENCODER, str)
+        if encoder_name not in core.encoders.ENCODERS:
+            encoder_name = core.encoders.DEFAULT_ENCODER
+
+        if run_compress is True and not core.encoders.getEncoder(encoder_name).available():
+            if sys.platform == "darwin" and encoder_name == core.encoders.GmEncoder.name and \
+                    self.promptUser("PhotoImporter", "Graphics Magick is selected to compress images. It isnt installed. Install it now?"):
                 core.installGm()
                 self.notifyUser("PhotoImporter", f"You must restart PhotoImporter")
                 return
-            else:
-                run_compress = False
+            encoder_name = core.encoders.DEFAULT_ENCODER
 
-        self.button_cancel_import.setEnabled(True)
         self.statusbar.showMessage("Importing Images")
-        self.file_picker_src.setEnabled(False)
+        self._setSourcesEnabled(False)
         self.file_picker_dst.setEnabled(False)
         self.button_import.setEnabled(False)
+        self._clearCardProgress()
 
+        # The cards and library are listed on the probe thread, the import starts when they are.
+        self.import_starting = True
+        sources = self._importSources()
         workdir = self.file_picker_dst.text()
+        import_movies = settings.value('import_movies', True, bool)
+        self.probe.submit("import_locations",
+                          lambda: self._checkImportLocations(sources, workdir, run_compress, import_movies),
+                          functools.partial(self._startImport, encoder_name),
+                          error_callback=self._importLocationsFailed)
+
+    def _importLocationsFailed(self, error):
+        self.import_starting = False
+        self._importStopped()
+        self.statusbar.showMessage(f"Could not list the cards and library: {error}")
+
+    def _startImport(self, encoder_name, checked):
+        import_locations = self._getImportLocations(*checked)
+        self.import_starting = False
+        if len(import_locations) == 0:
+            self._importStopped()
+            return
+        self.button_cancel_import.setEnabled(True)
+        if self.plan_ready and self.plan_key == self._planKey():
+            # The cards were already scanned and checked while waiting for the user.
+            engine = self.plan_worker.engine
+            engine.encoder_name = encoder_name
+            self.plan_worker = None
+            self.plan_ready = False
+        else:
+            self._discardPlan()
+            engine = self._createEngine(import_locations, encoder_name)
+        self.label_plan.setText("")
 
-        QtWidgets.QApplication.processEvents()
-        import_locations = self._getImportLocations()
-        num_threads = settings.value('num_threads', 8, int)
-        compression_quality = settings.value('compression_amount', 90.0, float)
-
-        self.worker = core.Worker(workdir, num_threads, import_locations, run_compress, import_movies, compression_quality)
+        self.worker = Worker(engine)
         self.worker.moveToThread(self.thread_import)
         self.worker.progress.connect(self.progress_bar.setValue)
         self.worker.prange.connect(self.progress_bar.setRange)
         self.worker.status.connect(self.statusbar.showMessage)
+        self.worker.stats.connect(self._updateStats)
+        self.worker.card_progress.connect(self._updateCardProgress)
         self.worker.finished.connect(self._importThreadCompleted)
         self.worker.canceled.connect(self._taskCanceled)
 
         self.thread_import.started.connect(self.worker.run)
         self.thread_import.start()
+        self.progress_timer.start()
+
+    def _flushProgress(self):
+        for worker in (self.worker, self.organize_worker):
+            if worker is not None:
+                worker.flush()
+
+    def _updateStats(self, snapshot):
+        self.label_stats.setText(
+            f"{snapshot['mb_per_s']:.1f} MB/s  {snapshot['files_per_s']:.1f} files/s  "
+            f"ETA {core.stats.formatEta(snapshot['eta_seconds'])}")
+        lines = []
+        for name, stage in snapshot["stages"].items():
+            if stage["files"] == 0 and stage["bytes_read"] == 0:
+                continue
+            lines.append(f"<b>{name}</b>: {stage['mb_per_s']:.1f} MB/s, {stage['files_per_s']:.1f} files/s, "
+                         f"read {core.formatBytes(stage['bytes_read'])}, "
+                         f"wrote {core.formatBytes(stage['bytes_written'])}")
+        for name, depth in snapshot["queue_depths"].items():
+            lines.append(f"<b>{name} queue</b>: {depth}")
+        self.label_stats.setToolTip("<br>".join(lines))
+
+    def _setSourcesEnabled(self, enabled):
+        for widget in (self.file_picker_src, self.source_list, self.button_add_source, self.button_remove_source):
+            widget.setEnabled(enabled)
+
+    def _clearCardProgress(self):
+        for bar in self.card_progress_bars.values():
+            self.card_progress_layout.removeWidget(bar)
+            bar.deleteLater()
+        self.card_progress_bars = {}
+        self._fitWindow()
+
+    def _updateCardProgress(self, index, name, done, found):
+        # A single card is already shown by the main progress bar.
+        if len(self.worker.engine.cards) < 2:
+            return
+        bar = self.card_progress_bars.get(index)
+        if bar is None:
+            bar = QtWidgets.QProgressBar()
+            bar.setFormat(f"{name}  %v/%m")
+            self.card_progress_layout.insertWidget(sum(1 for other in self.card_progress_bars if other < index), bar)
+            self.card_progress_bars[index] = bar
+            self._fitWindow()
+        bar.setRange(0, max(found, 1))
+        bar.setValue(done)
+
+    def _fitWindow(self):
+        # The window is fixed to its size hint, which changes with the number of card bars.
+        self.setMaximumSize(16777215, 16777215)
+        self.setMinimumSize(0, 0)
+        self.adjustSize()
+        self.setMinimumSize(self.sizeHint())
+        self.setMaximumSize(self.sizeHint())
+
+    def _savePoolRates(self):
+        # Shown next to the pool sizes in the settings, a tuned import also becomes the new default.
+        engine = self.worker.engine
+        if engine.import_stats.files_done == 0:
+            return
+        settings = QtCore.QSettings('rischio', 'PhotoImporter')
+        settings.setValue('pool_rates', json.dumps(engine.poolRates()))
+        if engine.tuner is not None and engine.tuner.done:
+            settings.setValue('card_readers', engine.card_readers)
+            settings.setValue('dest_writers', engine.dest_writers)
+            settings.setValue('encoder_workers', engine.encoder_workers)
+
+    def _stopProgressTimer(self, worker):
+        # Whatever the worker still holds is shown before its thread's widgets are released.
+        worker.flush()
+        if not self.thread_import.isRunning() and not self.thread_organize.isRunning():
+            self.progress_timer.stop()
+
+    def _importStopped(self):
+        self._setSourcesEnabled(True)
+        self.file_picker_dst.setEnabled(True)
+        self.button_import.setEnabled(True)
+        self.button_cancel_import.setEnabled(False)
 
     def _importThreadCompleted(self):
         self.thread_import.exit()
         self.thread_import.wait()
+        self._stopProgressTimer(self.worker)
+        self._savePoolRates()
         self.say("Import Complete")
-        self.file_picker_src.setEnabled(True)
-        self.file_picker_dst.setEnabled(True)
-        self.button_import.setEnabled(True)
-        self.button_cancel_import.setEnabled(False)
+        self._importStopped()
 
     def _cancelImport(self):
+        self.button_cancel_import.setEnabled(False)
+        self.statusbar.showMessage("Canceling import.")
         self.worker.cancel()
 
     def _taskCanceled(self):
         self.thread_import.quit()
         self.thread_import.wait()
-        self.file_picker_src.setEnabled(True)
-        self.file_picker_dst.setEnabled(True)
-        self.button_import.setEnabled(True)
-        self.button_cancel_import.setEnabled(False)
-        self.statusbar.showMessage("Import canceled.")
+        self._stopProgressTimer(self.worker)
+        self._savePoolRates()
+        self._importStopped()
 
     def _createOrganizeWidget(self):
         widget_container = QtWidgets.QWidget()
@@ -409,18 +1020,23 @@ class MainWindow(QtWidgets.QMainWindow):
             label="Source Folder",
             is_directory=True,
             placeholder_text=os.path.expandvars(path),
-            filepath_root=os.path.expandvars(path))
+            filepath_root=os.path.expandvars(path),
+            probe=self.probe)
 
         widget_copy = QtWidgets.QWidget()
         hbox_copy = QtWidgets.QHBoxLayout()
 
         self.checkbox_copy_location = QtWidgets.QCheckBox("Copy")
+        self.checkbox_copy_location.setToolTip(
+            "Leave the source folder as it is and fill the output folder. Files are cloned or hard linked "
+            "where the filesystem allows, so no image data is copied.")
         self.checkbox_copy_location.stateChanged.connect(self._enableCopyLocation)
         self.file_picker_organize_dst = FilePicker(
             label="Output Folder",
             is_directory=True,
             placeholder_text=os.path.expandvars(path),
-            filepath_root=os.path.expandvars(path))
+            filepath_root=os.path.expandvars(path),
+            probe=self.probe)
 
         hbox_copy.addWidget(self.checkbox_copy_location)
         hbox_copy.addWidget(self.file_picker_organize_dst)
@@ -433,14 +1049,26 @@ class MainWindow(QtWidgets.QMainWindow):
         self.progress_bar_organize = QtWidgets.QProgressBar()
         self.progress_bar_organize.setTextVisible(True)
 
+        widget_buttons = QtWidgets.QWidget()
+        hbox_buttons = QtWidgets.QHBoxLayout()
+
         self.button_organize = QtWidgets.QPushButton("Organize")
+        self.button_organize.setToolTip("File the images and movies of the source folder into date folders")
         self.button_organize.clicked.connect(self._runOrganize)
         self.button_organize.setEnabled(False)
 
+        self.button_cancel_organize = QtWidgets.QPushButton("Cancel")
+        self.button_cancel_organize.clicked.connect(self._cancelOrganize)
+        self.button_cancel_organize.setEnabled(False)
+
+        hbox_buttons.addWidget(self.button_organize)
+        hbox_buttons.addWidget(self.button_cancel_organize)
+        widget_buttons.setLayout(hbox_buttons)
+
         vbox_layout = QtWidgets.QVBoxLayout()
         vbox_layout.addWidget(self.file_picker_organize_src)
         vbox_layout.addWidget(widget_copy)
-        vbox_layout.addWidget(self.button_organize)
+        vbox_layout.addWidget(widget_buttons)
         vbox_layout.addWidget(self.progress_bar_organize)
         vbox_layout.addStretch()
 
@@ -450,26 +1078,56 @@ class MainWindow(QtWidgets.QMainWindow):
         return widget_container
 
     def _enableOrganize(self):
-        if self.file_picker_organize_src.fileExists():
+        copy = self.checkbox_copy_location.isChecked()
+        if self.file_picker_organize_src.fileExists() and (not copy or self.file_picker_organize_dst.fileExists()):
             self.button_organize.setEnabled(True)
         else:
             self.button_organize.setEnabled(False)
 
     def _enableCopyLocation(self, state):
         self.file_picker_organize_dst.setEnabled(state == 2)
+        self._enableOrganize()
+
+    def _setOrganizeRunning(self, running):
+        self.file_picker_organize_src.setEnabled(not running)
+        self.file_picker_organize_dst.setEnabled(not running and self.checkbox_copy_location.isChecked())
+        self.checkbox_copy_location.setEnabled(not running)
+        self.button_organize.setEnabled(not running)
+        self.button_cancel_organize.setEnabled(running)
 
     def _runOrganize(self):
+        source_dir = self.file_picker_organize_src.text()
+        output_dir = self.file_picker_organize_dst.text() if self.checkbox_copy_location.isChecked() else None
+        if output_dir is None and not self.promptUser(
+                "Photo Importer", f"Rename the images and movies in {source_dir} into date folders?"):
+            return
+
         self.statusbar.showMessage("Organizing Images")
-        self.file_picker_organize_src.setEnabled(False)
-        self.file_picker_organize_dst.setEnabled(False)
-        self.checkbox_copy_location.setEnabled(False)
-        self.button_organize.setEnabled(False)
-        time.sleep(3)
-        self.file_picker_organize_src.setEnabled(True)
-        self.file_picker_organize_dst.setEnabled(True)
-        self.checkbox_copy_location.setEnabled(True)
-        self.button_organize.setEnabled(True)
-        self.statusbar.showMessage("Organize Complete")
+        self._setOrganizeRunning(True)
+
+        self.organize_worker = OrganizeWorker(source_dir, output_dir)
+        self.organize_worker.moveToThread(self.thread_organize)
+        self.organize_worker.progress.connect(self.progress_bar_organize.setValue)
+        self.organize_worker.prange.connect(self.progress_bar_organize.setRange)
+        self.organize_worker.status.connect(self.statusbar.showMessage)
+        self.organize_worker.finished.connect(self._organizeThreadCompleted)
+        self.organize_worker.canceled.connect(self._organizeThreadCompleted)
+
+        self.thread_organize.started.connect(self.organize_worker.run)
+        self.thread_organize.start()
+        self.progress_timer.start()
+
+    def _organizeThreadCompleted(self):
+        self.thread_organize.quit()
+        self.thread_organize.wait()
+        self._stopProgressTimer(self.organize_worker)
+        self.thread_organize.started.disconnect(self.organize_worker.run)
+        self._setOrganizeRunning(False)
+
+    def _cancelOrganize(self):
+        self.button_cancel_organize.setEnabled(False)
+        self.statusbar.showMessage("Canceling organize.")
+        self.organize_worker.cancel()
 
     def _createPreferences(self):
         widget_container = QtWidgets.QWidget()
@@ -527,11 +1185,19 @@ class MainWindow(QtWidgets.QMainWindow):
         settings.sync()
 
     def closeEvent(self, event):
+        self.watch_timer.stop()
+        self._discardPlan()
         try:
             self.thread_import.quit()
             self.thread_import.wait()
         except:
             pass
+        try:
+            self.organize_worker.cancel()
+        except AttributeError:
+            pass
+        self.thread_organize.quit()
+        self.thread_organize.wait()
         self._saveWidgetSettings()
         # super().closeEvent(event)
         super(MainWindow, self).closeEvent(event)
@@ -563,48 +1229,45 @@ class MainWindow(QtWidgets.QMainWindow):
         if settings.value('play_sound', True, bool):
             os.system(f'say {msg}')
 
-    def _getImportLocations(self):
-
-        selected_import_path = self.file_picker_src.text()
+    @staticmethod
+    def _listImportLocations(sources):
         import_folders = []
-        if os.path.exists(selected_import_path) and "DCIM" in os.listdir(selected_import_path):
-            dcim = os.path.join(selected_import_path, "DCIM")
-            import_folders.extend(
-                list(os.path.join(dcim, fuji) for fuji in os.listdir(dcim) if os.path.isdir(os.path.join(dcim, fuji))))
+        for source in sources:
+            import_folders.extend(core.scanner.findImportLocations(source))
+        return import_folders
 
-        workdir = self.file_picker_dst.text()
-        jpg_dir = os.path.join(workdir, "JPG")
-        compressed_dir = os.path.join(workdir, "Compressed")
-        video_dir = os.path.join(workdir, "Video")
+    @staticmethod
+    def _checkImportLocations(sources, workdir, run_compress, import_movies):
+        """ Lists the camera folders of sources and the library folders missing, on the probe thread. """
+        output_dirs = [os.path.join(workdir, "JPG")]
+        if run_compress is True:
+            output_dirs.append(os.path.join(workdir, "Compressed"))
+        if import_movies is True:
+            output_dirs.append(os.path.join(workdir, "Video"))
+        return MainWindow._listImportLocations(sources), [path for path in output_dirs if not os.path.exists(path)]
 
-        settings = QtCore.QSettings('rischio', 'PhotoImporter')
-        import_movies = settings.value('import_movies', True, bool)
-        run_compress = settings.value('compression_enabled', True, bool)
+    def _getImportLocations(self, import_folders, missing_dirs):
 
         if len(import_folders) < 1:
             self.notifyUser("PhotoImporter",
                             "No DCIM directories found in any volumes. Plug in a SD card.")
             return []
 
-        if not os.path.exists(jpg_dir):
-            if not self.promptUser("Photo Importer", f"Output directory {jpg_dir} does not exists. Would you like to create it?"):
+        for output_dir in missing_dirs:
+            if not self.promptUser("Photo Importer", f"Output directory {output_dir} does not exists. Would you like to create it?"):
                 return []
-            os.mkdir(jpg_dir)
-
-        if not os.path.exists(compressed_dir) and run_compress is True:
-            if not self.promptUser("Photo Importer", f"Output directory {compressed_dir} does not exists. Would you like to create it?"):
-                return []
-            os.mkdir(compressed_dir)
-
-        if not os.path.exists(video_dir) and import_movies is True:
-            if not self.promptUser("Photo Importer", f"Output directory {video_dir} does not exists. Would you like to create it?"):
+            try:
+                os.mkdir(output_dir)
+            except OSError as e:
+                self.notifyUser("PhotoImporter", f"Could not create {output_dir}: {e}")
                 return []
-            os.mkdir(video_dir)
 
         return import_folders
 
 
 if __name__ == '__main__':
+    # Needed for the compression process pool in the frozen app bundle.
+    multiprocessing.freeze_support()
     app = QtWidgets.QApplication(sys.argv)
     app.setWindowIcon(QtGui.QIcon('icon.png'))
 
@@ -0,0 +1,99 @@
+import threading
+import time
+
+
+class TunedPool(object):
+    """ A pool the AutoTuner may resize, through its scheduler.ConcurrencyLimit, within minimum and maximum. """
+
+    def __init__(self, name, limit, minimum, maximum):
+        self.name = name
+        self.limit = limit
+        self.minimum = minimum
+        self.maximum = maximum
+
+
+class AutoTuner(object):
+    """ Hill climbs the concurrency of each pool in turn during the first files of an import.
+
+    Throughput is measured over windows of finished files. A pool is first measured as is, then
+    grown one worker at a time while that raises throughput by at least min_gain, or shrunk if
+    growing didn't help. A step that doesn't pay off is rolled back before moving to the next pool.
+    """
+
+    def __init__(self, pools, window=32, max_files=384, min_gain=1.1):
+        self.pools = pools
+        self.window = window
+        self.max_files = max_files
+        self.min_gain = min_gain
+        self.done = len(pools) == 0
+        self.history = []
+        self._lock = threading.Lock()
+        self._files = 0
+        self._window_files = 0
+        self._window_bytes = 0
+        self._window_start = time.perf_counter()
+        self._index = 0
+        self._phase = "baseline"
+        self._direction = 0
+        self._steps = 0
+        self._best = 0.0
+
+    def fileDone(self, num_bytes):
+        """ Called once per imported file, returns True when this call finished tuning. """
+        with self._lock:
+            if self.done:
+                return False
+            self._files += 1
+            self._window_files += 1
+            self._window_bytes += num_bytes
+            if self._window_files < self.window:
+                return False
+            now = time.perf_counter()
+            elapsed = now - self._window_start
+            rate = self._window_bytes / elapsed if elapsed > 0 else 0.0
+            self._window_files = 0
+            self._window_bytes = 0
+            self._window_start = now
+            self._evaluate(rate)
+            if self._files >= self.max_files:
+                self.done = True
+            return self.done
+
+    def limits(self):
+        return {pool.name: pool.limit.limit for pool in self.pools}
+
+    def _step(self, pool, direction):
+        new_limit = pool.limit.limit + direction
+        if new_limit < pool.minimum or new_limit > pool.maximum:
+            return False
+        pool.limit.setLimit(new_limit)
+        self._direction = direction
+        return True
+
+    def _nextPool(self):
+        self._index += 1
+        self._phase = "baseline"
+        if self._index >= len(self.pools):
+            self.done = True
+
+    def _evaluate(self, rate):
+        pool = self.pools[self._index]
+        self.history.append((pool.name, pool.limit.limit, round(rate / 1e6, 3)))
+        if self._phase == "baseline":
+            self._best = rate
+            self._steps = 0
+            if self._step(pool, 1) or self._step(pool, -1):
+                self._phase = "climb"
+            else:
+                self._nextPool()
+        elif rate > self._best * self.min_gain:
+            self._best = rate
+            self._steps += 1
+            if not self._step(pool, self._direction):
+                self._nextPool()
+        else:
+            pool.limit.setLimit(pool.limit.limit - self._direction)
+            # Growing didn't help straight away, see whether fewer workers do better.
+            if self._direction > 0 and self._steps == 0 and self._step(pool, -1):
+                return
+            self._nextPool()
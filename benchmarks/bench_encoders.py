@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+""" Throughput of each available compression backend on the same batch of images.
+
+Every backend runs once per long edge in --max-edges, 0 being full resolution, and reports the
+encode time per image along with the DCT scale the JPEG is decoded at for that size.
+
+Run from the repository root:
+    python benchmarks/bench_encoders.py [--dir /path/to/jpgs] [--count 48] [--workers 8] [--quality 90]
+                                        [--max-edges 0,3000,1500,750]
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import encoders  # noqa: E402
+import synthetic_card  # noqa: E402
+
+
+def runBackend(encoder_name, paths, output_dir, num_workers, quality, max_edge=0):
+    encoder = encoders.getEncoder(encoder_name)
+    start = time.perf_counter()
+    with encoder.createPool(num_workers) as pool:
+        futures = [
+            pool.submit(encoders.encodeImage, encoder_name, path,
+                        os.path.join(output_dir, f"{encoder_name}_{os.path.basename(path)}"), quality,
+                        max_edge=max_edge)
+            for path in paths
+        ]
+        for future in as_completed(futures):
+            future.result()
+    return time.perf_counter() - start
+
+
+def draftScale(path, max_edge):
+    """ Denominator of the DCT scale a JPEG is decoded at for max_edge, e.g. 4 for 1/4. """
+    from PIL import Image
+    with Image.open(path) as image:
+        size = image.size
+        target_size = encoders.scaledSize(size, max_edge)
+        if target_size != size:
+            image.draft(None, target_size)
+        return size[0] // image.size[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", help="Directory of JPEGs to compress. Synthetic images are generated when omitted.")
+    parser.add_argument("--count", type=int, default=48, help="Number of synthetic images to generate.")
+    parser.add_argument("--size", default="6000x4000", help="Synthetic image size, WIDTHxHEIGHT.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Pool size for every backend.")
+    parser.add_argument("--quality", type=float, default=90.0)
+    parser.add_argument("--max-edges", default="0,3000,1500,750",
+                        help="Comma separated long edges of the output, 0 is full resolution.")
+    args = parser.parse_args()
+    max_edges = [int(edge) for edge in args.max_edges.split(",")]
+
+    with tempfile.TemporaryDirectory() as input_dir, tempfile.TemporaryDirectory() as output_dir:
+        directory = args.dir
+        if directory is None:
+            synthetic_card.makeCard(input_dir, folders=1, images=args.count,
+                                    image_size=synthetic_card.parseSize(args.size))
+            directory = os.path.join(input_dir, "DCIM", "100_FUJI")
+        paths = sorted(path for path in glob.glob(os.path.join(directory, "*"))
+                       if path.lower().endswith(".jpg"))
+        input_bytes = sum(os.path.getsize(path) for path in paths)
+
+        print(f"files: {len(paths)}  input: {input_bytes / 1e6:.1f} MB  workers: {args.workers}")
+        for encoder_name in encoders.ENCODERS:
+            if not encoders.getEncoder(encoder_name).available():
+                print(f"{encoder_name:>8}: not available")
+                continue
+            for max_edge in max_edges:
+                elapsed = runBackend(encoder_name, paths, output_dir, args.workers, args.quality, max_edge)
+                edge = f"{max_edge} px" if max_edge else "full"
+                print(f"{encoder_name:>8} {edge:>8} (scale 1/{draftScale(paths[0], max_edge)}): "
+                      f"{elapsed / len(paths) * 1000:7.1f} ms/image  {len(paths) / elapsed:7.2f} images/s  "
+                      f"{input_bytes / elapsed / 1e6:7.1f} MB/s  {elapsed:7.2f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
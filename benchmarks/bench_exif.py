@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+""" Micro-benchmark of core.getDateTaken against the previous full PIL open.
+
+Run from the repository root:
+    python benchmarks/bench_exif.py [--dir /Volumes/CARD/DCIM/100_FUJI] [--count 200] [--card-files 9000]
+"""
+import argparse
+import datetime
+import glob
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image  # noqa: E402
+import core  # noqa: E402
+import synthetic_card  # noqa: E402
+
+
+def legacyGetDateTaken(path):
+    """ getDateTaken as it was before the header-only reader. """
+    exif = Image.open(path)._getexif()
+    if not exif:
+        raise Exception('Image {0} does not have EXIF data.'.format(path))
+    result = datetime.datetime.strptime(exif[36867], "%Y:%m:%d %H:%M:%S")
+    return result.strftime('%Y/%m/%d %H:%M:%S')
+
+
+def timeFunction(function, paths, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for path in paths:
+            function(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", help="Directory of JPEGs to read. Synthetic images are generated when omitted.")
+    parser.add_argument("--count", type=int, default=200, help="Number of synthetic images to generate.")
+    parser.add_argument("--size", default="3000x2000", help="Synthetic image size, WIDTHxHEIGHT.")
+    parser.add_argument("--card-files", type=int, default=9000, help="Card size used to extrapolate per card times.")
+    parser.add_argument("--repeat", type=int, default=3, help="Best of this many passes is reported.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = args.dir
+        if directory is None:
+            synthetic_card.makeCard(temp_dir, folders=1, images=args.count,
+                                    image_size=synthetic_card.parseSize(args.size))
+            directory = os.path.join(temp_dir, "DCIM", "100_FUJI")
+        paths = sorted(path for path in glob.glob(os.path.join(directory, "*"))
+                       if path.lower().endswith(".jpg"))
+        if len(paths) == 0:
+            print(f"No JPEGs found in {directory}")
+            return 1
+
+        for path in paths:
+            assert core.getDateTaken(path) == legacyGetDateTaken(path), path
+
+        legacy = timeFunction(legacyGetDateTaken, paths, args.repeat)
+        fast = timeFunction(core.getDateTaken, paths, args.repeat)
+
+    print(f"files: {len(paths)}")
+    for name, elapsed in (("PIL open + _getexif", legacy), ("header-only reader", fast)):
+        per_file = elapsed / len(paths)
+        print(f"{name:>22}: {per_file * 1e6:9.1f} us/file  {per_file * args.card_files:7.2f} s per {args.card_files} file card")
+    print(f"{'speedup':>22}: {legacy / fast:9.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
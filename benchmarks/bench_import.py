@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+""" Times each import phase against a synthetic (or real) card, optionally throttled like an SD card.
+
+Every run appends one JSON line to --output so results from different commits or machines can be
+compared with --compare.
+
+Run from the repository root:
+    python benchmarks/bench_import.py --images 200 --movies 1 --throttle-mbps 90 --seek-ms 2
+    python benchmarks/bench_import.py --cards 4 --throttle-mbps 90
+    python benchmarks/bench_import.py --compare before.txt after.txt
+"""
+import argparse
+import builtins
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import copier  # noqa: E402
+import core  # noqa: E402
+import encoders  # noqa: E402
+import synthetic_card  # noqa: E402
+
+PHASES = ("scan", "resolve", "read", "write", "compress", "verify", "stamp", "movies")
+
+
+class CardThrottle(object):
+    """ Models a card reader: one request at a time, a fixed bandwidth and a penalty for every seek. """
+
+    def __init__(self, root, bandwidth, seek_latency):
+        self.root = os.path.abspath(root) + os.sep
+        self.bandwidth = bandwidth
+        self.seek_latency = seek_latency
+        self.lock = threading.Lock()
+        self.position = None
+        self.bytes_read = 0
+        self.seeks = 0
+
+    def covers(self, path):
+        return isinstance(path, (str, bytes, os.PathLike)) and os.path.abspath(os.fsdecode(path)).startswith(self.root)
+
+    def read(self, path, offset, num_bytes):
+        with self.lock:
+            delay = num_bytes / self.bandwidth
+            if self.position != (path, offset):
+                delay += self.seek_latency
+                self.seeks += 1
+            self.position = (path, offset + num_bytes)
+            self.bytes_read += num_bytes
+            time.sleep(delay)
+
+
+class ThrottledFile(object):
+    """ Wraps a binary file opened on the card so every read goes through a CardThrottle. """
+
+    def __init__(self, file_obj, path, throttle):
+        self._file = file_obj
+        self._path = path
+        self._throttle = throttle
+
+    def read(self, size=-1):
+        offset = self._file.tell()
+        data = self._file.read(size)
+        self._throttle.read(self._path, offset, len(data))
+        return data
+
+    def readinto(self, buffer):
+        offset = self._file.tell()
+        count = self._file.readinto(buffer)
+        self._throttle.read(self._path, offset, count or 0)
+        return count
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self._file.close()
+
+    def __iter__(self):
+        return iter(self._file)
+
+
+def installThrottle(throttles):
+    """ Routes reads of each card's files through its throttle, returns a function that undoes it. """
+    original_open = builtins.open
+    original_zero_copy = copier._ZERO_COPY
+
+    def _open(file, mode="r", *args, **kwargs):
+        file_obj = original_open(file, mode, *args, **kwargs)
+        if "r" in mode and "b" in mode:
+            for throttle in throttles:
+                if throttle.covers(file):
+                    return ThrottledFile(file_obj, os.fsdecode(file), throttle)
+        return file_obj
+
+    builtins.open = _open
+    # In-kernel copies would bypass the throttled reads.
+    copier._ZERO_COPY = []
+
+    def _restore():
+        builtins.open = original_open
+        copier._ZERO_COPY = original_zero_copy
+    return _restore
+
+
+def gitCommit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def runImport(cards, library, args):
+    for folder in ("JPG", "Compressed", "Video"):
+        os.makedirs(os.path.join(library, folder), exist_ok=True)
+    # Synthetic cards share one filesystem, so each is handed to the engine as its own card.
+    card_locations = [core.scanner.findImportLocations(card) for card in cards]
+    engine = core.ImportEngine(library, [location for locations in card_locations for location in locations],
+                               not args.no_compress,
+                               args.movies > 0, args.quality, card_readers=args.card_readers,
+                               dest_writers=args.dest_writers, encoder_workers=args.encoders,
+                               auto_tune=args.auto_tune, encoder_name=args.encoder,
+                               movie_copies=args.movie_copies, max_edge=args.max_edge, cards=card_locations,
+                               checksums=not args.no_checksums, verify_copies=args.verify)
+    start = time.perf_counter()
+    engine.run()
+    elapsed = time.perf_counter() - start
+    snapshot = engine.import_stats.snapshot()
+    phases = {}
+    for name in PHASES:
+        stage = snapshot["stages"][name]
+        phases[name] = {key: stage[key] for key in ("files", "wall_seconds", "busy_seconds", "mb_per_s", "bytes_read")}
+    return elapsed, phases, snapshot, engine.poolRates()
+
+
+def benchmark(args):
+    work_dir = tempfile.mkdtemp(prefix="photoimporter-bench-", dir=args.work_dir)
+    try:
+        cards = args.card
+        if cards is None:
+            cards = []
+            for index in range(args.cards):
+                card = os.path.join(work_dir, f"CARD{index}")
+                # Shot on different days, so no card holds duplicates of another's frames.
+                synthetic_card.makeCard(card, args.folders, args.images, args.movies, int(args.movie_mb * 1e6),
+                                        synthetic_card.parseSize(args.image_size), raws=args.raws,
+                                        raw_size=int(args.raw_mb * 1e6),
+                                        start=datetime.datetime(2024, 6, 1, 9, 0, 0) + datetime.timedelta(days=100 * index))
+                cards.append(card)
+
+        restore = None
+        throttles = []
+        if args.throttle_mbps > 0:
+            # One throttle per card, like a reader with a slot per card.
+            throttles = [CardThrottle(card, args.throttle_mbps * 1e6, args.seek_ms / 1000.0) for card in cards]
+            restore = installThrottle(throttles)
+        try:
+            results = []
+            for run in range(args.runs):
+                library = os.path.join(work_dir, f"LIBRARY{run}")
+                elapsed, phases, snapshot, pools = runImport(cards, library, args)
+                # A second pass over the same cards measures the "nothing new" path.
+                rescan_elapsed, rescan_phases, _, _ = runImport(cards, library, args)
+                results.append({
+                    "total_seconds": round(elapsed, 4),
+                    "rescan_seconds": round(rescan_elapsed, 4),
+                    "files": snapshot["files_done"],
+                    "bytes": snapshot["bytes_done"],
+                    "phases": phases,
+                    "rescan_phases": rescan_phases,
+                    "pools": pools,
+                    "card_seeks": sum(throttle.seeks for throttle in throttles) if throttles else None,
+                })
+                for throttle in throttles:
+                    throttle.seeks = 0
+        finally:
+            if restore is not None:
+                restore()
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "label": args.label,
+        "commit": gitCommit(),
+        "machine": {"hostname": platform.node(), "platform": platform.platform(), "cpu_count": os.cpu_count()},
+        "params": {
+            "card": args.card, "cards": len(cards), "folders": args.folders, "images": args.images, "movies": args.movies,
+            "movie_mb": args.movie_mb, "image_size": args.image_size, "raws": args.raws,
+            "card_readers": args.card_readers, "dest_writers": args.dest_writers, "encoders": args.encoders,
+            "auto_tune": args.auto_tune,
+            "encoder": args.encoder, "quality": args.quality, "max_edge": args.max_edge, "compress": not args.no_compress,
+            "checksums": not args.no_checksums, "verify": args.verify,
+            "movie_copies": args.movie_copies, "throttle_mbps": args.throttle_mbps, "seek_ms": args.seek_ms,
+        },
+        "runs": results,
+    }
+
+
+def printResult(result):
+    runs = result["runs"]
+    print(f"{result['label'] or result['commit'] or ''}  {len(runs)} run(s)  params: {json.dumps(result['params'])}")
+    print(f"{'phase':>10} {'wall s':>9} {'busy s':>9} {'MB/s':>9}")
+    for name in PHASES:
+        wall = statistics.median(run["phases"][name]["wall_seconds"] for run in runs)
+        busy = statistics.median(run["phases"][name]["busy_seconds"] for run in runs)
+        rate = statistics.median(run["phases"][name]["mb_per_s"] for run in runs)
+        print(f"{name:>10} {wall:9.3f} {busy:9.3f} {rate:9.1f}")
+    print(f"{'total':>10} {statistics.median(run['total_seconds'] for run in runs):9.3f}")
+    print(f"{'rescan':>10} {statistics.median(run['rescan_seconds'] for run in runs):9.3f}")
+    print(f"{'pools':>10} " + ", ".join(f"{name} {pool['workers']}" for name, pool in runs[-1]["pools"].items()))
+
+
+def loadResults(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(path_a, path_b):
+    """ Compares the last result of two output files phase by phase. """
+    result_a = loadResults(path_a)[-1]
+    result_b = loadResults(path_b)[-1]
+
+    def _median(result, key, phase=None):
+        if phase is None:
+            return statistics.median(run[key] for run in result["runs"])
+        # Results from before a phase existed count it as zero.
+        return statistics.median(run["phases"].get(phase, {}).get(key, 0.0) for run in result["runs"])
+
+    print(f"{'':>10} {'A':>9} {'B':>9} {'B/A':>7}   A={path_a} B={path_b}")
+    rows = [(name, _median(result_a, "wall_seconds", name), _median(result_b, "wall_seconds", name)) for name in PHASES]
+    rows.append(("total", _median(result_a, "total_seconds"), _median(result_b, "total_seconds")))
+    rows.append(("rescan", _median(result_a, "rescan_seconds"), _median(result_b, "rescan_seconds")))
+    for name, value_a, value_b in rows:
+        ratio = f"{value_b / value_a:7.2f}" if value_a > 0 else "     --"
+        print(f"{name:>10} {value_a:9.3f} {value_b:9.3f} {ratio}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--card", action="append",
+                        help="Existing card to import instead of synthetic ones. May be given more than once.")
+    parser.add_argument("--cards", type=int, default=1, help="Synthetic cards, each read through its own reader.")
+    parser.add_argument("--folders", type=int, default=2)
+    parser.add_argument("--images", type=int, default=100, help="JPEGs per folder.")
+    parser.add_argument("--movies", type=int, default=0, help="Movies per folder.")
+    parser.add_argument("--movie-mb", type=float, default=64)
+    parser.add_argument("--image-size", default="3000x2000")
+    parser.add_argument("--raws", choices=("pairs", "only"), help="RAFs next to or instead of the JPEGs.")
+    parser.add_argument("--raw-mb", type=float, default=32)
+    parser.add_argument("--card-readers", type=int, default=1)
+    parser.add_argument("--dest-writers", type=int, default=4)
+    parser.add_argument("--encoders", type=int, default=core.defaultEncoderWorkers())
+    parser.add_argument("--auto-tune", action="store_true")
+    parser.add_argument("--encoder", choices=sorted(encoders.ENCODERS), default=encoders.DEFAULT_ENCODER)
+    parser.add_argument("--quality", type=float, default=90.0)
+    parser.add_argument("--max-edge", type=int, default=0, help="Long edge of the Compressed images, 0 for full size.")
+    parser.add_argument("--no-compress", action="store_true")
+    parser.add_argument("--no-checksums", action="store_true", help="Import without hashing the originals.")
+    parser.add_argument("--verify", action="store_true", help="Read every copy back and compare checksums.")
+    parser.add_argument("--movie-copies", type=int, default=2)
+    parser.add_argument("--throttle-mbps", type=float, default=0,
+                        help="Limit card reads to this many MB/s, 0 reads at full speed.")
+    parser.add_argument("--seek-ms", type=float, default=0, help="Penalty for every non-sequential card read.")
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--label", help="Name stored with the result.")
+    parser.add_argument("--work-dir", help="Where the synthetic card and libraries are created.")
+    parser.add_argument("--keep", action="store_true", help="Keep the card and libraries afterwards.")
+    parser.add_argument("--output", default="bench_output.txt", help="File the JSON result line is appended to.")
+    parser.add_argument("--compare", nargs=2, metavar=("A", "B"), help="Compare the last results of two outputs.")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    result = benchmark(args)
+    printResult(result)
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write(json.dumps(result) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+""" Card read strategies under a throttled card: many threads copying files in completion order
+against one reader sweeping the files in on-disk order and handing buffers to writer threads.
+
+Run from the repository root:
+    python benchmarks/bench_reader.py --images 200 --throttle-mbps 90 --seek-ms 2
+"""
+import argparse
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cardreader  # noqa: E402
+import copier  # noqa: E402
+import synthetic_card  # noqa: E402
+from bench_import import CardThrottle, installThrottle  # noqa: E402
+
+
+def parallelCopy(paths, output_dir, num_workers, chunk_size):
+    """ The old approach: every file submitted at once, copied by a pool of threads. """
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        futures = [executor.submit(copier.copyFile, path, os.path.join(output_dir, os.path.basename(path)), chunk_size)
+                   for path in paths]
+        for future in as_completed(futures):
+            future.result()
+
+
+def sequentialRead(paths, output_dir, num_writers):
+    """ One reader in disk order, writes overlap the next reads. """
+    buffers = queue.Queue(maxsize=8)
+
+    def _writeThread():
+        while True:
+            job = buffers.get()
+            if job is None:
+                return
+            copier.writeFile(*job)
+
+    writers = [threading.Thread(target=_writeThread) for _ in range(num_writers)]
+    for writer in writers:
+        writer.start()
+    for path in cardreader.diskOrder(paths):
+        buffers.put((os.path.join(output_dir, os.path.basename(path)), cardreader.readFile(path)))
+    for _ in writers:
+        buffers.put(None)
+    for writer in writers:
+        writer.join()
+
+
+def dropCaches(paths):
+    # Without a throttle the second strategy would read from the page cache.
+    for path in paths:
+        if hasattr(os, "posix_fadvise"):
+            with open(path, "rb") as f:
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", help="Folder of card files to read. A synthetic card is generated when omitted.")
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--image-size", default="3000x2000")
+    parser.add_argument("--threads", type=int, default=8, help="Threads of the parallel copy.")
+    parser.add_argument("--chunk-kb", type=int, default=1024, help="Read size of the parallel copy, shutil uses 64 KiB to 1 MiB.")
+    parser.add_argument("--writers", type=int, default=4, help="Writer threads behind the sequential reader.")
+    parser.add_argument("--throttle-mbps", type=float, default=90)
+    parser.add_argument("--seek-ms", type=float, default=2)
+    parser.add_argument("--work-dir")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="photoimporter-reader-", dir=args.work_dir)
+    try:
+        directory = args.dir
+        if directory is None:
+            synthetic_card.makeCard(os.path.join(work_dir, "CARD"), 1, args.images,
+                                    image_size=synthetic_card.parseSize(args.image_size))
+            directory = os.path.join(work_dir, "CARD", "DCIM", "100_FUJI")
+        paths = sorted(os.path.join(directory, name) for name in os.listdir(directory) if not name.startswith("."))
+        total = sum(os.path.getsize(path) for path in paths)
+        print(f"files: {len(paths)}  {total / 1e6:.1f} MB  throttle: {args.throttle_mbps} MB/s, {args.seek_ms} ms/seek")
+
+        strategies = [
+            (f"parallel copy x{args.threads}", lambda output_dir: parallelCopy(
+                paths, output_dir, args.threads, args.chunk_kb * 1024)),
+            ("sequential reader", lambda output_dir: sequentialRead(paths, output_dir, args.writers)),
+        ]
+        for name, function in strategies:
+            output_dir = tempfile.mkdtemp(dir=work_dir)
+            dropCaches(paths)
+            throttle = None
+            restore = None
+            if args.throttle_mbps > 0:
+                throttle = CardThrottle(directory, args.throttle_mbps * 1e6, args.seek_ms / 1000.0)
+                restore = installThrottle(throttle)
+            try:
+                start = time.perf_counter()
+                function(output_dir)
+                elapsed = time.perf_counter() - start
+            finally:
+                if restore is not None:
+                    restore()
+            seeks = f"{throttle.seeks:6d} seeks" if throttle is not None else ""
+            print(f"{name:>22}: {elapsed:7.2f} s  {total / elapsed / 1e6:7.1f} MB/s  {seeks}")
+            shutil.rmtree(output_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+""" How long the GUI thread's event loop stalls while paths are typed and while an import runs.
+
+A timer that should fire every few milliseconds records how late each tick is, which is the delay
+the window would add to any click, keystroke or repaint. Paths under a fake network share answer
+every stat and listing only after --slow-ms, like a NAS over a slow link. Exits 1 when the longest
+stall of either phase is above --max-latency-ms.
+
+Run from the repository root:
+    python benchmarks/bench_ui_latency.py --images 300 --slow-ms 500
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic_card  # noqa: E402
+
+TICK_MS = 5
+
+
+class SlowShare(object):
+    """ Delays exists, isdir, scandir and disk_usage of every path under root. """
+
+    def __init__(self, root, delay):
+        self.root = os.path.abspath(root)
+        self.delay = delay
+        self.calls = 0
+        self._originals = []
+
+    def _wrap(self, module, name):
+        original = getattr(module, name)
+
+        def _slow(path, *args, **kwargs):
+            if isinstance(path, (str, os.PathLike)) and os.path.abspath(os.fspath(path)).startswith(self.root):
+                self.calls += 1
+                time.sleep(self.delay)
+            return original(path, *args, **kwargs)
+        self._originals.append((module, name, original))
+        setattr(module, name, _slow)
+
+    def install(self):
+        self._wrap(os.path, "exists")
+        self._wrap(os.path, "isdir")
+        self._wrap(os, "scandir")
+        self._wrap(shutil, "disk_usage")
+
+    def restore(self):
+        for module, name, original in reversed(self._originals):
+            setattr(module, name, original)
+        self._originals = []
+
+
+class LatencyMonitor(object):
+    """ Records how late a TICK_MS timer on the GUI thread fires, in milliseconds. """
+
+    def __init__(self, QtCore):
+        self.samples = []
+        self._last = None
+        self.timer = QtCore.QTimer()
+        self.timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self.timer.setInterval(TICK_MS)
+        self.timer.timeout.connect(self._tick)
+
+    def _tick(self):
+        now = time.perf_counter()
+        if self._last is not None:
+            self.samples.append(max(0.0, (now - self._last) * 1000.0 - TICK_MS))
+        self._last = now
+
+    def start(self):
+        self.samples = []
+        self._last = None
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+        return self.summary()
+
+    def summary(self):
+        samples = sorted(self.samples) or [0.0]
+        return {
+            "ticks": len(self.samples),
+            "p50_ms": round(statistics.median(samples), 2),
+            "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+            "max_ms": round(samples[-1], 2),
+        }
+
+
+def spin(app, seconds, condition=None):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end and (condition is None or not condition()):
+        app.processEvents()
+        time.sleep(0.001)
+
+
+def benchmark(args):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6 import QtCore, QtWidgets
+    work_dir = tempfile.mkdtemp(prefix="photoimporter-ui-", dir=args.work_dir)
+    # Default settings from a scratch file, the user's are neither used nor overwritten.
+    QtCore.QSettings.setPath(QtCore.QSettings.NativeFormat, QtCore.QSettings.UserScope, work_dir)
+    qt_app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    import app
+
+    share = SlowShare(os.path.join(work_dir, "NAS"), args.slow_ms / 1000.0)
+    try:
+        card = os.path.join(work_dir, "CARD")
+        library = os.path.join(work_dir, "LIBRARY")
+        synthetic_card.makeCard(card, args.folders, args.images, 0, image_size=synthetic_card.parseSize(args.image_size))
+        for folder in ("JPG", "Compressed", "Video"):
+            os.makedirs(os.path.join(library, folder))
+        os.makedirs(os.path.join(share.root, "Volumes", "CARD"))
+
+        window = app.MainWindow()
+        window.say = lambda message: None
+        monitor = LatencyMonitor(QtCore)
+        window.file_picker_dst.setText(library)
+        spin(qt_app, 1.0)
+        share.install()
+        try:
+            # Typed one character at a time, the way a path is entered by hand.
+            monitor.start()
+            path = os.path.join(share.root, "Volumes", "CARD")
+            for index in range(len(path) - len(args.typed_suffix) if args.typed_suffix else 0, len(path) + 1):
+                window.file_picker_src.line_edit.setText(path[:index])
+                spin(qt_app, args.keystroke_ms / 1000.0)
+            spin(qt_app, 2 * args.slow_ms / 1000.0 + 0.5)
+            typing = monitor.stop()
+            typing["slow_calls"] = share.calls
+        finally:
+            share.restore()
+
+        window.file_picker_src.setText(card)
+        spin(qt_app, 1.0)
+        progress_signals = [0]
+        monitor.start()
+        start = time.perf_counter()
+        window._runImport()
+        spin(qt_app, 10.0, lambda: window.thread_import.isRunning())
+        # Every progress signal is one more event the GUI thread has to handle.
+        for signal in (window.worker.progress, window.worker.prange, window.worker.card_progress):
+            signal.connect(lambda *args: progress_signals.__setitem__(0, progress_signals[0] + 1))
+        spin(qt_app, args.timeout, lambda: not window.thread_import.isRunning())
+        elapsed = time.perf_counter() - start
+        spin(qt_app, 0.2)
+        importing = monitor.stop()
+        importing["seconds"] = round(elapsed, 3)
+        importing["progress_signals"] = progress_signals[0]
+        importing["signals_per_s"] = round(progress_signals[0] / elapsed, 1) if elapsed > 0 else 0.0
+        window.close()
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "label": args.label,
+        "params": {"images": args.images, "folders": args.folders, "image_size": args.image_size,
+                   "slow_ms": args.slow_ms, "keystroke_ms": args.keystroke_ms},
+        "typing": typing,
+        "import": importing,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--folders", type=int, default=1)
+    parser.add_argument("--images", type=int, default=300, help="JPEGs per folder.")
+    parser.add_argument("--image-size", default="640x480", help="Small images import fastest, the most progress.")
+    parser.add_argument("--slow-ms", type=float, default=500, help="Delay of every lookup on the fake share.")
+    parser.add_argument("--keystroke-ms", type=float, default=80, help="Time between typed characters.")
+    parser.add_argument("--typed-suffix", default="Volumes/CARD",
+                        help="Only the end of the path is typed, the rest is pasted at once.")
+    parser.add_argument("--max-latency-ms", type=float, default=100,
+                        help="Fail when the longest stall of a phase is above this.")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--label", help="Name stored with the result.")
+    parser.add_argument("--work-dir", help="Where the synthetic card, library and share are created.")
+    parser.add_argument("--keep", action="store_true")
+    parser.add_argument("--output", help="File the JSON result line is appended to.")
+    args = parser.parse_args()
+
+    result = benchmark(args)
+    print(f"{'phase':>8} {'ticks':>7} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for phase in ("typing", "import"):
+        entry = result[phase]
+        print(f"{phase:>8} {entry['ticks']:>7} {entry['p50_ms']:>8.2f} {entry['p95_ms']:>8.2f} {entry['max_ms']:>8.2f}")
+    print(f"typing: {result['typing']['slow_calls']} lookups on the slow share")
+    print(f"import: {result['import']['seconds']:.2f} s, {result['import']['progress_signals']} progress signals "
+          f"({result['import']['signals_per_s']:.1f}/s)")
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write(json.dumps(result) + "\n")
+    worst = max(result["typing"]["max_ms"], result["import"]["max_ms"])
+    if worst > args.max_latency_ms:
+        print(f"FAIL: {worst:.1f} ms stall is above {args.max_latency_ms:.0f} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    code = main()
+    sys.stdout.flush()
+    # Skips Qt's teardown, which can stall on the daemon probe threads still sleeping on the share.
+    os._exit(code)
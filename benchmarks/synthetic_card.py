@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+""" Builds a fake camera card: DCIM/100_FUJI style folders of EXIF dated JPEGs, RAFs and dummy movies.
+
+Run from the repository root:
+    python benchmarks/synthetic_card.py /tmp/CARD --folders 2 --images 200 --movies 2 --movie-mb 512
+"""
+import argparse
+import datetime
+import io
+import os
+import struct
+import sys
+
+from PIL import Image
+
+_MOVIE_CHUNK = 8 * 1024 * 1024
+
+# Offset of the embedded JPEG in the RAFs written here, the header and directory come first.
+_RAF_JPEG_OFFSET = 0x94
+
+
+def _encodePixels(size, quality, seed):
+    # Noise compresses about like a real photo, a flat color would give unrealistically small files.
+    width, height = size
+    channels = []
+    for index in range(3):
+        offset = seed * 37 + index * 90
+        noise = Image.effect_noise((width, height), 40 + 10 * index)
+        channels.append(noise.point(lambda value, offset=offset: (value + offset) % 256))
+    buffer = io.BytesIO()
+    Image.merge("RGB", channels).save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def _exifSegment(date_time):
+    exif = Image.Exif()
+    exif[0x010F] = "FUJIFILM"
+    exif[0x0110] = "X-T5"
+    exif[0x0132] = date_time
+    exif.get_ifd(0x8769)[0x9003] = date_time
+    payload = exif.tobytes()
+    if not payload.startswith(b"Exif\x00\x00"):
+        payload = b"Exif\x00\x00" + payload
+    return b"\xff\xe1" + struct.pack(">H", len(payload) + 2) + payload
+
+
+def makeJpeg(path, size, date, quality=90, pixels=None):
+    """ Writes a JPEG with DateTimeOriginal set to date, pixels is reusable encoded image data. """
+    if pixels is None:
+        pixels = _encodePixels(size, quality, 0)
+    # Splice a fresh Exif APP1 segment after the SOI so every frame gets its own date.
+    with open(path, "wb") as f:
+        f.write(_jpegBytes(date, pixels))
+    timestamp = date.timestamp()
+    os.utime(path, (timestamp, timestamp))
+
+
+def _jpegBytes(date, pixels):
+    return b"\xff\xd8" + _exifSegment(date.strftime("%Y:%m:%d %H:%M:%S")) + pixels[2:]
+
+
+def makeRaf(path, date, pixels, raw_size):
+    """ Writes a RAF shaped file: Fuji header, the dated JPEG as its preview and raw_size bytes of sensor noise. """
+    preview = _jpegBytes(date, pixels)
+    raw_offset = _RAF_JPEG_OFFSET + len(preview)
+    header = b"FUJIFILMCCD-RAW 0201FF383501" + b"X-T5".ljust(32, b"\x00") + b"0100" + bytes(20)
+    header += struct.pack(">IIIIII", _RAF_JPEG_OFFSET, len(preview), raw_offset, 0, raw_offset, raw_size)
+    with open(path, "wb") as f:
+        f.write(header.ljust(_RAF_JPEG_OFFSET, b"\x00"))
+        f.write(preview)
+        f.write(os.urandom(raw_size))
+    timestamp = date.timestamp()
+    os.utime(path, (timestamp, timestamp))
+
+
+def makeMovie(path, size, date):
+    pattern = os.urandom(min(size, _MOVIE_CHUNK)) if size > 0 else b""
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining > 0:
+            chunk = pattern[:remaining]
+            f.write(chunk)
+            remaining -= len(chunk)
+    timestamp = date.timestamp()
+    os.utime(path, (timestamp, timestamp))
+
+
+def makeCard(root, folders=2, images=100, movies=0, movie_size=64 * 1024 * 1024, image_size=(3000, 2000),
+             start=datetime.datetime(2024, 6, 1, 9, 0, 0), frames_per_day=150, variants=4, quality=90,
+             raws=None, raw_size=32 * 1024 * 1024):
+    """ Creates root/DCIM/1NN_FUJI folders holding images and movies per folder, returns the paths written.
+
+    Frame numbers run on across folders like a camera's counter, capture times advance by a few
+    seconds per frame and roll over to the next day every frames_per_day frames. raws "pairs"
+    writes a RAF next to every JPEG, "only" writes RAFs instead of JPEGs.
+    """
+    pixel_variants = [_encodePixels(image_size, quality, seed) for seed in range(max(1, variants))]
+    written = []
+    frame = 0
+    for folder_index in range(folders):
+        folder = os.path.join(root, "DCIM", f"{100 + folder_index}_FUJI")
+        os.makedirs(folder, exist_ok=True)
+        for index in range(images + movies):
+            frame += 1
+            day, offset = divmod(frame - 1, frames_per_day)
+            date = start + datetime.timedelta(days=day, seconds=offset * 7)
+            if index < images:
+                pixels = pixel_variants[frame % len(pixel_variants)]
+                if raws is not None:
+                    path = os.path.join(folder, f"DSCF{frame:04d}.RAF")
+                    makeRaf(path, date, pixels, raw_size)
+                    written.append(path)
+                if raws == "only":
+                    continue
+                path = os.path.join(folder, f"DSCF{frame:04d}.JPG")
+                makeJpeg(path, image_size, date, quality, pixels)
+            else:
+                path = os.path.join(folder, f"DSCF{frame:04d}.MOV")
+                makeMovie(path, movie_size, date)
+            written.append(path)
+    return written
+
+
+def parseSize(text):
+    width, height = (int(value) for value in text.lower().split("x"))
+    return width, height
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root", help="Folder to create the card in.")
+    parser.add_argument("--folders", type=int, default=2, help="Number of DCIM camera folders.")
+    parser.add_argument("--images", type=int, default=100, help="JPEGs per folder.")
+    parser.add_argument("--movies", type=int, default=0, help="Movies per folder.")
+    parser.add_argument("--movie-mb", type=float, default=64, help="Size of each movie in MB.")
+    parser.add_argument("--image-size", default="3000x2000", help="JPEG size, WIDTHxHEIGHT.")
+    parser.add_argument("--raws", choices=("pairs", "only"), help="Write RAFs next to or instead of the JPEGs.")
+    parser.add_argument("--raw-mb", type=float, default=32, help="Size of the sensor data of each RAF in MB.")
+    args = parser.parse_args()
+
+    written = makeCard(args.root, args.folders, args.images, args.movies, int(args.movie_mb * 1e6),
+                       parseSize(args.image_size), raws=args.raws, raw_size=int(args.raw_mb * 1e6))
+    total = sum(os.path.getsize(path) for path in written)
+    print(f"Wrote {len(written)} files, {total / 1e6:.1f} MB to {args.root}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
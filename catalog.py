@@ -0,0 +1,238 @@
+import argparse
+import datetime
+import os
+import sqlite3
+import sys
+import threading
+
+import tracing
+
+_SCHEMA_VERSION = 1
+
+_DATE_FORMAT = "%Y_%m_%d"
+
+
+def _dateOfFolder(name):
+    try:
+        return datetime.datetime.strptime(name, _DATE_FORMAT).date()
+    except ValueError:
+        return None
+
+
+class LibraryCatalog(object):
+    """ In-memory listing of the library's date folders, so deciding what exists never touches the disk.
+
+    The listing is persisted with each date folder's mtime. A refresh lists the top folders
+    (JPG, Compressed, Video) and rescans only the date folders whose mtime changed, which any
+    file added, removed or renamed in them does. Files written by an import are added as they
+    land, and the folders they went to are rescanned by the next refresh.
+    """
+
+    def __init__(self, db_path, library_dir):
+        self.db_path = db_path
+        self.library_dir = library_dir
+        self._lock = threading.Lock()
+        # {rel_dir: {name: (size, mtime_ns)}} and {rel_dir: mtime_ns when it was listed}
+        self._dirs = {}
+        self._dir_mtimes = {}
+        self._rescanned = set()
+        self._removed_dirs = set()
+        self._added = {}
+        self._load()
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        connection = sqlite3.connect(self.db_path)
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != _SCHEMA_VERSION:
+            connection.execute("DROP TABLE IF EXISTS dirs")
+            connection.execute("DROP TABLE IF EXISTS files")
+            connection.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        connection.execute("CREATE TABLE IF NOT EXISTS dirs (rel_dir TEXT PRIMARY KEY, mtime_ns INTEGER)")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "rel_dir TEXT, name TEXT, size INTEGER, mtime_ns INTEGER, PRIMARY KEY (rel_dir, name))")
+        return connection
+
+    def _load(self):
+        try:
+            connection = self._connect()
+            try:
+                dirs = connection.execute("SELECT rel_dir, mtime_ns FROM dirs").fetchall()
+                files = connection.execute("SELECT rel_dir, name, size, mtime_ns FROM files").fetchall()
+            finally:
+                connection.close()
+        except sqlite3.DatabaseError:
+            # Rebuilt by the next refresh.
+            if os.path.exists(self.db_path):
+                os.remove(self.db_path)
+            dirs, files = [], []
+        for rel_dir, mtime_ns in dirs:
+            self._dir_mtimes[rel_dir] = mtime_ns
+            self._dirs[rel_dir] = {}
+        for rel_dir, name, size, mtime_ns in files:
+            if rel_dir in self._dirs:
+                self._dirs[rel_dir][name] = (size, mtime_ns)
+
+    @tracing.traced("catalog.refresh", "check")
+    def refresh(self, folders, is_canceled=None):
+        """ Brings the catalog up to date with folders (relative to the library) and their date folders.
+
+        Returns the number of date folders that had to be listed, or None if is_canceled() stopped it.
+        """
+        rescanned = 0
+        seen = set()
+        for folder in folders:
+            root = os.path.join(self.library_dir, folder)
+            if not os.path.isdir(root):
+                continue
+            with os.scandir(root) as date_dirs:
+                for date_dir in date_dirs:
+                    if is_canceled is not None and is_canceled():
+                        return None
+                    if date_dir.name.startswith(".") or not date_dir.is_dir():
+                        continue
+                    rel_dir = os.path.join(folder, date_dir.name)
+                    seen.add(rel_dir)
+                    # Taken before listing, a file landing during the scan leaves the folder stale.
+                    mtime_ns = date_dir.stat().st_mtime_ns
+                    if self._dir_mtimes.get(rel_dir) == mtime_ns:
+                        continue
+                    self._scanDir(rel_dir, mtime_ns)
+                    rescanned += 1
+        with self._lock:
+            for rel_dir in [rel_dir for rel_dir in self._dirs
+                            if rel_dir not in seen and rel_dir.split(os.sep)[0] in folders]:
+                del self._dirs[rel_dir]
+                self._dir_mtimes.pop(rel_dir, None)
+                self._rescanned.discard(rel_dir)
+                self._removed_dirs.add(rel_dir)
+        return rescanned
+
+    def _scanDir(self, rel_dir, mtime_ns):
+        listing = {}
+        with os.scandir(os.path.join(self.library_dir, rel_dir)) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") or not entry.is_file():
+                    continue
+                stat_result = entry.stat()
+                listing[entry.name] = (stat_result.st_size, stat_result.st_mtime_ns)
+        with self._lock:
+            self._dirs[rel_dir] = listing
+            self._dir_mtimes[rel_dir] = mtime_ns
+            self._rescanned.add(rel_dir)
+            self._removed_dirs.discard(rel_dir)
+
+    def contains(self, rel_path):
+        rel_dir, name = os.path.split(rel_path)
+        listing = self._dirs.get(rel_dir)
+        return listing is not None and name in listing
+
+    def size(self, rel_path):
+        """ Size of rel_path in bytes, None if it isn't in the library. """
+        rel_dir, name = os.path.split(rel_path)
+        entry = self._dirs.get(rel_dir, {}).get(name)
+        return entry[0] if entry is not None else None
+
+    def mtime(self, rel_path):
+        """ Modification time of rel_path in ns, None if it isn't in the library or wasn't listed yet. """
+        rel_dir, name = os.path.split(rel_path)
+        entry = self._dirs.get(rel_dir, {}).get(name)
+        return entry[1] if entry is not None else None
+
+    def names(self, rel_dir):
+        """ Names of the files in the date folder rel_dir. """
+        with self._lock:
+            return list(self._dirs.get(rel_dir, {}))
+
+    def hasDir(self, rel_dir):
+        return rel_dir in self._dirs
+
+    def files(self, folder):
+        """ Returns [(rel_path, size, mtime_ns)] of every file in the date folders of folder. """
+        with self._lock:
+            return [(os.path.join(rel_dir, name), size, mtime_ns)
+                    for rel_dir, listing in self._dirs.items() if rel_dir.split(os.sep)[0] == folder
+                    for name, (size, mtime_ns) in listing.items()]
+
+    def between(self, start, end, folder="JPG"):
+        """ Sorted paths in folder taken from start to end, both datetime.date and inclusive. """
+        with self._lock:
+            rel_dirs = [rel_dir for rel_dir in self._dirs if rel_dir.split(os.sep)[0] == folder]
+            paths = []
+            for rel_dir in rel_dirs:
+                date = _dateOfFolder(os.path.basename(rel_dir))
+                if date is not None and start <= date <= end:
+                    paths.extend(os.path.join(rel_dir, name) for name in self._dirs[rel_dir])
+        return sorted(paths)
+
+    def addDir(self, rel_dir):
+        with self._lock:
+            # No mtime, so the next refresh lists it.
+            self._dirs.setdefault(rel_dir, {})
+
+    def add(self, rel_path, size, mtime_ns=None):
+        """ Records a file written to the library. """
+        rel_dir, name = os.path.split(rel_path)
+        entry = (size, mtime_ns)
+        with self._lock:
+            self._dirs.setdefault(rel_dir, {})[name] = entry
+            self._added[rel_path] = entry
+
+    def save(self):
+        with self._lock:
+            rescanned = {rel_dir: self._dirs[rel_dir] for rel_dir in self._rescanned}
+            removed_dirs = list(self._removed_dirs)
+            added = dict(self._added)
+            mtimes = {rel_dir: self._dir_mtimes[rel_dir] for rel_dir in rescanned}
+            self._rescanned = set()
+            self._removed_dirs = set()
+            self._added = {}
+        if not rescanned and not removed_dirs and not added:
+            return
+        try:
+            connection = self._connect()
+            try:
+                with connection:
+                    for rel_dir in removed_dirs + list(rescanned):
+                        connection.execute("DELETE FROM dirs WHERE rel_dir = ?", (rel_dir,))
+                        connection.execute("DELETE FROM files WHERE rel_dir = ?", (rel_dir,))
+                    for rel_dir, listing in rescanned.items():
+                        connection.execute("INSERT INTO dirs VALUES (?, ?)", (rel_dir, mtimes[rel_dir]))
+                        connection.executemany(
+                            "INSERT INTO files VALUES (?, ?, ?, ?)",
+                            [(rel_dir, name, size, mtime_ns) for name, (size, mtime_ns) in listing.items()])
+                    # Folders written to keep their old mtime, so the next refresh lists them again.
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                        [os.path.split(rel_path) + entry for rel_path, entry in added.items()])
+            finally:
+                connection.close()
+        except sqlite3.DatabaseError as e:
+            print(f"Warning: could not save library catalog {self.db_path}: {e}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m catalog", description="List the images of a PhotoImporter library taken between two dates.")
+    parser.add_argument("--library", required=True, help="Library folder.")
+    parser.add_argument("--from", dest="start", required=True, help="First date, YYYY-MM-DD.")
+    parser.add_argument("--to", dest="end", help="Last date, YYYY-MM-DD (default the first date).")
+    parser.add_argument("--folder", default="JPG", help="JPG, Compressed or Video (default JPG).")
+    args = parser.parse_args(argv)
+
+    try:
+        start = datetime.date.fromisoformat(args.start)
+        end = datetime.date.fromisoformat(args.end) if args.end else start
+    except ValueError as e:
+        parser.error(str(e))
+    library_catalog = LibraryCatalog(os.path.join(args.library, ".photoimporter", "catalog.sqlite"), args.library)
+    library_catalog.refresh([args.folder])
+    library_catalog.save()
+    for rel_path in library_catalog.between(start, end, args.folder):
+        print(os.path.join(args.library, rel_path))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
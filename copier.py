@@ -0,0 +1,280 @@
+import ctypes
+import ctypes.util
+import errno
+import hashlib
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import scheduler
+import tracing
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+
+# Large power of two chunks keep readers streaming and stay aligned to any sector or page size.
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Errors that mean the kernel can't do an in-kernel copy between these two files.
+_ZERO_COPY_ERRORS = (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EPERM, errno.EBADF)
+
+
+class CopyCanceled(Exception):
+    # Raised by copyFiles, the (input_file, output_file, error, hex_digest) of the jobs that finished first.
+    results = ()
+
+
+class ChecksumMismatch(Exception):
+    """ A copy read back from the destination doesn't hash to what was read from the source. """
+    pass
+
+
+def _zeroCopyFunctions():
+    functions = []
+    if hasattr(os, "copy_file_range"):
+        functions.append(lambda fd_in, fd_out, count: os.copy_file_range(fd_in, fd_out, count))
+    if sys.platform.startswith("linux") and hasattr(os, "sendfile"):
+        # Linux sendfile accepts regular files as the destination, other platforms want a socket.
+        functions.append(lambda fd_in, fd_out, count: os.sendfile(fd_out, fd_in, None, count))
+    return functions
+
+
+_ZERO_COPY = _zeroCopyFunctions()
+
+# Linux FICLONE: makes the destination share the source's extents on btrfs, XFS and similar.
+_FICLONE = 0x40049409
+
+
+def _macClonefile():
+    if sys.platform != "darwin":
+        return None
+    try:
+        function = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True).clonefile
+    except (OSError, AttributeError):
+        return None
+    function.argtypes = (ctypes.c_char_p, ctypes.c_char_p, ctypes.c_uint32)
+    return function
+
+
+_CLONEFILE = _macClonefile()
+
+
+def partialPath(output_file):
+    """ Hidden name output_file is written under until it is complete. """
+    directory, name = os.path.split(output_file)
+    return os.path.join(directory, f".{name}.partial")
+
+
+@tracing.traced(category="io")
+def copyFile(input_file, output_file, chunk_size=DEFAULT_CHUNK_SIZE, progress=None, is_canceled=None, digest=None):
+    """ Copies input_file to output_file in chunks and returns the number of bytes copied.
+
+    The data is written to a temporary file that only replaces output_file once it is complete,
+    so an interrupted copy never leaves a truncated output_file. progress(num_bytes) is called
+    after every chunk. When is_canceled() turns true the copy stops between chunks, the partial
+    output is removed and CopyCanceled is raised. digest, a hashlib object, is updated with every
+    chunk as it passes through, which rules out the in-kernel copies.
+    """
+    temp_file = partialPath(output_file)
+    try:
+        with open(input_file, "rb", buffering=0) as fsrc, open(temp_file, "wb", buffering=0) as fdst:
+            copied = _copyData(fsrc, fdst, chunk_size, progress, is_canceled, digest)
+        os.replace(temp_file, output_file)
+        return copied
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+
+@tracing.traced(category="io")
+def writeFile(output_file, data):
+    """ Writes data to output_file through a temporary file like copyFile, returns the bytes written. """
+    temp_file = partialPath(output_file)
+    try:
+        with open(temp_file, "wb", buffering=0) as fdst:
+            view = memoryview(data)
+            written = 0
+            while written < len(data):
+                written += fdst.write(view[written:])
+        os.replace(temp_file, output_file)
+        return written
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+
+def _dropCache(path):
+    # Written pages can only be dropped once they are on the disk.
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+@tracing.traced(category="io")
+def hashFile(path, digest, chunk_size=DEFAULT_CHUNK_SIZE, uncached=False, is_canceled=None):
+    """ Reads path through digest, a hashlib object, and returns its hex digest.
+
+    uncached reads the file back from the disk instead of the page cache the copy just filled,
+    where the platform allows (posix_fadvise on Linux, F_NOCACHE on macOS).
+    """
+    if uncached:
+        _dropCache(path)
+    with open(path, "rb", buffering=0) as f:
+        if uncached and fcntl is not None and hasattr(fcntl, "F_NOCACHE"):
+            try:
+                fcntl.fcntl(f.fileno(), fcntl.F_NOCACHE, 1)
+            except OSError:
+                pass
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        while True:
+            if is_canceled is not None and is_canceled():
+                raise CopyCanceled(path)
+            read = f.readinto(buffer)
+            if not read:
+                break
+            digest.update(view[:read])
+    return digest.hexdigest()
+
+
+def cloneFile(input_file, output_file):
+    """ Copy-on-write clone of input_file to output_file, no data is read or written.
+
+    Uses FICLONE on Linux and clonefile() on macOS (APFS). Returns False, leaving nothing behind,
+    where the filesystem or platform can't clone.
+    """
+    temp_file = partialPath(output_file)
+    try:
+        if _CLONEFILE is not None:
+            if _CLONEFILE(os.fsencode(input_file), os.fsencode(temp_file), 0) != 0:
+                return False
+        elif fcntl is not None and sys.platform.startswith("linux"):
+            with open(input_file, "rb", buffering=0) as fsrc, open(temp_file, "wb", buffering=0) as fdst:
+                fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        else:
+            return False
+        os.replace(temp_file, output_file)
+        return True
+    except OSError:
+        return False
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
+def _copyData(fsrc, fdst, chunk_size, progress, is_canceled, digest=None):
+    copied = 0
+    fd_in = fsrc.fileno()
+    fd_out = fdst.fileno()
+    for zero_copy in _ZERO_COPY if digest is None else []:
+        try:
+            while True:
+                if is_canceled is not None and is_canceled():
+                    raise CopyCanceled(fsrc.name)
+                sent = zero_copy(fd_in, fd_out, chunk_size)
+                if sent == 0:
+                    return copied
+                copied += sent
+                if progress is not None:
+                    progress(sent)
+        except OSError as e:
+            if e.errno not in _ZERO_COPY_ERRORS:
+                raise
+            # Resume from wherever the failed method stopped with the next one.
+            os.lseek(fd_in, copied, os.SEEK_SET)
+            os.lseek(fd_out, copied, os.SEEK_SET)
+
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    while True:
+        if is_canceled is not None and is_canceled():
+            raise CopyCanceled(fsrc.name)
+        read = fsrc.readinto(buffer)
+        if not read:
+            return copied
+        if digest is not None:
+            digest.update(view[:read])
+        written = 0
+        while written < read:
+            written += fdst.write(view[written:read])
+        copied += read
+        if progress is not None:
+            progress(read)
+
+
+def copyFiles(jobs, num_workers, progress=None, is_canceled=None, chunk_size=DEFAULT_CHUNK_SIZE,
+              hash_name=None, verify=False):
+    """ Copies (input_file, output_file) jobs with num_workers concurrent copies.
+
+    Jobs are submitted a few at a time, so jobs can be a generator and a cancel never has to drain
+    a long queue. progress(num_bytes) is called from the copy threads as chunks land. Returns the
+    list of (input_file, output_file, exception_or_None, hex_digest_or_None) in completion order,
+    raises CopyCanceled on cancel with the jobs that did finish in its results.
+
+    hash_name, a hashlib algorithm, hashes each file as it is copied. verify then reads every copy
+    back from the destination and fails it with ChecksumMismatch, removing it, if it differs.
+    """
+    progress_lock = threading.Lock()
+
+    def _progress(num_bytes):
+        if progress is not None:
+            with progress_lock:
+                progress(num_bytes)
+
+    def _copyThread(input_file, output_file):
+        if is_canceled is not None and is_canceled():
+            raise CopyCanceled(input_file)
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        if hash_name is None:
+            copyFile(input_file, output_file, chunk_size, _progress, is_canceled)
+            return None
+        digest = hashlib.new(hash_name)
+        copyFile(input_file, output_file, chunk_size, _progress, is_canceled, digest)
+        if verify and hashFile(output_file, hashlib.new(hash_name), chunk_size, True, is_canceled) != digest.hexdigest():
+            os.remove(output_file)
+            raise ChecksumMismatch(f"{output_file} differs from {input_file}")
+        return digest.hexdigest()
+
+    results = []
+    canceled = []
+
+    def _done(future, input_file, output_file):
+        if future.cancelled():
+            canceled.append(input_file)
+            return
+        error = future.exception()
+        if isinstance(error, CopyCanceled):
+            canceled.append(input_file)
+        else:
+            # list.append is atomic, the callbacks run on the copy threads.
+            results.append((input_file, output_file, error, future.result() if error is None else None))
+
+    executor = scheduler.BoundedExecutor(
+        ThreadPoolExecutor(max_workers=max(1, num_workers)), 2 * max(1, num_workers), is_canceled)
+    with executor:
+        try:
+            for input_file, output_file in jobs:
+                future = executor.submit(_copyThread, input_file, output_file)
+                future.add_done_callback(
+                    lambda future, input_file=input_file, output_file=output_file: _done(future, input_file, output_file))
+        except scheduler.Canceled:
+            canceled.append(None)
+    if canceled:
+        error = CopyCanceled()
+        error.results = results
+        raise error
+    return results
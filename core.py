@@ -1,69 +1,81 @@
+import argparse
+import autotune
+import cardreader
+import catalog
 import os
 import datetime
+import functools
+import io
+import itertools
+import json
 import subprocess
 import re
-import shutil
 import sys
+import threading
+import time
 import traceback
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from PIL import Image
-from PySide6.QtCore import QObject, Signal
-
-
-def _splitList(input_list, n):
-    # Calculate the size of each sublist
-    k, m = divmod(len(input_list), n)
-    # Create the sublists
-    sublists = [input_list[i * k + min(i, m):(i + 1) * k + min(i + 1, m)] for i in range(n)]
-    return sublists
-
-
-def getDateTaken(path):
+import copier
+import encoders
+import exif
+import scheduler
+import fingerprint
+import journal
+import manifest
+from pipeline import Pipeline, Stage
+import raw
+from scancache import ScanCache
+import scanner
+import stats
+import timestamps
+import tracing
+import watcher
+
+
+@tracing.traced(category="exif")
+def getDateTaken(path, data=None, stat_result=None):
     if path.lower().endswith(".mov"):
-        c_timestamp = os.path.getctime(path)
+        c_timestamp = stat_result.st_ctime if stat_result is not None else os.path.getctime(path)
         c_datestamp = datetime.datetime.fromtimestamp(c_timestamp)
         output = c_datestamp.strftime('%Y/%m/%d %H:%M:%S')
     else:
-        exif = Image.open(path)._getexif()
-        if not exif:
-            raise Exception('Image {0} does not have EXIF data.'.format(path))
-            return
-        result = datetime.datetime.strptime(exif[36867], "%Y:%m:%d %H:%M:%S")
+        result = None
+        if raw.isRaw(path):
+            date_time_original = raw.readDateTimeOriginal(path, data)
+        else:
+            date_time_original = exif.readDateTimeOriginal(path, data)
+        if date_time_original is not None:
+            try:
+                result = datetime.datetime.strptime(date_time_original, "%Y:%m:%d %H:%M:%S")
+            except ValueError:
+                result = None
+        if result is None:
+            result = datetime.datetime.strptime(_getDateTimeOriginalPil(path, data), "%Y:%m:%d %H:%M:%S")
         output = result.strftime('%Y/%m/%d %H:%M:%S')
 
     return output
 
 
-def ymdToMdy(ymd):
-    parsed = datetime.datetime.strptime(ymd, '%Y/%m/%d %H:%M:%S')
-    return parsed.strftime('%m/%d/%Y %H:%M:%S')
-
-
-def getFileList(directory):
-    if os.path.exists(directory):
-        return list(os.path.join(root, file) for root, dirs, files in os.walk(directory) for file in files)
-    else:
-        return []
-
-
-def runCommand(command):
-    process = subprocess.Popen(
-        command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-    cmd_output, cmd_err = process.communicate()
-    return (cmd_output.decode("utf-8").strip(), cmd_err.decode("utf-8").strip())
+def _getDateTimeOriginalPil(path, data=None):
+    # Slow path for files the header-only reader can't handle.
+    from PIL import Image
+    exif_data = Image.open(path if data is None else io.BytesIO(data))._getexif()
+    if not exif_data:
+        raise Exception('Image {0} does not have EXIF data.'.format(path))
+    return exif_data[36867]
 
 
-def getOutputImageNames(input_file, output_jpg_dir, output_compressed_dir):
-    date_taken = getDateTaken(input_file)
+def getOutputImageNames(input_file, output_jpg_dir, output_compressed_dir, data=None):
+    date_taken = getDateTaken(input_file, data)
     date_folder = date_taken.split(" ")[0].replace("/", "_")
 
     file_name = os.path.basename(input_file).replace("DSCF", "")
-    file_number = re.findall(r'\d+', file_name)[-1]
+    file_numbers = re.findall(r'\d+', file_name)
     fuji_folder = os.path.basename(os.path.dirname(input_file))
     folder_numbers = re.findall(r'\d+', fuji_folder)
 
-    if len(folder_numbers) > 0:
+    # Names without a frame number, e.g. beach.jpg in an old folder, keep their name.
+    if len(folder_numbers) > 0 and len(file_numbers) > 0:
+        file_number = file_numbers[-1]
         combined_name = date_folder + "_" + \
             file_name.replace(file_number, folder_numbers[0] + file_number)
     else:
@@ -74,23 +86,34 @@ def getOutputImageNames(input_file, output_jpg_dir, output_compressed_dir):
         output_jpg_dir, date_folder, combined_name)
 
     output_compressed_file = os.path.join(
-        output_compressed_dir, date_folder,
-        combined_name.replace(".JPG", ".jpg").replace(".jpg", "c.jpg"))
+        output_compressed_dir, date_folder, _getCompressedName(combined_name))
 
     return date_taken, output_jpg_file, output_compressed_file
 
 
-def _getOutputMovieNames(input_file, movie_dir):
-    date_taken = getDateTaken(input_file)
+def _getCompressedName(jpg_name):
+    # DSCF0001.JPG and a RAW-only DSCF0001.RAF both give DSCF0001c.jpg.
+    return os.path.splitext(jpg_name)[0] + "c.jpg"
+
+
+def _getNumberedName(jpg_name, number):
+    # DSCF0001.JPG -> DSCF0001-2.JPG, for a different frame that would land on an existing name.
+    stem, extension = os.path.splitext(jpg_name)
+    return f"{stem}-{number}{extension}"
+
+
+def _getOutputMovieNames(input_file, movie_dir, stat_result=None):
+    date_taken = getDateTaken(input_file, stat_result=stat_result)
     date_folder = date_taken.split(" ")[0].replace("/", "_")
 
     file_name = os.path.basename(input_file)
-    file_number = re.findall(r'\d+', file_name)[-1]
+    file_numbers = re.findall(r'\d+', file_name)
 
     fuji_folder = os.path.basename(os.path.dirname(input_file))
     folder_numbers = re.findall(r'\d+', fuji_folder)
 
-    if len(folder_numbers) > 0:
+    if len(folder_numbers) > 0 and len(file_numbers) > 0:
+        file_number = file_numbers[-1]
         combined_name = date_folder + "_" + \
             file_name.replace(file_number, "_" + folder_numbers[0] + file_number)
     else:
@@ -102,19 +125,6 @@ def _getOutputMovieNames(input_file, movie_dir):
     return date_taken, output_mov_file
 
 
-def _getInputFileList(import_locations, file_type):
-    output = []
-    for import_location in import_locations:
-        output.extend(
-            sorted(
-                list(os.path.join(import_location, file)
-                     for file in os.listdir(import_location)
-                     if (file.endswith(file_type) or file.endswith(file_type.upper()))
-                     and not file.startswith(".")
-                     )))
-    return output
-
-
 def installGm():
     brew_install_command = '/bin/bash -c \\"$(curl -fsSL https://raw.githubusercontent.com/Homebrew/install/HEAD/install.sh)\\" && brew install graphicsmagick'
     prompt_command = 'echo \\"Installation complete. Press enter to exit.\\" ; read line'
@@ -128,225 +138,1057 @@ def installGm():
     subprocess.run(['osascript', '-e', script])
 
 
-def _getGmPath():
-    return "/opt/homebrew/bin/gm"
+def formatBytes(num_bytes):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(num_bytes) < 1000 or unit == "GB":
+            break
+        num_bytes /= 1000.0
+    return f"{num_bytes:.0f} {unit}" if unit == "B" else f"{num_bytes:.1f} {unit}"
 
 
-class Worker(QObject):
-    progress = Signal(int)
-    status = Signal(str)
-    prange = Signal(int, int)
-    finished = Signal()
-    canceled = Signal()
+def getLibraryMetaDir(workdir):
+    return os.path.join(workdir, ".photoimporter")
 
-    def __init__(self, workdir, num_threads, import_locations, run_compress, import_movies, compression_quality):
-        super().__init__()
-        self.is_canceled = False
-        self.workdir = workdir
-        self.num_threads = num_threads
-        self.import_locations = import_locations
-        self.run_compress = run_compress
-        self.import_movies = import_movies
-        self.compression_quality = compression_quality
 
-    def cancel(self):
-        self.is_canceled = True
+def openScanCache(workdir, max_entries):
+    return ScanCache(os.path.join(getLibraryMetaDir(workdir), "scancache.sqlite"), max_entries)
 
-    def run(self):
 
-        src_files = self.getAllSrcImageFiles(self.import_locations)
+def openCatalog(workdir):
+    return catalog.LibraryCatalog(os.path.join(getLibraryMetaDir(workdir), "catalog.sqlite"), workdir)
 
-        self.prange.emit(0, len(src_files))
-        new_source_images_tuple = self.getNewSrcImageFiles(
-            src_files, self.num_threads, self.workdir)
-        self.progress.emit(0)
 
-        if len(new_source_images_tuple) > 0:
-            self.prange.emit(0, len(new_source_images_tuple))
-            self.runImageImport(new_source_images_tuple, self.workdir, self.num_threads, self.compression_quality)
-            self.progress.emit(len(new_source_images_tuple))
-        else:
-            self.status.emit(f"All images up to date.")
-            self.prange.emit(0, 1)
-            self.progress.emit(0)
+def openJournal(workdir):
+    return journal.ImportJournal(os.path.join(getLibraryMetaDir(workdir), "journal.sqlite"), workdir)
 
-        if self.import_movies is True:
-            src_movies = self.getAllSrcMovies(self.import_locations)
-            self.status.emit(f"Checking {len(src_movies)} movies from input volumes.")
-            output_movies = self.getNewMovies(src_movies, self.workdir)
-            self.progress.emit(0)
-            if len(output_movies) > 0:
-                self.prange.emit(0, len(output_movies))
-                self.status.emit(f"Importing {len(output_movies)} movies.")
-                self.runMovieImport(output_movies)
 
-        self.progress.emit(0)
-        self.status.emit(f"Import complete.")
-        self.finished.emit()
+def openFingerprintIndex(workdir):
+    return fingerprint.FingerprintIndex(os.path.join(getLibraryMetaDir(workdir), "fingerprints.sqlite"), workdir)
 
-    def _processImages(self, input_file, date_taken, output_jpg_file, output_compressed_file, quality):
-        if self.is_canceled:
-            return
-        shutil.copyfile(input_file, output_jpg_file)
-        gm_path = _getGmPath()
 
-        if self.run_compress:
-            runCommand(
-                f"{gm_path} convert -quality {quality}% {input_file} {output_compressed_file}")
+_PROGRESS_UNIT = 1000 * 1000
 
-            if os.path.exists(output_compressed_file):
-                runCommand("SetFile -d \"%s\" \"%s\"" %
-                           (ymdToMdy(date_taken), output_compressed_file))
+# Minimum time between two stats signals.
+_STATS_INTERVAL = 0.5
 
-        if os.path.exists(output_jpg_file):
-            runCommand("SetFile -d \"%s\" \"%s\"" %
-                       (ymdToMdy(date_taken), output_jpg_file))
+# Most files whose timestamps are set in one batch.
+_STAMP_BATCH_SIZE = 256
 
-        else:
-            print(f"Error: output file {output_compressed_file} not found. Exiting.")
-            return
+# Files read from the card but not yet written, bounds the memory held by the read stage.
+_READ_AHEAD_FILES = 8
 
-    def runMovieImport(self, outputs):
-        counter = 0
-        if self.is_canceled:
-            self.canceled.emit()
-            return
-        for (input_file, date_taken, output_mov_file) in outputs:
-            if self.is_canceled:
-                self.canceled.emit()
-                return
-            if not os.path.exists(os.path.dirname(output_mov_file)):
-                os.mkdir(os.path.dirname(output_mov_file))
+# Ranges the auto-tuner may move each pool in.
+_MAX_CARD_READERS = 8
+_MAX_DEST_WRITERS = 16
 
-            shutil.copyfile(input_file, output_mov_file)
-            counter += 1
-            self.progress.emit(counter)
 
+def defaultEncoderWorkers():
+    return os.cpu_count() or 1
 
-    def _getOutputImageList(self, input_files, num_threads, workdir):
-        jpg_dir = os.path.join(workdir, "JPG")
-        compressed_dir = os.path.join(workdir, "Compressed")
 
-        def _checkInputThread(input_file):
-            if self.is_canceled:
-                self.canceled.emit()
-                return None
-            date_taken, output_jpg_file, output_compressed_file = \
-                getOutputImageNames(
-                    input_file, jpg_dir, compressed_dir)
-            if not os.path.exists(output_compressed_file):
-                return (input_file, date_taken, output_jpg_file, output_compressed_file)
-            else:
-                return None
+class ImportItem(object):
+    """ One source image moving through the import pipeline. """
+    __slots__ = ("input_file", "date_taken", "output_jpg_file", "output_compressed_file", "size", "quick",
+                 "done", "data", "written", "sha256")
 
-        output = []
-        counter = 0
-        with ThreadPoolExecutor(max_workers=num_threads) as executor:
-            futures = [
-                executor.submit(_checkInputThread, input_file)
-                for input_file in input_files
-            ]
-            for future in as_completed(futures):
-                if self.is_canceled:
-                    executor.shutdown(wait=False)
-                    break
-                result = future.result()
-                counter += 1
-                self.progress.emit(counter)
-                if result is not None:
-                    output.append(result)
+    def __init__(self, input_file, date_taken, output_jpg_file, output_compressed_file, size, quick, done=0):
+        self.input_file = input_file
+        self.date_taken = date_taken
+        self.output_jpg_file = output_jpg_file
+        self.output_compressed_file = output_compressed_file
+        self.size = size
+        self.quick = quick
+        # journal.COPIED / journal.COMPRESSED flags of stages finished by an interrupted import.
+        self.done = done
+        # Bytes read from the card, held from the read to the write stage.
+        self.data = None
+        self.written = []
+        # Hex digest of the card's bytes, taken as they were read.
+        self.sha256 = None
 
-            if self.is_canceled:
-                self.canceled.emit()
 
-        return output
+class CardImport(object):
+    """ The part of an import that reads one card: its locations, its own read limit and stamp batches.
 
-    def getAllSrcImageFiles(self, import_locations):
-        if len(import_locations) <= 0:
-            return []
-        return _getInputFileList(import_locations, ".jpg")
+    Every card runs its own pipeline so a slow card never holds up the others, while the write
+    and compress limits, the encoder pool and the library indexes are shared by all of them.
+    """
 
-    def getAllSrcMovies(self, import_locations):
-        if len(import_locations) <= 0:
-            return []
-        return _getInputFileList(import_locations, ".mov")
+    def __init__(self, index, locations, card_readers):
+        self.index = index
+        self.name = scanner.cardName(locations[0])
+        self.locations = locations
+        self.read_limit = scheduler.ConcurrencyLimit(card_readers)
+        self.found = 0
+        self.done = 0
+        self.stamp_batch = []
+        self.stamp_dir = None
+        self.pipeline = None
 
-    def getNewMovies(self, input_files, workdir):
-        mov_dir = os.path.join(workdir, "Video")
-        output = []
-        # for input_file in tqdm.tqdm(input_files):
-        for input_file in input_files:
-            date_taken, output_mov_file = _getOutputMovieNames(input_file, mov_dir)
-            if not os.path.exists(output_mov_file):
-                output.append((input_file, date_taken, output_mov_file))
-        return output
 
-    def getNewSrcImageFiles(self, input_files, num_threads, workdir):
-        jpg_dir = os.path.join(workdir, "JPG")
-        compressed_dir = os.path.join(workdir, "Compressed")
+# What plan() expects an import to do with each image.
+PLAN_NEW = "new"
+PLAN_IMPORTED = "imported"
+PLAN_DUPLICATE = "duplicate"
 
-        def _checkInputThread(input_file):
-            if self.is_canceled:
-                self.canceled.emit()
-                return None
-            date_taken, output_jpg_file, output_compressed_file = \
-                getOutputImageNames(
-                    input_file, jpg_dir, compressed_dir)
-            if not os.path.exists(output_compressed_file):
-                return (input_file, date_taken, output_jpg_file, output_compressed_file)
+
+class ImportPlan(object):
+    """ Per card counts of the images and movies an import would copy, from ImportEngine.plan(). """
+
+    def __init__(self, card_names):
+        self.cards = [{"name": name, "new": 0, "new_bytes": 0, "imported": 0, "duplicates": 0,
+                       "movies": 0, "movie_bytes": 0} for name in card_names]
+
+    def addImage(self, index, state, size):
+        card = self.cards[index]
+        if state == PLAN_NEW:
+            card["new"] += 1
+            card["new_bytes"] += size
+        elif state == PLAN_IMPORTED:
+            card["imported"] += 1
+        else:
+            card["duplicates"] += 1
+
+    def addMovie(self, index, size):
+        self.cards[index]["movies"] += 1
+        self.cards[index]["movie_bytes"] += size
+
+    def totals(self):
+        totals = {}
+        for card in self.cards:
+            for key, value in card.items():
+                if key != "name":
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def summary(self):
+        totals = self.totals()
+        text = f"{totals.get('new', 0)} new images ({formatBytes(totals.get('new_bytes', 0))})"
+        if totals.get("movies", 0) > 0:
+            text += f", {totals['movies']} new movies ({formatBytes(totals['movie_bytes'])})"
+        if totals.get("imported", 0) > 0:
+            text += f", {totals['imported']} already imported"
+        if totals.get("duplicates", 0) > 0:
+            text += f", {totals['duplicates']} likely duplicates"
+        return text + "."
+
+
+def _ignore(*args):
+    pass
+
+
+class ImportEngine(object):
+    """ Qt free import of one or more card folders into a library.
+
+    Progress is reported through the on_* callbacks, which are called from worker threads:
+    on_progress(done), on_range(minimum, maximum), on_status(message), on_stats(snapshot),
+    on_card_progress(index, name, done, found), on_finished() and on_canceled().
+
+    cards, lists of import locations that each sit on one card, default to import_locations grouped
+    by device. Each card is read by its own pipeline, so several cards import at the same time.
+
+    checksums hashes every original as it is read from the card into the library's manifest,
+    verify_copies also reads each copy back from the library and fails it if it doesn't match.
+
+    trace_path records the time spent in the import's hot functions on every thread from plan()
+    until run() ends and writes it there as a Chrome trace, with a summary table next to it.
+    profile_path runs the same span under cProfile and writes the stats there.
+    """
+
+    def __init__(self, workdir, import_locations, run_compress, import_movies, compression_quality,
+                 card_readers=1, dest_writers=4, encoder_workers=None, auto_tune=False,
+                 scan_cache_size=50000, encoder_name=encoders.DEFAULT_ENCODER, movie_copies=2, max_edge=0,
+                 cards=None, checksums=True, verify_copies=False, trace_path=None, profile_path=None):
+        self.on_progress = _ignore
+        self.on_range = _ignore
+        self.on_status = _ignore
+        self.on_stats = _ignore
+        self.on_card_progress = _ignore
+        self.on_finished = _ignore
+        self.on_canceled = _ignore
+        self.cancel_token = scheduler.CancelToken()
+        self.cancel_time = None
+        self.workdir = workdir
+        # Card reads, library writes and encodes have separate pools: cards slow down under
+        # parallel reads while encoding wants a worker per core.
+        self.card_readers = card_readers
+        self.dest_writers = dest_writers
+        self.encoder_workers = encoder_workers if encoder_workers is not None else defaultEncoderWorkers()
+        self.auto_tune = auto_tune
+        self.tuner = None
+        self.import_locations = import_locations
+        self.card_locations = cards
+        self.cards = []
+        self.prepared = False
+        self.library_dirs_listed = 0
+        self.run_compress = run_compress
+        self.import_movies = import_movies
+        self.compression_quality = compression_quality
+        # Long edge of the Compressed images in pixels, 0 keeps the full resolution.
+        self.max_edge = max_edge
+        self.scan_cache_size = scan_cache_size
+        self.encoder_name = encoder_name
+        self.movie_copies = movie_copies
+        self.checksums = checksums or verify_copies
+        self.verify_copies = verify_copies
+        self.manifest = None
+        self.trace_path = trace_path
+        self.profile_path = profile_path
+        self.tracer = None
+        self.profiler = None
+        self.encoder_pool = None
+        self.import_stats = stats.ImportStats()
+        self.stats_lock = threading.Lock()
+        self.last_stats_time = 0.0
+        self.encodes_in_flight = 0
+
+    @property
+    def is_canceled(self):
+        return self.cancel_token.isCanceled()
+
+    def cancel(self):
+        if self.cancel_time is None:
+            self.cancel_time = time.time()
+        self.cancel_token.cancel()
+
+    def _prepare(self):
+        # Groups the cards and loads the library indexes, done by plan() when it runs first.
+        if self.prepared:
+            return
+        card_locations = self.card_locations if self.card_locations is not None else \
+            scanner.groupByDevice(self.import_locations)
+        self.cards = [CardImport(index, locations, self.card_readers)
+                      for index, locations in enumerate(card_locations) if len(locations) > 0]
+        self.volume_scan = scanner.VolumeScan(
+            [location for card in self.cards for location in card.locations])
+        self.on_status("Indexing library.")
+        self.catalog = openCatalog(self.workdir)
+        self.library_dirs_listed = self.catalog.refresh(["JPG", "Compressed", "Video"], self.cancel_token) or 0
+        self.scan_cache = openScanCache(self.workdir, self.scan_cache_size)
+        self.fingerprints = openFingerprintIndex(self.workdir)
+        self.fingerprints.refresh(self.catalog.files("JPG"), self.dest_writers, self.cancel_token)
+        if self.checksums:
+            self.manifest = manifest.Manifest(manifest.manifestPath(self.workdir))
+        self.prepared = True
+
+    def _pairedRaws(self, scanned_files):
+        # RAWs shot together with a JPEG, from the names of one folder.
+        names = set(scanned.name.lower() for scanned in scanned_files)
+        return set(scanned.path for scanned in scanned_files
+                   if scanned.kind == scanner.RAW and raw.jpegSibling(scanned.path, names) is not None)
+
+    def _cardMovies(self):
+        # Alternating between cards keeps every reader busy while the movies copy.
+        per_card = [list(self.volume_scan.iterFiles((scanner.MOVIE,), card.locations)) for card in self.cards]
+        return [scanned for group in itertools.zip_longest(*per_card) for scanned in group if scanned is not None]
+
+    def plan(self):
+        """ Scans the cards and checks every file against the library without copying anything.
+
+        Images are settled from their headers and quick fingerprints, the full hash that confirms a
+        duplicate waits for the import. Returns an ImportPlan, or None if canceled. The card listing,
+        the library indexes and the scan cache entries stay loaded, so a run() that follows goes
+        straight to copying.
+        """
+        self._startTrace()
+        self._prepare()
+        import_plan = ImportPlan([card.name for card in self.cards])
+        self.on_status("Checking cards against the library.")
+        plan_journal = openJournal(self.workdir)
+        try:
+            for card in self.cards:
+                for location in card.locations:
+                    scanned_files = list(self.volume_scan.iterFiles((scanner.IMAGE, scanner.RAW), [location]))
+                    paired_raws = self._pairedRaws(scanned_files)
+                    for scanned in scanned_files:
+                        if self.is_canceled:
+                            return None
+                        # An interrupted import's partial copy would look like a duplicate, the frame is resumed.
+                        if plan_journal.get(scanned.path, scanned.stat) is not None:
+                            state = PLAN_NEW
+                        else:
+                            state = self._planImage(scanned, scanned.path in paired_raws)
+                        import_plan.addImage(card.index, state, scanned.stat.st_size)
+        finally:
+            plan_journal.close()
+        if self.import_movies:
+            for card in self.cards:
+                movies = self.volume_scan.iterFiles((scanner.MOVIE,), card.locations)
+                for input_file, date_taken, output_mov_file, size in self.getNewMovies(movies, self.workdir):
+                    import_plan.addMovie(card.index, size)
+        self.scan_cache.save()
+        self.on_status(import_plan.summary())
+        return import_plan
+
+    def _planImage(self, scanned, paired):
+        cached = self.scan_cache.get(scanned.path, scanned.stat)
+        if cached is not None:
+            quick = cached[3]
+            imported = self._isImported(cached[1], cached[2], quick)
+        else:
+            try:
+                quick = fingerprint.quickFingerprint(scanned.path, scanned.stat.st_size)
+                date_taken, output_jpg_file, output_compressed_file = getOutputImageNames(
+                    scanned.path, os.path.join(self.workdir, "JPG"), os.path.join(self.workdir, "Compressed"))
+            except Exception as e:
+                # Left to the import, which reports it.
+                print(f"Warning: could not check {scanned.path}: {e}", file=sys.stderr)
+                return PLAN_NEW
+            jpg_name = os.path.relpath(output_jpg_file, self.workdir)
+            compressed_name = None if paired else os.path.relpath(output_compressed_file, self.workdir)
+            # The import picks these up instead of fingerprinting the file again.
+            self.scan_cache.put(scanned.path, scanned.stat, date_taken, jpg_name, compressed_name, quick)
+            imported = self._isImported(jpg_name, compressed_name, quick)
+        if imported:
+            return PLAN_IMPORTED
+        if self.fingerprints.hasQuick(quick):
+            return PLAN_DUPLICATE
+        return PLAN_NEW
+
+    def run(self):
+
+        self.import_stats = stats.ImportStats()
+        self._startTrace()
+        self._prepare()
+        if self.library_dirs_listed:
+            self.import_stats.addCount("library_dirs_listed", self.library_dirs_listed)
+        self.runImageImport(self.cards, self.workdir)
+
+        if self.import_movies is True and not self.is_canceled:
+            with self.import_stats.measure("scan") as measurement:
+                src_movies = self._cardMovies()
+                measurement.files = len(src_movies)
+            self.on_status(f"Checking {len(src_movies)} movies from input volumes.")
+            output_movies = self.getNewMovies(src_movies, self.workdir)
+            self.on_progress(0)
+            if len(output_movies) > 0:
+                self.on_range(0, len(output_movies))
+                self.on_status(f"Importing {len(output_movies)} movies.")
+                self.runMovieImport(output_movies)
+
+        self.on_progress(0)
+        self.catalog.save()
+        summary_path = self._finishStats(self.finishTrace())
+        print(f"Import stats written to {summary_path}", file=sys.stderr)
+        if self.is_canceled:
+            snapshot = self.import_stats.snapshot()
+            self.on_status(f"Import canceled after {snapshot['files_done']} of {snapshot['files_total']} files.")
+            self.on_canceled()
+            return
+        self.on_status(f"Import complete.")
+        self.on_finished()
+
+    def _emitStats(self, force=False):
+        # Rate limited so per file and per chunk callers don't flood the GUI thread.
+        now = time.time()
+        with self.stats_lock:
+            if not force and now - self.last_stats_time < _STATS_INTERVAL:
+                return
+            self.last_stats_time = now
+        self.on_stats(self.import_stats.snapshot())
+
+    def _startTrace(self):
+        if self.trace_path is not None and self.tracer is None:
+            self.tracer = tracing.start()
+        if self.profile_path is not None:
+            if self.profiler is None:
+                self.profiler = tracing.ThreadProfiler()
+                self.profiler.start()
             else:
-                return None
+                # run() can be called on a different thread than plan().
+                self.profiler.addCurrentThread()
+
+    def finishTrace(self):
+        """ Stops tracing and profiling and writes their files, returns the trace summary or None. """
+        tracer, profiler = self.tracer, self.profiler
+        self.tracer = None
+        self.profiler = None
+        # Both stop before anything is written, so writing the trace doesn't show up in the profile.
+        if tracer is not None:
+            tracing.stop()
+        if profiler is not None:
+            profiler.stop()
+        summary = None
+        if tracer is not None:
+            try:
+                summary_path = tracer.write(self.trace_path)
+                summary = tracer.summary()
+                print(tracing.formatSummary(summary), file=sys.stderr)
+                self.on_status(f"Trace written to {self.trace_path}, summary in {summary_path}.")
+            except OSError as e:
+                print(f"Warning: could not write trace {self.trace_path}: {e}", file=sys.stderr)
+        if profiler is not None:
+            try:
+                profiler.write(self.profile_path)
+                self.on_status(f"Profile written to {self.profile_path}.")
+            except OSError as e:
+                print(f"Warning: could not write profile {self.profile_path}: {e}", file=sys.stderr)
+        return summary
+
+    def _finishStats(self, trace_summary=None):
+        self.import_stats.finish()
+        self._emitStats(force=True)
+        try:
+            return self.import_stats.writeSummary(
+                os.path.join(getLibraryMetaDir(self.workdir), "imports"),
+                canceled=self.is_canceled,
+                # Seconds from cancel() until the last worker stopped.
+                cancel_latency=round(time.time() - self.cancel_time, 3) if self.cancel_time is not None else None,
+                pools=self.poolRates(),
+                tuning=self.tuner.history if self.tuner is not None else None,
+                trace=trace_summary,
+                cards=[{"name": card.name, "locations": card.locations, "files": card.found, "done": card.done}
+                       for card in self.cards],
+                settings={
+                    "card_readers": self.card_readers,
+                    "dest_writers": self.dest_writers,
+                    "encoder_workers": self.encoder_workers,
+                    "auto_tune": self.auto_tune,
+                    "run_compress": self.run_compress,
+                    "import_movies": self.import_movies,
+                    "compression_quality": self.compression_quality,
+                    "max_edge": self.max_edge,
+                    "checksums": self.checksums,
+                    "verify_copies": self.verify_copies,
+                    "encoder": self.encoder_name,
+                    "movie_copies": self.movie_copies,
+                    "scan_cache_size": self.scan_cache_size,
+                })
+        except OSError as e:
+            print(f"Warning: could not write import stats: {e}", file=sys.stderr)
+            return None
+
+    def poolRates(self):
+        """ Workers and observed throughput of each pool, after tuning if auto-tune ran. """
+        stages = self.import_stats.snapshot()["stages"]
+        return {
+            "card_readers": {"workers": self.card_readers, "mb_per_s": stages["read"]["mb_per_s"]},
+            "dest_writers": {"workers": self.dest_writers, "mb_per_s": stages["write"]["mb_per_s"]},
+            "encoder_workers": {"workers": self.encoder_workers, "files_per_s": stages["compress"]["files_per_s"]},
+        }
+
+    def _trackEncodes(self, delta):
+        with self.stats_lock:
+            self.encodes_in_flight += delta
+            self.import_stats.setQueueDepth("encoder", self.encodes_in_flight)
 
+    def runMovieImport(self, outputs):
+        if self.is_canceled:
+            return
+        sizes = {input_file: size for input_file, date_taken, output_mov_file, size in outputs}
+        total_bytes = sum(sizes.values())
+        self.import_stats.addTotals(len(outputs), total_bytes)
+        # Progress is tracked in bytes but the progress bar only holds a 32-bit int, so it shows MB.
+        self.on_range(0, max(1, total_bytes // _PROGRESS_UNIT))
+        copied = [0, -1]
+
+        def _progress(num_bytes):
+            self.import_stats.addBytes("movies", num_bytes, num_bytes)
+            self.import_stats.addDone(num_bytes=num_bytes)
+            self._emitStats()
+            copied[0] += num_bytes
+            progress_units = copied[0] // _PROGRESS_UNIT
+            if progress_units != copied[1]:
+                copied[1] = progress_units
+                self.on_progress(progress_units)
+
+        jobs = [(input_file, output_mov_file) for input_file, date_taken, output_mov_file, size in outputs]
+        try:
+            # At least one copy per card, so each card's reader is used.
+            results = copier.copyFiles(jobs, max(self.movie_copies, len(self.cards)), _progress, self.cancel_token,
+                                       hash_name=manifest.HASH_NAME if self.checksums else None,
+                                       verify=self.verify_copies)
+        except copier.CopyCanceled as e:
+            # Movies copied before the cancel are in the library, they still need their checksums.
+            results = e.results
+        for input_file, output_mov_file, error, hex_digest in results:
+            self.import_stats.addDone(files=1)
+            if error is not None:
+                print(f"Error: failed to copy {input_file} to {output_mov_file}: {error}", file=sys.stderr)
+                self.on_status(f"{input_file} failed to copy.")
+            else:
+                self.catalog.add(os.path.relpath(output_mov_file, self.workdir), sizes[input_file])
+                if hex_digest is not None:
+                    self.manifest.add(os.path.relpath(output_mov_file, self.workdir), hex_digest)
+        if self.manifest is not None:
+            self.manifest.save()
+
+    @tracing.traced("getNewMovies", "check")
+    def getNewMovies(self, scanned_files, workdir):
+        """ Returns (input_file, date_taken, output_mov_file, size) of the scanned movies not in the library yet. """
+        mov_dir = os.path.join(workdir, "Video")
         output = []
-        counter = 0
-        with ThreadPoolExecutor(max_workers=num_threads) as executor:
-            futures = [
-                executor.submit(_checkInputThread, input_file)
-                for input_file in input_files
-            ]
-            for future in as_completed(futures):
-                if self.is_canceled:
-                    executor.shutdown(wait=False)
-                    break
-
-                result = future.result()
-                counter += 1
-                self.progress.emit(counter)
-                if result is not None:
-                    output.append(result)
-
+        planned = set()
+        for scanned in scanned_files:
             if self.is_canceled:
-                self.canceled.emit()
+                break
+            date_taken, output_mov_file = _getOutputMovieNames(scanned.path, mov_dir, scanned.stat)
+            if self.catalog.contains(os.path.relpath(output_mov_file, workdir)):
+                continue
+            # Two cards can hold movies with the same name and date, the second one gets numbered.
+            number = 1
+            numbered_file = output_mov_file
+            while numbered_file in planned or self.catalog.contains(os.path.relpath(numbered_file, workdir)):
+                number += 1
+                numbered_file = os.path.join(os.path.dirname(output_mov_file),
+                                             _getNumberedName(os.path.basename(output_mov_file), number))
+            planned.add(numbered_file)
+            output.append((scanned.path, date_taken, numbered_file, scanned.stat.st_size))
         return output
 
-    def runImageImport(self, new_source_images_tuple, workdir, num_threads, quality):
-        if len(new_source_images_tuple) <= 0:
+    def _scanImages(self, card):
+        # Feeds the card's pipeline one folder at a time, the progress range grows with it.
+        for import_location in card.locations:
+            start = time.time()
+            scanned_files = list(self.volume_scan.iterFiles((scanner.IMAGE, scanner.RAW), [import_location]))
+            self.paired_raws.update(self._pairedRaws(scanned_files))
+            # One sweep across the card instead of seeking back and forth between files. Cameras
+            # write a RAW and its JPEG back to back, so pairs stay next to each other.
+            by_path = {scanned.path: scanned for scanned in scanned_files}
+            input_files = [by_path[path] for path in cardreader.diskOrder(
+                [scanned.path for scanned in scanned_files], [scanned.inode for scanned in scanned_files])]
+            self.import_stats.record("scan", start, time.time(), files=len(input_files))
+            for input_file in input_files:
+                with self.progress_lock:
+                    card.found += 1
+                    self.images_found += 1
+                    found = self.images_found
+                if card.found % 64 == 0:
+                    self.on_range(0, found)
+                    self.on_card_progress(card.index, card.name, card.done, card.found)
+                yield input_file
+        with self.progress_lock:
+            found = self.images_found
+        self.on_range(0, max(found, 1))
+        self.on_card_progress(card.index, card.name, card.done, card.found)
+
+    def _imageDone(self, card, item=None):
+        with self.progress_lock:
+            self.images_done += 1
+            card.done += 1
+            done = self.images_done
+            card_done, card_found = card.done, card.found
+        self.on_progress(done)
+        self.on_card_progress(card.index, card.name, card_done, card_found)
+        if item is not None:
+            self.import_stats.addDone(1, item.size)
+            if self.tuner is not None and self.tuner.fileDone(item.size):
+                self._finishTuning()
+        self._emitStats()
+
+    def _ensureDir(self, directory):
+        rel_dir = os.path.relpath(directory, self.workdir)
+        if self.catalog.hasDir(rel_dir):
+            return
+        os.makedirs(directory, exist_ok=True)
+        self.catalog.addDir(rel_dir)
+
+    @tracing.traced("isImported", "check")
+    def _isImported(self, jpg_name, compressed_name, quick):
+        if not self.fingerprints.matches(jpg_name, quick):
+            return False
+        return not self.run_compress or compressed_name is None or self.catalog.contains(compressed_name)
+
+    @tracing.traced("hasLocalCopy", "check")
+    def _hasLocalCopy(self, jpg_name, flags, stat_result):
+        return bool(flags & journal.COPIED) and self.catalog.size(jpg_name) == stat_result.st_size
+
+    def _resolveImage(self, card, input_file, stat_result, cached, unfinished, data):
+        with self.import_stats.measure("resolve"):
+            if unfinished is not None:
+                return self._resumeImage(input_file, stat_result, cached, data, *unfinished)
+            if cached is not None:
+                quick = cached[3]
+            else:
+                quick = fingerprint.quickFingerprintData(data)
+            names = self._resolveOutputNames(input_file, quick, data, input_file in self.paired_raws)
+            if names is None:
+                return None
+            date_taken, jpg_name, compressed_name, skip = names
+            self.scan_cache.put(input_file, stat_result, date_taken, jpg_name, compressed_name, quick)
+        if skip:
+            self._imageDone(card)
+            return None
+        self.import_journal.begin(input_file, stat_result, jpg_name, compressed_name)
+        self.import_stats.addTotals(1, stat_result.st_size)
+        return ImportItem(input_file, date_taken, os.path.join(self.workdir, jpg_name),
+                          self._libraryPath(compressed_name), stat_result.st_size, quick)
+
+    def _resumeImage(self, input_file, stat_result, cached, data, jpg_name, compressed_name, flags):
+        # Pick up an interrupted frame under the names it was given, redoing only unfinished stages.
+        if cached is not None:
+            date_taken, quick = cached[0], cached[3]
+        elif data is not None:
+            date_taken = getDateTaken(input_file, data)
+            quick = fingerprint.quickFingerprintData(data)
+        else:
+            date_taken = getDateTaken(input_file)
+            quick = fingerprint.quickFingerprint(input_file, stat_result.st_size)
+        output_jpg_file = os.path.join(self.workdir, jpg_name)
+        output_compressed_file = self._libraryPath(compressed_name)
+        done = 0
+        if self._hasLocalCopy(jpg_name, flags, stat_result):
+            done |= journal.COPIED
+        if flags & journal.COMPRESSED and compressed_name is not None and self.catalog.contains(compressed_name):
+            done |= journal.COMPRESSED
+        with self.names_lock:
+            self.reserved_names.add(jpg_name)
+            if compressed_name is not None:
+                self.reserved_names.add(compressed_name)
+        self.import_stats.addCount("resumed")
+        self.import_stats.addTotals(1, stat_result.st_size)
+        return ImportItem(input_file, date_taken, output_jpg_file, output_compressed_file, stat_result.st_size,
+                          quick, done)
+
+    def _libraryPath(self, name):
+        return os.path.join(self.workdir, name) if name is not None else None
+
+    def _isTruncatedCopy(self, data, jpg_name):
+        # Imports before the journal wrote in place, an interrupted copy left a short file with
+        # the same leading bytes as its source.
+        existing_size = self.catalog.size(jpg_name)
+        if existing_size is None or existing_size >= len(data):
+            return False
+        try:
+            length = min(existing_size, 64 * 1024)
+            with open(os.path.join(self.workdir, jpg_name), "rb") as fexisting:
+                return data[:length] == fexisting.read(length)
+        except OSError:
+            return False
+
+    @tracing.traced("resolveOutputNames", "check")
+    def _resolveOutputNames(self, input_file, quick, data, paired=False):
+        """ Returns (date_taken, jpg_name, compressed_name, skip) with names relative to the library.
+
+        The names are the frame's usual ones unless its content is already in the library under
+        another name (a duplicate, skipped) or a different frame already holds them (numbered).
+        A RAW paired with a JPEG gets no compressed name, the JPEG provides the compressed image.
+        """
+        date_taken, output_jpg_file, output_compressed_file = getOutputImageNames(
+            input_file, os.path.join(self.workdir, "JPG"), os.path.join(self.workdir, "Compressed"), data)
+        jpg_name = os.path.relpath(output_jpg_file, self.workdir)
+        compressed_name = None if paired else os.path.relpath(output_compressed_file, self.workdir)
+        if self.fingerprints.matches(jpg_name, quick):
+            return date_taken, jpg_name, compressed_name, self._isImported(jpg_name, compressed_name, quick)
+
+        duplicate = self.fingerprints.findDuplicate(input_file, quick, data)
+        if duplicate is not None:
+            self.import_stats.addCount("duplicates")
+            return date_taken, duplicate, None if paired else os.path.join(
+                "Compressed", os.path.basename(os.path.dirname(duplicate)),
+                _getCompressedName(os.path.basename(duplicate))), True
+
+        truncated = self._isTruncatedCopy(data, jpg_name)
+        with self.names_lock:
+            if truncated and jpg_name not in self.reserved_names:
+                self.reserved_names.add(jpg_name)
+                if compressed_name is not None:
+                    self.reserved_names.add(compressed_name)
+                self.import_stats.addCount("repaired")
+                return date_taken, jpg_name, compressed_name, False
+            # A JPEG and a RAW-only frame of the same number share the compressed name.
+            if not self.fingerprints.contains(jpg_name) and jpg_name not in self.reserved_names and \
+                    compressed_name not in self.reserved_names:
+                if compressed_name is None or not self.catalog.contains(compressed_name):
+                    self.reserved_names.add(jpg_name)
+                    if compressed_name is not None:
+                        self.reserved_names.add(compressed_name)
+                    return date_taken, jpg_name, compressed_name, False
+                if self._isOrphanedCompressed(jpg_name, compressed_name, date_taken):
+                    # Compressed only, from before the fingerprint index, nothing to compare against.
+                    return date_taken, jpg_name, compressed_name, True
+            # A different frame already holds this name, a reset counter or another camera.
+            jpg_dir, base_name = os.path.split(jpg_name)
+            number = 1
+            while True:
+                number += 1
+                numbered_name = os.path.join(jpg_dir, _getNumberedName(base_name, number))
+                numbered_compressed_name = None if paired else os.path.join(
+                    os.path.dirname(compressed_name), _getCompressedName(os.path.basename(numbered_name)))
+                if self.fingerprints.contains(numbered_name) or numbered_name in self.reserved_names or \
+                        self.catalog.contains(numbered_name) or numbered_compressed_name in self.reserved_names or \
+                        (numbered_compressed_name is not None and self.catalog.contains(numbered_compressed_name)):
+                    continue
+                self.reserved_names.add(numbered_name)
+                if numbered_compressed_name is not None:
+                    self.reserved_names.add(numbered_compressed_name)
+                break
+        self.import_stats.addCount("renamed")
+        return date_taken, numbered_name, numbered_compressed_name, False
+
+    def _isOrphanedCompressed(self, jpg_name, compressed_name, date_taken):
+        # A compressed image whose original is gone: no other original in its folder shares the
+        # stem, and it still carries the date this frame was taken, stamped by the import.
+        jpg_dir, base_name = os.path.split(jpg_name)
+        stem = os.path.splitext(base_name)[0]
+        if any(os.path.splitext(name)[0] == stem for name in self.catalog.names(jpg_dir)):
+            return False
+        mtime_ns = self.catalog.mtime(compressed_name)
+        return mtime_ns is not None and abs(mtime_ns / 1e9 - timestamps.dateTakenToTimestamp(date_taken)) < 1
+
+    def _readImage(self, card, scanned):
+        # The only stage that touches the card. Files seen on a previous import are settled by the
+        # stat taken while scanning, new ones are read once front to back and dated, fingerprinted
+        # and copied from memory.
+        input_file = scanned.path
+        stat_result = scanned.stat
+        cached = self.scan_cache.get(input_file, stat_result)
+        unfinished = self.import_journal.get(input_file, stat_result)
+        if unfinished is None and cached is not None and self._isImported(cached[1], cached[2], cached[3]):
+            self._imageDone(card)
+            return None
+        data = None
+        digest = None
+        if unfinished is None or not self._hasLocalCopy(unfinished[0], unfinished[2], stat_result):
+            digest = manifest.newDigest() if self.checksums else None
+            with self.import_stats.measure("read") as measurement:
+                data = cardreader.readFile(input_file, is_canceled=self.cancel_token, digest=digest)
+                measurement.bytes_read = len(data)
+        item = self._resolveImage(card, input_file, stat_result, cached, unfinished, data)
+        if item is not None and not item.done & journal.COPIED:
+            item.data = data
+            item.sha256 = digest.hexdigest() if digest is not None else None
+        return item
+
+    def _writeImage(self, item):
+        if not item.done & journal.COPIED:
+            self._ensureDir(os.path.dirname(item.output_jpg_file))
+            with self.import_stats.measure("write") as measurement:
+                measurement.bytes_written = copier.writeFile(item.output_jpg_file, item.data)
+            item.data = None
+            self.import_journal.mark(item.input_file, journal.COPIED)
+        elif self.checksums:
+            # Copied by an interrupted import, the card isn't read again so its copy is hashed.
+            item.sha256 = copier.hashFile(item.output_jpg_file, manifest.newDigest(), is_canceled=self.cancel_token)
+        item.written.append(item.output_jpg_file)
+        return item
+
+    def _compressImage(self, item):
+        if item.output_compressed_file is None:
+            return item
+        if item.done & journal.COMPRESSED:
+            item.written.append(item.output_compressed_file)
+            return item
+        self._ensureDir(os.path.dirname(item.output_compressed_file))
+        # Compress from the fresh library copy, it is still in the page cache and the card
+        # doesn't have to be read a second time.
+        with self.import_stats.measure("compress") as measurement:
+            self._trackEncodes(1)
+            try:
+                # Timed from the pipeline thread, the Pillow encoder runs in another process.
+                with tracing.span("encode", "encode"):
+                    self.encoder_pool.submit(
+                        encoders.encodeImage, self.encoder_name, item.output_jpg_file, item.output_compressed_file,
+                        self.compression_quality, item.date_taken, self.max_edge).result()
+            finally:
+                self._trackEncodes(-1)
+            measurement.bytes_read = item.size
+            measurement.bytes_written = os.path.getsize(item.output_compressed_file)
+        self.catalog.add(os.path.relpath(item.output_compressed_file, self.workdir), measurement.bytes_written)
+        self.import_journal.mark(item.input_file, journal.COMPRESSED)
+        item.written.append(item.output_compressed_file)
+        return item
+
+    def _verifyImage(self, item):
+        # After compressing, so the encoder still finds the copy in the page cache.
+        if item.done & journal.COPIED or item.sha256 is None:
+            return item
+        with self.import_stats.measure("verify") as measurement:
+            hex_digest = copier.hashFile(item.output_jpg_file, manifest.newDigest(), uncached=True,
+                                         is_canceled=self.cancel_token)
+            measurement.bytes_read = item.size
+        if hex_digest != item.sha256:
+            for path in item.written:
+                os.remove(path)
+            raise copier.ChecksumMismatch(f"{item.output_jpg_file} differs from {item.input_file}")
+        return item
+
+    def _stampImage(self, card, item):
+        # Timestamps are set in batches, one per date folder as the items arrive mostly in order.
+        output_dir = os.path.dirname(item.output_jpg_file)
+        if card.stamp_batch and (card.stamp_dir != output_dir or len(card.stamp_batch) >= _STAMP_BATCH_SIZE):
+            self._flushStamps(card)
+        card.stamp_dir = output_dir
+        card.stamp_batch.append(item)
+        return None
+
+    def _flushStamps(self, card):
+        batch = card.stamp_batch
+        card.stamp_batch = []
+        if len(batch) == 0:
+            return
+        with self.import_stats.measure("stamp") as measurement:
+            measurement.files = len(batch)
+            files = [(path, item.date_taken) for item in batch for path in item.written]
+            for path in timestamps.stampFiles(files):
+                self.on_status(f"{path} failed to set timestamps.")
+        for item in batch:
+            # Indexed after stamping so the recorded mtime is the final one.
+            if item.output_jpg_file in item.written:
+                jpg_name = os.path.relpath(item.output_jpg_file, self.workdir)
+                try:
+                    stat_result = os.stat(item.output_jpg_file)
+                except OSError:
+                    continue
+                self.fingerprints.add(jpg_name, stat_result, item.quick)
+                self.catalog.add(jpg_name, stat_result.st_size, stat_result.st_mtime_ns)
+                if item.sha256 is not None:
+                    self.manifest.add(jpg_name, item.sha256)
+        # On disk before the journal lets go of the frames, an interruption in between hashes them again.
+        if self.manifest is not None:
+            self.manifest.save()
+        self.import_journal.finish([item.input_file for item in batch])
+        for item in batch:
+            self._imageDone(card, item)
+        self._updateQueueDepths()
+
+    def _updateQueueDepths(self):
+        depths = {}
+        for card in self.cards:
+            if card.pipeline is not None:
+                for name, depth in card.pipeline.queueDepths().items():
+                    depths[name] = depths.get(name, 0) + depth
+        for name, depth in depths.items():
+            self.import_stats.setQueueDepth(name, depth)
+
+    def _pipelineError(self, card, stage_name, item, error):
+        if isinstance(error, copier.CopyCanceled):
+            return
+        print(f"Exception in {stage_name} stage:", error, file=sys.stderr)
+        traceback.print_exception(type(error), error, error.__traceback__)
+        if isinstance(error, copier.ChecksumMismatch):
+            self.on_status(f"{item.input_file} was copied with errors, run the import again to retry it.")
+            self._imageDone(card, item)
+        elif isinstance(item, ImportItem):
+            self.on_status(f"{item.input_file} failed to import.")
+            self._imageDone(card, item)
+        elif item is not None:
+            self._imageDone(card)
+
+    def _finishTuning(self):
+        limits = self.tuner.limits()
+        self.card_readers = limits["card_readers"]
+        self.dest_writers = limits["dest_writers"]
+        self.encoder_workers = limits.get("encoder_workers", self.encoder_workers)
+        self.on_status(f"Tuned to {self.card_readers} card readers, {self.dest_writers} writers and "
+                       f"{self.encoder_workers} encoders.")
+
+    def runImageImport(self, cards, workdir):
+        """ Streams images from scan through read, write, compress, verify and stamp stages, one pipeline per card. """
+        if len(cards) <= 0:
+            self.on_status(f"All images up to date.")
             return
 
-        # Make the new directories in the main thread
-        for input_file, date_taken, output_jpg_file, output_compressed_file in new_source_images_tuple:
-            if not os.path.exists(os.path.dirname(output_jpg_file)):
-                os.mkdir(os.path.dirname(output_jpg_file))
-            if not os.path.exists(os.path.dirname(output_compressed_file)):
-                os.mkdir(os.path.dirname(output_compressed_file))
-
-        if len(new_source_images_tuple) > 0:
-            # progress_bar.setRange(0, len(new_source_images_tuple))
-            counter = 0
-            image_lists = _splitList(new_source_images_tuple, num_threads)
-            with ThreadPoolExecutor(max_workers=num_threads) as executor:
-                futures = [executor.submit(self._processImages, input_file, date_taken, output_jpg_file, output_compressed_file, quality)
-                           for sublist in image_lists for input_file, date_taken, output_jpg_file, output_compressed_file in sublist]
-                # Use as_completed to iterate over completed futures
-                for future in as_completed(futures):
-                    try:
-                        result = future.result()
-                        counter += 1
-                        self.progress.emit(counter)
-                        if result is not None:
-                            self.status.emit(f"{result} failed to write.", file=sys.stderr)
-                    except Exception as e:
-                        print("Exception:", e, file=sys.stderr)
-                        traceback.print_exc()
+        self.progress_lock = threading.Lock()
+        self.images_found = 0
+        self.images_done = 0
+        self.names_lock = threading.Lock()
+        self.reserved_names = set()
+        self.paired_raws = set()
+        self.import_journal = openJournal(workdir)
+        self.import_journal.removePartials()
+        self.on_status("Importing images." if len(cards) == 1 else f"Importing images from {len(cards)} cards.")
+        self.on_range(0, 0)
+
+        # Every pool gets as many threads as it may grow to, its limit sets how many are busy. Each
+        # card has its own read limit, the write and encode limits are shared by every card.
+        read_limits = scheduler.LimitGroup(card.read_limit for card in cards)
+        write_limit = scheduler.ConcurrencyLimit(self.dest_writers)
+        encode_limit = scheduler.ConcurrencyLimit(self.encoder_workers)
+        num_readers, num_writers, num_encoders = self.card_readers, self.dest_writers, self.encoder_workers
+        self.tuner = None
+        if self.auto_tune:
+            num_readers = max(num_readers, _MAX_CARD_READERS)
+            num_writers = max(num_writers, _MAX_DEST_WRITERS)
+            num_encoders = max(num_encoders, 2 * defaultEncoderWorkers())
+            pools = [autotune.TunedPool("card_readers", read_limits, 1, num_readers),
+                     autotune.TunedPool("dest_writers", write_limit, 1, num_writers)]
+            if self.run_compress:
+                pools.append(autotune.TunedPool("encoder_workers", encode_limit, 1, num_encoders))
+            self.tuner = autotune.AutoTuner(pools)
+
+        encoder = encoders.getEncoder(self.encoder_name)
+        self.encoder_pool = encoder.createPool(num_encoders)
+        try:
+            for card in cards:
+                stages = [
+                    Stage("read", functools.partial(self._readImage, card), num_readers, limit=card.read_limit),
+                    Stage("write", self._writeImage, num_writers, maxsize=_READ_AHEAD_FILES, limit=write_limit),
+                ]
+                if self.run_compress:
+                    stages.append(Stage("compress", self._compressImage, num_encoders, limit=encode_limit))
+                if self.verify_copies:
+                    stages.append(Stage("verify", self._verifyImage, num_writers))
+                stages.append(Stage("stamp", functools.partial(self._stampImage, card), 1,
+                                    finish=functools.partial(self._flushStamps, card)))
+                card.pipeline = Pipeline(
+                    self._scanImages(card), stages,
+                    is_canceled=self.cancel_token, on_error=functools.partial(self._pipelineError, card))
+            if len(cards) == 1:
+                cards[0].pipeline.run()
+            else:
+                threads = [threading.Thread(target=card.pipeline.run, name=f"card-{card.index}", daemon=True)
+                           for card in cards]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        finally:
+            # Only running encodes are waited for, there is at most one per compress worker.
+            self.encoder_pool.shutdown(wait=True, cancel_futures=self.is_canceled)
+
+        self.scan_cache.save()
+        self.fingerprints.save()
+        self.import_journal.close()
+        counters = self.import_stats.snapshot()["counters"]
+        if counters.get("resumed", 0) + counters.get("repaired", 0) > 0:
+            self.on_status(f"Resumed {counters.get('resumed', 0) + counters.get('repaired', 0)} interrupted images.")
+        if counters.get("duplicates", 0) > 0:
+            self.on_status(f"Skipped {counters['duplicates']} images already in the library under another name.")
+        if counters.get("renamed", 0) > 0:
+            self.on_status(f"Numbered {counters['renamed']} images whose names were taken by different frames.")
+        if self.import_stats.files_total == 0 and not self.is_canceled:
+            self.on_status(f"All images up to date.")
+
+
+def _printJson(event, **fields):
+    fields["event"] = event
+    print(json.dumps(fields), flush=True)
+
+
+def _createEngine(args, import_locations):
+    engine = ImportEngine(args.dst, import_locations, not args.no_compress, not args.no_movies, args.quality,
+                          card_readers=args.card_readers, dest_writers=args.dest_writers,
+                          encoder_workers=args.encoders, auto_tune=args.auto_tune,
+                          scan_cache_size=args.scan_cache_size, encoder_name=args.encoder,
+                          movie_copies=args.movie_copies, max_edge=args.max_edge,
+                          checksums=not args.no_checksums, verify_copies=args.verify,
+                          trace_path=args.trace, profile_path=args.profile)
+    progress_range = [0, 0]
+
+    def _range(minimum, maximum):
+        progress_range[:] = [minimum, maximum]
+
+    engine.on_range = _range
+    if args.json:
+        engine.on_progress = lambda done: _printJson("progress", done=done, total=progress_range[1])
+        engine.on_status = lambda message: _printJson("status", message=message)
+        engine.on_stats = lambda snapshot: _printJson("stats", **snapshot)
+        engine.on_card_progress = lambda index, name, done, found: _printJson(
+            "card", index=index, name=name, done=done, total=found)
+        engine.on_finished = lambda: _printJson("finished")
+        engine.on_canceled = lambda: _printJson("canceled")
+    else:
+        engine.on_status = lambda message: print(message, flush=True)
+        engine.on_stats = lambda snapshot: print(
+            f"  {snapshot['files_done']}/{snapshot['files_total']} files  {snapshot['mb_per_s']:.1f} MB/s  "
+            f"ETA {stats.formatEta(snapshot['eta_seconds'])}", flush=True)
+    return engine
+
+
+def _runEngine(engine, args):
+    """ Plans, then imports unless args.plan, returns True if Ctrl-C canceled it. """
+
+    def _run():
+        import_plan = engine.plan()
+        if import_plan is None:
+            engine.finishTrace()
+            return
+        if args.json:
+            _printJson("plan", cards=import_plan.cards, **import_plan.totals())
+        if not args.plan:
+            engine.run()
         else:
-            self.status.emit("All images are up to date.")
+            engine.finishTrace()
+
+    # The engine runs on its own thread so Ctrl-C can cancel it cleanly.
+    scheduler.runInterruptible(_run, engine.cancel, "import")
+    return engine.is_canceled
+
+
+def _watch(args):
+    card_watcher = watcher.CardWatcher(args.mount_root or watcher.MOUNT_ROOTS)
+    print(f"Watching {', '.join(card_watcher.roots)} for cards, Ctrl-C to stop.", flush=True)
+    try:
+        while True:
+            # Cards already inserted when watching starts are imported too, a card seen before
+            # costs no more than a rescan.
+            inserted = card_watcher.wait()
+            import_locations = [location for card in inserted for location in scanner.findImportLocations(card)]
+            if args.json:
+                _printJson("inserted", cards=inserted)
+            else:
+                print(f"Card inserted: {', '.join(inserted)}", flush=True)
+            if _runEngine(_createEngine(args, import_locations), args):
+                return 1
+    except KeyboardInterrupt:
+        return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m core",
+        description="Import photos and movies from camera cards into a PhotoImporter library without the GUI.")
+    parser.add_argument("--src", action="append",
+                        help="Volume, DCIM folder or camera folder to import. May be given more than once, "
+                             "cards in different readers are imported at the same time.")
+    parser.add_argument("--dst", required=True, help="Library folder.")
+    parser.add_argument("--watch", action="store_true",
+                        help="Instead of --src, wait for cards to be mounted and import each one unattended.")
+    parser.add_argument("--mount-root", action="append",
+                        help=f"Folder --watch looks for cards in, may be given more than once "
+                             f"(default {', '.join(watcher.MOUNT_ROOTS)}).")
+    parser.add_argument("--plan", action="store_true",
+                        help="Only report what would be imported, copy nothing.")
+    parser.add_argument("--card-readers", type=int, default=1,
+                        help="Concurrent card reads, 1 reads the card in one sequential sweep (default 1).")
+    parser.add_argument("--dest-writers", type=int, default=4, help="Concurrent library writes (default 4).")
+    parser.add_argument("--encoders", type=int, default=defaultEncoderWorkers(),
+                        help="Concurrent encodes (default one per core).")
+    parser.add_argument("--auto-tune", action="store_true",
+                        help="Adjust the three pools above while the first few hundred images import.")
+    parser.add_argument("--quality", type=float, default=90.0, help="Compression quality in percent (default 90).")
+    parser.add_argument("--max-edge", type=int, default=0,
+                        help="Long edge of the Compressed images in pixels, 0 keeps the full resolution (default 0).")
+    parser.add_argument("--encoder", choices=sorted(encoders.ENCODERS), default=encoders.DEFAULT_ENCODER,
+                        help="Compression backend.")
+    parser.add_argument("--no-compress", action="store_true", help="Only copy, don't write Compressed images.")
+    parser.add_argument("--no-movies", action="store_true", help="Skip movie files.")
+    parser.add_argument("--movie-copies", type=int, default=2, help="Concurrent movie copies (default 2).")
+    parser.add_argument("--no-checksums", action="store_true",
+                        help=f"Don't hash the originals into the library's {manifest.MANIFEST_NAME}.")
+    parser.add_argument("--verify", action="store_true",
+                        help="Read every copy back from the library and compare it to the card's checksum.")
+    parser.add_argument("--scan-cache-size", type=int, default=50000,
+                        help="Source files remembered between imports, 0 disables the cache (default 50000).")
+    parser.add_argument("--trace", metavar="TRACE.json",
+                        help="Write a Chrome trace of where the import spent its time on each thread, for "
+                             "chrome://tracing or ui.perfetto.dev, and a summary table next to it.")
+    parser.add_argument("--profile", metavar="IMPORT.prof",
+                        help="Run the import under cProfile on every thread and write the stats, "
+                             "read them with python -m pstats.")
+    parser.add_argument("--json", action="store_true", help="Print progress as one JSON object per line.")
+    args = parser.parse_args(argv)
+
+    if not args.src and not args.watch:
+        parser.error("one of --src or --watch is required")
+    import_locations = []
+    for src in args.src or []:
+        locations = scanner.findImportLocations(src)
+        if len(locations) == 0:
+            parser.error(f"no camera folders found in {src}")
+        import_locations.extend(locations)
+    if not os.path.isdir(args.dst):
+        parser.error(f"library folder {args.dst} does not exist")
+
+    for folder, enabled in (("JPG", True), ("Compressed", not args.no_compress), ("Video", not args.no_movies)):
+        if enabled:
+            os.makedirs(os.path.join(args.dst, folder), exist_ok=True)
+
+    if args.watch:
+        return _watch(args)
+    return 1 if _runEngine(_createEngine(args, import_locations), args) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
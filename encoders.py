@@ -0,0 +1,150 @@
+import io
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import copier
+import raw
+
+_TAG_DATE_TIME = 0x0132
+_TAG_EXIF_IFD = 0x8769
+_TAG_DATE_TIME_ORIGINAL = 0x9003
+
+_GM_SEARCH_PATHS = ["/opt/homebrew/bin/gm", "/usr/local/bin/gm", "/usr/bin/gm"]
+
+
+def scaledSize(size, max_edge):
+    """ (width, height) of size shrunk to fit a long edge of max_edge, size itself if it already fits. """
+    width, height = size
+    if not max_edge or max(width, height) <= max_edge:
+        return size
+    ratio = max_edge / max(width, height)
+    return max(1, int(round(width * ratio))), max(1, int(round(height * ratio)))
+
+
+def findGm():
+    """ Returns the path to the GraphicsMagick binary, or None if it isn't installed. """
+    path = shutil.which("gm")
+    if path is not None:
+        return path
+    for candidate in _GM_SEARCH_PATHS:
+        if os.access(candidate, os.X_OK):
+            return candidate
+    return None
+
+
+class PillowEncoder(object):
+    name = "pillow"
+    label = "Pillow"
+
+    def available(self):
+        try:
+            import PIL  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def createPool(self, num_workers):
+        # Decode and encode hold the GIL for long stretches, so they get their own processes.
+        return ProcessPoolExecutor(max_workers=num_workers)
+
+    def encode(self, input_file, output_file, quality, date_taken=None, data=None, max_edge=None):
+        from PIL import Image
+        with Image.open(input_file if data is None else io.BytesIO(data)) as image:
+            target_size = scaledSize(image.size, max_edge)
+            if target_size != image.size:
+                # Decode at 1/2, 1/4 or 1/8 scale in the DCT domain, the largest that is still at
+                # least target_size, so a small output never pays for a full resolution decode.
+                image.draft(None, target_size)
+            save_args = {"quality": int(round(quality))}
+            # Keep the camera metadata and color profile like gm convert does.
+            for key in ("exif", "icc_profile"):
+                if image.info.get(key):
+                    save_args[key] = image.info[key]
+            if date_taken is not None:
+                exif_data = image.getexif()
+                exif_date = date_taken.replace("/", ":")
+                exif_ifd = exif_data.get_ifd(_TAG_EXIF_IFD)
+                if exif_ifd.get(_TAG_DATE_TIME_ORIGINAL) != exif_date:
+                    # Only re-serialize the Exif block when the capture date is missing from it.
+                    exif_ifd[_TAG_DATE_TIME_ORIGINAL] = exif_date
+                    exif_data[_TAG_DATE_TIME] = exif_date
+                    save_args["exif"] = exif_data
+            if image.size != target_size:
+                image.resize(target_size, Image.Resampling.LANCZOS).save(output_file, "JPEG", **save_args)
+            else:
+                image.save(output_file, "JPEG", **save_args)
+
+
+class GmEncoder(object):
+    name = "gm"
+    label = "GraphicsMagick"
+
+    def __init__(self):
+        self.path = findGm()
+
+    def available(self):
+        return self.path is not None
+
+    def createPool(self, num_workers):
+        # The work happens in the gm process, threads are enough to keep them busy.
+        return ThreadPoolExecutor(max_workers=num_workers)
+
+    def encode(self, input_file, output_file, quality, date_taken=None, data=None, max_edge=None):
+        # gm convert carries the source Exif block, capture date included, into the output.
+        if self.path is None:
+            raise RuntimeError("GraphicsMagick is not installed.")
+        args = [self.path, "convert"]
+        if max_edge:
+            # -size before the input lets libjpeg decode at a reduced DCT scale, -resize with >
+            # only ever shrinks.
+            args += ["-size", f"{max_edge}x{max_edge}"]
+        args.append(input_file if data is None else "JPEG:-")
+        if max_edge:
+            args += ["-resize", f"{max_edge}x{max_edge}>"]
+        args += ["-quality", f"{quality}%", f"JPEG:{output_file}"]
+        result = subprocess.run(args, input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            raise RuntimeError(f"gm convert failed for {input_file}: {result.stderr.decode('utf-8').strip()}")
+
+
+ENCODERS = {
+    PillowEncoder.name: PillowEncoder,
+    GmEncoder.name: GmEncoder,
+}
+
+DEFAULT_ENCODER = PillowEncoder.name
+
+_instances = {}
+
+
+def getEncoder(name):
+    if name not in ENCODERS:
+        raise ValueError(f"Unknown encoder {name}, expected one of {', '.join(ENCODERS)}.")
+    if name not in _instances:
+        _instances[name] = ENCODERS[name]()
+    return _instances[name]
+
+
+def availableEncoders():
+    return [name for name in ENCODERS if getEncoder(name).available()]
+
+
+def encodeImage(encoder_name, input_file, output_file, quality, date_taken=None, max_edge=None):
+    # Module level so it can be pickled into a process pool. Encoded under a temporary name like
+    # copies, an interrupted encode leaves no truncated output behind.
+    data = None
+    if raw.isRaw(input_file):
+        # Demosaicing takes seconds, the camera's own preview is a finished JPEG read in milliseconds.
+        data = raw.embeddedJpeg(input_file)
+        if data is None:
+            raise RuntimeError(f"{input_file} has no embedded JPEG preview.")
+    temp_file = copier.partialPath(output_file)
+    try:
+        getEncoder(encoder_name).encode(input_file, temp_file, quality, date_taken, data, max_edge)
+        os.replace(temp_file, output_file)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
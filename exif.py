@@ -0,0 +1,122 @@
+import io
+import struct
+
+# The APP1 segment is capped at 64 KiB by its 16-bit length, so one read of this size
+# normally covers the SOI, an optional APP0 and the whole Exif block.
+_HEAD_READ_SIZE = 65536
+
+_TAG_EXIF_IFD = 0x8769
+_TAG_DATE_TIME_ORIGINAL = 0x9003
+
+_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8}
+
+
+def readIfd(tiff, offset, byte_order):
+    """ Returns {tag: (type, count, value_or_offset_bytes)} for the IFD at offset. """
+    if offset + 2 > len(tiff):
+        return {}
+    (count,) = struct.unpack_from(byte_order + "H", tiff, offset)
+    entries = {}
+    for index in range(count):
+        entry_offset = offset + 2 + index * 12
+        if entry_offset + 12 > len(tiff):
+            break
+        tag, value_type, value_count = struct.unpack_from(byte_order + "HHI", tiff, entry_offset)
+        entries[tag] = (value_type, value_count, tiff[entry_offset + 8:entry_offset + 12])
+    return entries
+
+
+def entryData(tiff, entry, byte_order):
+    value_type, value_count, raw = entry
+    size = _TYPE_SIZES.get(value_type, 1) * value_count
+    if size <= 4:
+        return raw[:size]
+    (offset,) = struct.unpack(byte_order + "I", raw)
+    return tiff[offset:offset + size]
+
+
+def entryLong(entry, byte_order):
+    value_type, value_count, raw = entry
+    if value_type == 3:
+        return struct.unpack(byte_order + "H", raw[:2])[0]
+    return struct.unpack(byte_order + "I", raw)[0]
+
+
+def parseTiffDateTimeOriginal(tiff):
+    """ Returns the DateTimeOriginal string from a TIFF structured Exif block, or None. """
+    if len(tiff) < 8:
+        return None
+    if tiff[:2] == b"II":
+        byte_order = "<"
+    elif tiff[:2] == b"MM":
+        byte_order = ">"
+    else:
+        return None
+    magic, ifd0_offset = struct.unpack_from(byte_order + "HI", tiff, 2)
+    if magic != 42:
+        return None
+
+    ifd0 = readIfd(tiff, ifd0_offset, byte_order)
+    if _TAG_EXIF_IFD not in ifd0:
+        return None
+    exif_ifd = readIfd(tiff, entryLong(ifd0[_TAG_EXIF_IFD], byte_order), byte_order)
+    if _TAG_DATE_TIME_ORIGINAL not in exif_ifd:
+        return None
+    value = entryData(tiff, exif_ifd[_TAG_DATE_TIME_ORIGINAL], byte_order)
+    return value.split(b"\x00", 1)[0].decode("ascii", "replace").strip() or None
+
+
+def readJpegExifBlock(file_obj, start=0):
+    """ Returns the TIFF structured payload of the first Exif APP1 segment, or None. """
+    file_obj.seek(start)
+    data = file_obj.read(_HEAD_READ_SIZE)
+    if data[:2] != b"\xff\xd8":
+        return None
+
+    position = 2
+    while position + 4 <= len(data):
+        if data[position] != 0xFF:
+            return None
+        marker = data[position + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker.
+            position += 1
+            continue
+        (length,) = struct.unpack_from(">H", data, position + 2)
+        segment_start = position + 4
+        segment_end = position + 2 + length
+        if marker == 0xE1:
+            if segment_end > len(data):
+                # Rare oversized leading segments, read just the remainder of this one.
+                data += file_obj.read(segment_end - len(data))
+            segment = data[segment_start:segment_end]
+            if segment[:6] == b"Exif\x00\x00":
+                return segment[6:]
+        elif marker == 0xDA or not (0xE0 <= marker <= 0xEF or marker == 0xFE):
+            # Exif must come before the image data and tables; stop at the first one.
+            return None
+        position = segment_end
+        if position + 4 > len(data):
+            data += file_obj.read(position + 4 - len(data))
+    return None
+
+
+def readDateTimeOriginal(path, data=None):
+    """ Header-only read of the EXIF DateTimeOriginal tag of a JPEG, returns None when not found.
+
+    data, the file's bytes if they are already in memory, saves opening path.
+    """
+    try:
+        if data is not None:
+            tiff = readJpegExifBlock(io.BytesIO(data))
+        else:
+            with open(path, "rb") as f:
+                tiff = readJpegExifBlock(f)
+    except (OSError, struct.error):
+        return None
+    if tiff is None:
+        return None
+    try:
+        return parseTiffDateTimeOriginal(tiff)
+    except struct.error:
+        return None
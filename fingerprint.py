@@ -0,0 +1,217 @@
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import scheduler
+import tracing
+
+# Head and tail blocks hashed for the quick fingerprint. The head holds the Exif block with the
+# capture time and camera serial, the tail the end of the entropy coded data.
+_BLOCK_SIZE = 64 * 1024
+_FULL_HASH_CHUNK = 1024 * 1024
+
+_SCHEMA_VERSION = 1
+
+
+def quickFingerprint(path, size=None):
+    """ Returns 'size:hash' over the first and last 64 KiB of path, cheap enough to run on every card file. """
+    with open(path, "rb") as f:
+        if size is None:
+            size = os.fstat(f.fileno()).st_size
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f.read(_BLOCK_SIZE))
+        if size > _BLOCK_SIZE:
+            f.seek(max(_BLOCK_SIZE, size - _BLOCK_SIZE))
+            digest.update(f.read(_BLOCK_SIZE))
+    return f"{size}:{digest.hexdigest()}"
+
+
+def quickFingerprintData(data):
+    """ quickFingerprint of a file already read into memory. """
+    size = len(data)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(data[:_BLOCK_SIZE])
+    if size > _BLOCK_SIZE:
+        start = max(_BLOCK_SIZE, size - _BLOCK_SIZE)
+        digest.update(data[start:start + _BLOCK_SIZE])
+    return f"{size}:{digest.hexdigest()}"
+
+
+def fullHash(path, data=None):
+    if data is not None:
+        return hashlib.blake2b(data).hexdigest()
+    digest = hashlib.blake2b()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(_FULL_HASH_CHUNK)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FingerprintIndex(object):
+    """ Persistent index of the quick fingerprints of every original in a library folder.
+
+    Lookups are in memory, full hashes are only computed for files whose quick fingerprints match
+    and are remembered once computed.
+    """
+
+    def __init__(self, db_path, library_dir):
+        self.db_path = db_path
+        self.library_dir = library_dir
+        self._lock = threading.Lock()
+        self._by_path = {}
+        self._by_quick = {}
+        self._dirty = {}
+        self._removed = set()
+        self._load()
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        connection = sqlite3.connect(self.db_path)
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != _SCHEMA_VERSION:
+            connection.execute("DROP TABLE IF EXISTS files")
+            connection.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "rel_path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, quick TEXT, full TEXT)")
+        connection.execute("CREATE INDEX IF NOT EXISTS files_quick ON files (quick)")
+        return connection
+
+    def _load(self):
+        try:
+            connection = self._connect()
+            try:
+                rows = connection.execute("SELECT rel_path, size, mtime_ns, quick, full FROM files").fetchall()
+            finally:
+                connection.close()
+        except sqlite3.DatabaseError:
+            if os.path.exists(self.db_path):
+                os.remove(self.db_path)
+            rows = []
+        for rel_path, size, mtime_ns, quick, full in rows:
+            self._by_path[rel_path] = [size, mtime_ns, quick, full]
+            self._by_quick.setdefault(quick, set()).add(rel_path)
+
+    def _set(self, rel_path, entry):
+        previous = self._by_path.get(rel_path)
+        if previous is not None:
+            self._by_quick.get(previous[2], set()).discard(rel_path)
+        self._by_path[rel_path] = entry
+        self._by_quick.setdefault(entry[2], set()).add(rel_path)
+        self._dirty[rel_path] = entry
+        self._removed.discard(rel_path)
+
+    @tracing.traced("fingerprints.refresh", "check")
+    def refresh(self, files, num_threads=4, is_canceled=None):
+        """ Brings the index up to date with files, (rel_path, size, mtime_ns) of every library file to index.
+
+        Returns the number of files fingerprinted, or None if is_canceled() stopped it part way.
+        """
+        is_canceled = is_canceled if is_canceled is not None else (lambda: False)
+        seen = set()
+        to_hash = []
+        for rel_path, size, mtime_ns in files:
+            seen.add(rel_path)
+            known = self._by_path.get(rel_path)
+            if known is None or known[0] != size or known[1] != mtime_ns:
+                to_hash.append((rel_path, size, mtime_ns))
+
+        def _hashThread(job):
+            rel_path, size, mtime_ns = job
+            try:
+                quick = quickFingerprint(os.path.join(self.library_dir, rel_path), size)
+            except OSError as e:
+                print(f"Warning: could not fingerprint {rel_path}: {e}", file=sys.stderr)
+                return
+            with self._lock:
+                self._set(rel_path, [size, mtime_ns, quick, None])
+
+        executor = scheduler.BoundedExecutor(
+            ThreadPoolExecutor(max_workers=max(1, num_threads)), 2 * max(1, num_threads), is_canceled)
+        with executor:
+            try:
+                for job in to_hash:
+                    executor.submit(_hashThread, job)
+            except scheduler.Canceled:
+                return None
+
+        with self._lock:
+            for rel_path in [rel_path for rel_path in self._by_path if rel_path not in seen]:
+                entry = self._by_path.pop(rel_path)
+                self._by_quick.get(entry[2], set()).discard(rel_path)
+                self._dirty.pop(rel_path, None)
+                self._removed.add(rel_path)
+        return len(to_hash)
+
+    def contains(self, rel_path):
+        return rel_path in self._by_path
+
+    def matches(self, rel_path, quick):
+        entry = self._by_path.get(rel_path)
+        return entry is not None and entry[2] == quick
+
+    def hasQuick(self, quick):
+        """ Whether any library file has the quick fingerprint quick, a likely duplicate. """
+        with self._lock:
+            return len(self._by_quick.get(quick, ())) > 0
+
+    def _fullHashOf(self, rel_path):
+        with self._lock:
+            entry = self._by_path.get(rel_path)
+            if entry is None:
+                return None
+            if entry[3] is not None:
+                return entry[3]
+        full = fullHash(os.path.join(self.library_dir, rel_path))
+        with self._lock:
+            entry = self._by_path.get(rel_path)
+            if entry is not None:
+                entry[3] = full
+                self._dirty[rel_path] = entry
+        return full
+
+    @tracing.traced("findDuplicate", "check")
+    def findDuplicate(self, input_file, quick, data=None):
+        """ Returns the library path holding the same bytes as input_file (or data, if given), or None. """
+        with self._lock:
+            candidates = sorted(self._by_quick.get(quick, ()))
+        if len(candidates) == 0:
+            return None
+        # Only a quick fingerprint collision costs a full read of the source.
+        source_hash = fullHash(input_file, data)
+        for rel_path in candidates:
+            try:
+                if self._fullHashOf(rel_path) == source_hash:
+                    return rel_path
+            except OSError:
+                continue
+        return None
+
+    def add(self, rel_path, stat_result, quick, full=None):
+        with self._lock:
+            self._set(rel_path, [stat_result.st_size, stat_result.st_mtime_ns, quick, full])
+
+    def save(self):
+        with self._lock:
+            dirty = self._dirty
+            removed = self._removed
+            self._dirty = {}
+            self._removed = set()
+        try:
+            connection = self._connect()
+            try:
+                with connection:
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                        [(rel_path,) + tuple(entry) for rel_path, entry in dirty.items()])
+                    connection.executemany("DELETE FROM files WHERE rel_path = ?", [(rel_path,) for rel_path in removed])
+            finally:
+                connection.close()
+        except sqlite3.DatabaseError as e:
+            print(f"Warning: could not write fingerprint index {self.db_path}: {e}", file=sys.stderr)
@@ -0,0 +1,111 @@
+import os
+import sqlite3
+import sys
+import threading
+
+import copier
+
+# Stage flags recorded per frame.
+COPIED = 1
+COMPRESSED = 2
+
+_SCHEMA_VERSION = 1
+
+
+class ImportJournal(object):
+    """ Write-ahead record of every frame an import has started, with the stages it has completed.
+
+    A frame is entered before anything is written for it and removed once it is stamped, so
+    after a crash or a pulled card the rows left over are exactly the unfinished frames.
+    """
+
+    def __init__(self, db_path, library_dir):
+        self.db_path = db_path
+        self.library_dir = library_dir
+        self._lock = threading.Lock()
+        self._entries = {}
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        try:
+            self._connection = self._connect()
+            rows = self._connection.execute(
+                "SELECT input_file, size, mtime_ns, jpg_name, compressed_name, flags FROM frames").fetchall()
+        except sqlite3.DatabaseError as e:
+            # Without a journal unfinished frames are redone from the card, nothing is lost.
+            print(f"Warning: resetting import journal {self.db_path}: {e}", file=sys.stderr)
+            for path in (self.db_path, self.db_path + "-wal", self.db_path + "-shm"):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._connection = self._connect()
+            rows = []
+        for input_file, size, mtime_ns, jpg_name, compressed_name, flags in rows:
+            self._entries[input_file] = (size, mtime_ns, jpg_name, compressed_name, flags)
+
+    def _connect(self):
+        connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        # WAL with normal sync makes every commit an append, cheap enough to do per stage.
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != _SCHEMA_VERSION:
+            connection.execute("DROP TABLE IF EXISTS frames")
+            connection.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS frames ("
+            "input_file TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, "
+            "jpg_name TEXT, compressed_name TEXT, flags INTEGER)")
+        connection.commit()
+        return connection
+
+    def pending(self):
+        return len(self._entries)
+
+    def removePartials(self):
+        """ Deletes the temporary files interrupted writes of unfinished frames left behind. """
+        removed = 0
+        for size, mtime_ns, jpg_name, compressed_name, flags in list(self._entries.values()):
+            for name in (jpg_name, compressed_name):
+                if name is None:
+                    continue
+                temp_file = copier.partialPath(os.path.join(self.library_dir, name))
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+                    removed += 1
+        return removed
+
+    def get(self, input_file, stat_result):
+        """ Returns (jpg_name, compressed_name, flags) for an unfinished frame whose source is unchanged. """
+        entry = self._entries.get(input_file)
+        if entry is None or entry[0] != stat_result.st_size or entry[1] != stat_result.st_mtime_ns:
+            return None
+        return entry[2:]
+
+    def begin(self, input_file, stat_result, jpg_name, compressed_name, flags=0):
+        entry = (stat_result.st_size, stat_result.st_mtime_ns, jpg_name, compressed_name, flags)
+        with self._lock:
+            self._entries[input_file] = entry
+            with self._connection:
+                self._connection.execute("INSERT OR REPLACE INTO frames VALUES (?, ?, ?, ?, ?, ?)",
+                                         (input_file,) + entry)
+
+    def mark(self, input_file, flag):
+        with self._lock:
+            entry = self._entries.get(input_file)
+            if entry is None:
+                return
+            self._entries[input_file] = entry[:4] + (entry[4] | flag,)
+            with self._connection:
+                self._connection.execute("UPDATE frames SET flags = flags | ? WHERE input_file = ?",
+                                         (flag, input_file))
+
+    def finish(self, input_files):
+        """ Drops finished frames, one transaction for the whole batch. """
+        with self._lock:
+            for input_file in input_files:
+                self._entries.pop(input_file, None)
+            with self._connection:
+                self._connection.executemany("DELETE FROM frames WHERE input_file = ?",
+                                             [(input_file,) for input_file in input_files])
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
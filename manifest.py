@@ -0,0 +1,129 @@
+import argparse
+import hashlib
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import catalog
+import copier
+
+HASH_NAME = "sha256"
+
+MANIFEST_NAME = "MANIFEST.sha256"
+
+# Folders holding originals copied from the cards, Compressed images are derived and not listed.
+ORIGINAL_FOLDERS = ("JPG", "Video")
+
+
+def newDigest():
+    return hashlib.new(HASH_NAME)
+
+
+def manifestPath(library_dir):
+    return os.path.join(library_dir, MANIFEST_NAME)
+
+
+class Manifest(object):
+    """ Checksums of the originals in a library, taken from the card's bytes as they were copied.
+
+    One "<hex digest>  <relative path>" line per file, the format sha256sum writes, so
+    `sha256sum -c MANIFEST.sha256` run in the library checks it as well. Lines are only ever
+    appended; a file imported again gets a new line and the last line for a path wins.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending = []
+        # Every card's pipeline saves from its own thread, appends must not interleave.
+        self._write_lock = threading.Lock()
+
+    def add(self, rel_path, hex_digest):
+        with self._lock:
+            self._pending.append((rel_path, hex_digest))
+
+    def save(self):
+        with self._lock:
+            pending = self._pending
+            self._pending = []
+        if len(pending) == 0:
+            return
+        with self._write_lock:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.writelines(f"{hex_digest}  {rel_path.replace(os.sep, '/')}\n" for rel_path, hex_digest in pending)
+            except OSError as e:
+                print(f"Warning: could not write checksum manifest {self.path}: {e}", file=sys.stderr)
+
+    def load(self):
+        """ Returns {rel_path: hex_digest}. """
+        entries = {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    hex_digest, separator, rel_path = line.rstrip("\n").partition("  ")
+                    if separator:
+                        entries[rel_path.replace("/", os.sep)] = hex_digest
+        except FileNotFoundError:
+            pass
+        return entries
+
+
+def audit(library_dir, num_workers=4, uncached=True):
+    """ Hashes every file listed in the library's manifest.
+
+    Returns (checked, mismatched, missing, unlisted): the number of files that matched, the paths
+    whose contents changed, the listed paths that are gone and the originals with no checksum.
+    """
+    entries = Manifest(manifestPath(library_dir)).load()
+    library_catalog = catalog.LibraryCatalog(
+        os.path.join(library_dir, ".photoimporter", "catalog.sqlite"), library_dir)
+    library_catalog.refresh(list(ORIGINAL_FOLDERS))
+    library_catalog.save()
+    unlisted = sorted(rel_path for folder in ORIGINAL_FOLDERS
+                      for rel_path, size, mtime_ns in library_catalog.files(folder) if rel_path not in entries)
+
+    def _check(rel_path):
+        try:
+            return copier.hashFile(os.path.join(library_dir, rel_path), newDigest(), uncached=uncached)
+        except FileNotFoundError:
+            return None
+
+    mismatched = []
+    missing = []
+    checked = 0
+    with ThreadPoolExecutor(max_workers=max(1, num_workers)) as executor:
+        rel_paths = sorted(entries)
+        for rel_path, hex_digest in zip(rel_paths, executor.map(_check, rel_paths)):
+            if hex_digest is None:
+                missing.append(rel_path)
+            elif hex_digest != entries[rel_path]:
+                mismatched.append(rel_path)
+            else:
+                checked += 1
+    return checked, mismatched, missing, unlisted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m manifest",
+        description="Check a PhotoImporter library against the checksums taken when its files were imported.")
+    parser.add_argument("--library", required=True, help="Library folder.")
+    parser.add_argument("--workers", type=int, default=4, help="Files hashed at the same time (default 4).")
+    args = parser.parse_args(argv)
+
+    checked, mismatched, missing, unlisted = audit(args.library, args.workers)
+    for rel_path in mismatched:
+        print(f"CHANGED  {rel_path}")
+    for rel_path in missing:
+        print(f"MISSING  {rel_path}")
+    for rel_path in unlisted:
+        print(f"NO CHECKSUM  {rel_path}")
+    print(f"{checked} files match, {len(mismatched)} changed, {len(missing)} missing, "
+          f"{len(unlisted)} without a checksum.", file=sys.stderr)
+    return 1 if mismatched or missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,308 @@
+import argparse
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import copier
+import core
+import fingerprint
+import scanner
+import scheduler
+
+# Date taken lookups only read a file's header, so they're bound by latency rather than bandwidth.
+DEFAULT_WORKERS = 16
+
+_PROGRESS_INTERVAL = 0.1
+
+# Folders and names written by a previous organize or import, e.g. 2023_04_01/2023_04_01_1000001.JPG
+_DATE_FOLDER = re.compile(r"^\d{4}_\d{2}_\d{2}$")
+
+# core.getLibraryMetaDir, a folder holding one is a PhotoImporter library and never reorganized.
+_LIBRARY_META_DIR = ".photoimporter"
+
+# Ways a file can be placed, also the keys of OrganizeEngine.counts.
+MOVED = "moved"
+CLONED = "cloned"
+LINKED = "linked"
+COPIED = "copied"
+
+
+def _ignore(*args):
+    pass
+
+
+def isFiled(input_file):
+    """ True when input_file already sits in a date folder under a name starting with that date. """
+    folder = os.path.basename(os.path.dirname(input_file))
+    return _DATE_FOLDER.match(folder) is not None and os.path.basename(input_file).startswith(folder + "_")
+
+
+def iterFiles(directory, skip=()):
+    """ Yields (path, stat) for the files below directory the scanner imports, one scandir pass, hidden entries skipped.
+
+    Libraries, folders holding a .photoimporter folder, are skipped with everything below them.
+    """
+    stack = [directory]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name)
+        except OSError:
+            continue
+        if any(entry.name == _LIBRARY_META_DIR and entry.is_dir(follow_symlinks=False) for entry in entries):
+            continue
+        folders = []
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                if entry.path not in skip:
+                    folders.append(entry.path)
+            elif scanner.classify(entry.name) is not None and entry.is_file(follow_symlinks=False):
+                yield entry.path, entry.stat(follow_symlinks=False)
+        stack.extend(reversed(folders))
+
+
+class OrganizeEngine(object):
+    """ Qt free re-filing of an existing folder of photos into date folders, named like an import.
+
+    Without output_dir files are renamed in place, which moves no data on the same filesystem.
+    With output_dir the source is left alone and every file is cloned, hard linked or, failing
+    both, copied. Dates are read by num_workers threads. Progress is reported through the same
+    on_* callbacks as core.ImportEngine.
+    """
+
+    def __init__(self, source_dir, output_dir=None, num_workers=DEFAULT_WORKERS, hardlinks=True):
+        self.on_progress = _ignore
+        self.on_range = _ignore
+        self.on_status = _ignore
+        self.on_finished = _ignore
+        self.on_canceled = _ignore
+        self.cancel_token = scheduler.CancelToken()
+        self.source_dir = os.path.abspath(source_dir)
+        self.output_dir = os.path.abspath(output_dir) if output_dir else None
+        self.dest_dir = self.output_dir or self.source_dir
+        self.num_workers = num_workers
+        # Hard links share the data with the source, edits to either show up in both.
+        self.hardlinks = hardlinks
+        self.counts = {MOVED: 0, CLONED: 0, LINKED: 0, COPIED: 0, "filed": 0, "duplicates": 0, "failed": 0}
+        self.bytes_copied = 0
+        self.errors = []
+        self.counts_lock = threading.Lock()
+        self.names_lock = threading.Lock()
+        self.reserved_names = set()
+        self.created_dirs = set()
+        self.emptied_dirs = set()
+        self.files_done = 0
+        self.last_progress_time = 0.0
+
+    @property
+    def is_canceled(self):
+        return self.cancel_token.isCanceled()
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
+    def run(self):
+        start = time.perf_counter()
+        self.on_status(f"Listing {self.source_dir}.")
+        skip = (self.output_dir,) if self.output_dir else ()
+        files = []
+        for path, stat_result in iterFiles(self.source_dir, skip):
+            if self.is_canceled:
+                break
+            files.append((path, stat_result))
+        dest_device = os.stat(self.dest_dir).st_dev
+        self.on_range(0, len(files))
+        self.on_progress(0)
+        self.on_status(f"Organizing {len(files)} files.")
+
+        executor = scheduler.BoundedExecutor(
+            ThreadPoolExecutor(max_workers=max(1, self.num_workers)), 4 * max(1, self.num_workers),
+            self.cancel_token)
+        with executor:
+            try:
+                for path, stat_result in files:
+                    executor.submit(self._organizeFile, path, stat_result, dest_device)
+            except scheduler.Canceled:
+                pass
+        if not self.is_canceled and self.output_dir is None:
+            self._removeEmptyDirs()
+        self.on_progress(self.files_done)
+
+        elapsed = time.perf_counter() - start
+        summary = ", ".join(f"{count} {name}" for name, count in self.counts.items() if count > 0)
+        print(f"Organized {self.files_done} files in {elapsed:.1f} s: {summary or 'nothing to do'}, "
+              f"{core.formatBytes(self.bytes_copied)} copied.", file=sys.stderr)
+        for path, error in self.errors[:20]:
+            print(f"  {path}: {error}", file=sys.stderr)
+        if self.is_canceled:
+            self.on_status(f"Organize canceled after {self.files_done} of {len(files)} files.")
+            self.on_canceled()
+            return
+        self.on_status(f"Organize complete: {summary or 'nothing to do'}.")
+        self.on_finished()
+
+    def getOutputName(self, input_file):
+        """ Path input_file is filed under in dest_dir, read from its date taken. Filed files stay where they are. """
+        if isFiled(input_file):
+            return input_file
+        if scanner.classify(input_file) == scanner.MOVIE:
+            return core._getOutputMovieNames(input_file, self.dest_dir)[1]
+        # Only the JPG name is used, organize doesn't write compressed images.
+        return core.getOutputImageNames(input_file, self.dest_dir, self.dest_dir)[1]
+
+    def _count(self, name, num_bytes=0):
+        with self.counts_lock:
+            self.counts[name] += 1
+            self.bytes_copied += num_bytes
+
+    def _organizeFile(self, input_file, stat_result, dest_device):
+        try:
+            if self.is_canceled:
+                return
+            self._placeFile(input_file, stat_result, dest_device)
+        except copier.CopyCanceled:
+            pass
+        except Exception as e:
+            with self.counts_lock:
+                self.counts["failed"] += 1
+                self.errors.append((input_file, e))
+        finally:
+            self._fileDone()
+
+    def _placeFile(self, input_file, stat_result, dest_device):
+        output_file = self.getOutputName(input_file)
+        if output_file == input_file:
+            self._count("filed")
+            return
+        output_file = self._reserveName(input_file, stat_result, output_file)
+        if output_file is None:
+            self._count("duplicates")
+            return
+        try:
+            self._ensureDir(os.path.dirname(output_file))
+            same_device = stat_result.st_dev == dest_device
+            if self.output_dir is None and same_device:
+                os.rename(input_file, output_file)
+                self.emptied_dirs.add(os.path.dirname(input_file))
+                self._count(MOVED)
+            elif self.output_dir is None:
+                # A folder mounted from another volume inside the source.
+                self._copy(input_file, stat_result, output_file)
+                os.remove(input_file)
+                self.emptied_dirs.add(os.path.dirname(input_file))
+                self._count(MOVED, stat_result.st_size)
+            elif copier.cloneFile(input_file, output_file):
+                os.utime(output_file, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns))
+                self._count(CLONED)
+            elif self.hardlinks and same_device:
+                os.link(input_file, output_file)
+                self._count(LINKED)
+            else:
+                self._copy(input_file, stat_result, output_file)
+                self._count(COPIED, stat_result.st_size)
+        finally:
+            with self.names_lock:
+                self.reserved_names.discard(output_file)
+
+    def _copy(self, input_file, stat_result, output_file):
+        copier.copyFile(input_file, output_file, is_canceled=self.cancel_token)
+        os.utime(output_file, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns))
+
+    def _reserveName(self, input_file, stat_result, output_file):
+        """ Claims output_file or the first free numbered name, None if the same frame is already there.
+
+        Only claiming a name holds names_lock, the stat and fingerprint of an existing file run
+        outside it so other files keep being placed while a slow share answers.
+        """
+        quick = None
+        number = 1
+        candidate = output_file
+        while True:
+            with self.names_lock:
+                while candidate in self.reserved_names:
+                    number += 1
+                    candidate = core._getNumberedName(output_file, number)
+                self.reserved_names.add(candidate)
+            claimed = False
+            try:
+                try:
+                    existing = os.stat(candidate)
+                except FileNotFoundError:
+                    claimed = True
+                    return candidate
+                if existing.st_size == stat_result.st_size:
+                    if quick is None:
+                        quick = fingerprint.quickFingerprint(input_file, stat_result.st_size)
+                    if fingerprint.quickFingerprint(candidate, existing.st_size) == quick:
+                        return None
+            finally:
+                # Held only while its existing file was compared.
+                if not claimed:
+                    with self.names_lock:
+                        self.reserved_names.discard(candidate)
+            number += 1
+            candidate = core._getNumberedName(output_file, number)
+
+    def _ensureDir(self, directory):
+        if directory in self.created_dirs:
+            return
+        os.makedirs(directory, exist_ok=True)
+        self.created_dirs.add(directory)
+
+    def _removeEmptyDirs(self):
+        # Deepest first so a folder emptied by removing its subfolders goes too.
+        candidates = set()
+        for directory in self.emptied_dirs:
+            while directory.startswith(self.source_dir + os.sep):
+                candidates.add(directory)
+                directory = os.path.dirname(directory)
+        for directory in sorted(candidates, key=len, reverse=True):
+            if directory in self.created_dirs:
+                continue
+            try:
+                os.rmdir(directory)
+            except OSError:
+                pass
+
+    def _fileDone(self):
+        now = time.time()
+        with self.counts_lock:
+            self.files_done += 1
+            if now - self.last_progress_time < _PROGRESS_INTERVAL:
+                return
+            self.last_progress_time = now
+            files_done = self.files_done
+        self.on_progress(files_done)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m organize",
+        description="File an existing folder of photos and movies into date folders named like an import.")
+    parser.add_argument("--src", required=True, help="Folder to organize.")
+    parser.add_argument("--dst", help="Fill this folder instead of renaming the files in place.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Files resolved at the same time (default {DEFAULT_WORKERS}).")
+    parser.add_argument("--no-hardlinks", action="store_true",
+                        help="With --dst, copy where the filesystem can't clone instead of hard linking.")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.src):
+        parser.error(f"folder {args.src} does not exist")
+    if args.dst is not None:
+        os.makedirs(args.dst, exist_ok=True)
+
+    engine = OrganizeEngine(args.src, args.dst, num_workers=args.workers, hardlinks=not args.no_hardlinks)
+    engine.on_status = lambda message: print(message, flush=True)
+
+    scheduler.runInterruptible(engine.run, engine.cancel, "organize")
+    return 1 if engine.is_canceled or engine.counts["failed"] > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+import queue
+import sys
+import threading
+import traceback
+
+import tracing
+
+# Marks the end of a stage's input, one per worker of the receiving stage.
+_DONE = object()
+
+# How often blocked workers wake up to check for cancellation.
+_POLL_INTERVAL = 0.1
+
+
+class Stage(object):
+    """ One step of a Pipeline, function(item) runs on num_workers threads.
+
+    function returns the item to hand to the next stage, or None to drop it. finish, if given,
+    runs once after the last item went through, on the thread of the last worker to exit. limit,
+    a scheduler.ConcurrencyLimit, caps how many of the workers run function at once.
+    """
+
+    def __init__(self, name, function, num_workers=1, maxsize=None, finish=None, limit=None):
+        self.name = name
+        self.function = function
+        self.num_workers = max(1, num_workers)
+        self.finish = finish
+        self.limit = limit
+        # Bounded so a fast stage can't run ahead and pile the whole card up in memory.
+        self.queue = queue.Queue(maxsize=maxsize if maxsize is not None else 2 * self.num_workers)
+        self._running = self.num_workers
+        self._lock = threading.Lock()
+
+
+class Pipeline(object):
+    """ Streams items from source through stages connected by bounded queues. """
+
+    def __init__(self, source, stages, is_canceled=None, on_error=None):
+        self.source = source
+        self.stages = stages
+        self.is_canceled = is_canceled if is_canceled is not None else (lambda: False)
+        self.on_error = on_error
+
+    def queueDepths(self):
+        return {stage.name: stage.queue.qsize() for stage in self.stages}
+
+    def _put(self, stage_queue, item):
+        while True:
+            try:
+                stage_queue.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                if self.is_canceled():
+                    return False
+
+    def _feed(self):
+        first_stage = self.stages[0]
+        try:
+            for item in self.source:
+                if self.is_canceled() or not self._put(first_stage.queue, item):
+                    break
+        except Exception as e:
+            self._reportError("source", None, e)
+        for _ in range(first_stage.num_workers):
+            self._put(first_stage.queue, _DONE)
+
+    def _work(self, index):
+        stage = self.stages[index]
+        next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            try:
+                item = stage.queue.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                if self.is_canceled():
+                    break
+                continue
+            if item is _DONE:
+                break
+            if self.is_canceled():
+                continue
+            if stage.limit is not None and not stage.limit.acquire(self.is_canceled):
+                continue
+            try:
+                with tracing.span(stage.name, "stage"):
+                    result = stage.function(item)
+            except Exception as e:
+                self._reportError(stage.name, item, e)
+                continue
+            finally:
+                if stage.limit is not None:
+                    stage.limit.release()
+            if result is not None and next_stage is not None:
+                self._put(next_stage.queue, result)
+
+        with stage._lock:
+            stage._running -= 1
+            last_worker = stage._running == 0
+        if not last_worker:
+            return
+        if stage.finish is not None:
+            try:
+                stage.finish()
+            except Exception as e:
+                self._reportError(stage.name, None, e)
+        if next_stage is not None:
+            for _ in range(next_stage.num_workers):
+                self._put(next_stage.queue, _DONE)
+
+    def _reportError(self, stage_name, item, error):
+        if self.on_error is not None:
+            self.on_error(stage_name, item, error)
+        else:
+            print(f"Exception in {stage_name} stage for {item}:", error, file=sys.stderr)
+            traceback.print_exception(type(error), error, error.__traceback__)
+
+    def run(self):
+        """ Blocks until every item went through every stage or the pipeline was canceled. """
+        threads = [threading.Thread(target=self._feed, name="pipeline-source", daemon=True)]
+        for index, stage in enumerate(self.stages):
+            threads.extend(
+                threading.Thread(target=self._work, args=(index,), name=f"pipeline-{stage.name}-{worker}", daemon=True)
+                for worker in range(stage.num_workers))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
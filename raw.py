@@ -0,0 +1,158 @@
+import io
+import os
+import struct
+
+import exif
+
+RAW_TYPES = (".raf", ".dng")
+
+# Fuji RAF header: magic, then big endian offset and length of the embedded JPEG at bytes 84 and 88.
+_RAF_MAGIC = b"FUJIFILMCCD-RAW "
+_RAF_JPEG_POINTER = 84
+_RAF_HEADER_SIZE = 92
+
+_TIFF_MAGICS = (b"II*\x00", b"MM\x00*")
+# IFD0 and the Exif IFD of a DNG sit right after the TIFF header, ahead of the image data.
+_TIFF_HEAD_READ_SIZE = 256 * 1024
+
+_TAG_NEW_SUBFILE_TYPE = 0x00FE
+_TAG_COMPRESSION = 0x0103
+_TAG_STRIP_OFFSETS = 0x0111
+_TAG_STRIP_BYTE_COUNTS = 0x0117
+_TAG_SUB_IFDS = 0x014A
+_TAG_JPEG_OFFSET = 0x0201
+_TAG_JPEG_LENGTH = 0x0202
+
+# Old style and new style JPEG compression, NewSubFileType 1 marks a reduced resolution preview.
+_JPEG_COMPRESSIONS = (6, 7)
+_PREVIEW_SUBFILE = 1
+
+
+def isRaw(path):
+    return path.lower().endswith(RAW_TYPES)
+
+
+def _rafJpegRange(head):
+    if len(head) < _RAF_HEADER_SIZE or head[:len(_RAF_MAGIC)] != _RAF_MAGIC:
+        return None
+    return struct.unpack_from(">II", head, _RAF_JPEG_POINTER)
+
+
+def _tiffByteOrder(tiff):
+    if tiff[:4] == _TIFF_MAGICS[0]:
+        return "<"
+    if tiff[:4] == _TIFF_MAGICS[1]:
+        return ">"
+    return None
+
+
+def _entryLongs(tiff, entry, byte_order):
+    value_type, value_count, raw = entry
+    code = "H" if value_type == 3 else "I"
+    data = exif.entryData(tiff, entry, byte_order)
+    if len(data) < struct.calcsize(code) * value_count:
+        return []
+    return list(struct.unpack_from(f"{byte_order}{value_count}{code}", data))
+
+
+def _dngPreviewRange(tiff):
+    """ (offset, length) of the largest JPEG preview in IFD0 or its SubIFDs, None if there is none. """
+    byte_order = _tiffByteOrder(tiff)
+    if byte_order is None:
+        return None
+    (ifd0_offset,) = struct.unpack_from(byte_order + "I", tiff, 4)
+    ifd0 = exif.readIfd(tiff, ifd0_offset, byte_order)
+    ifds = [ifd0]
+    if _TAG_SUB_IFDS in ifd0:
+        ifds.extend(exif.readIfd(tiff, offset, byte_order) for offset in _entryLongs(tiff, ifd0[_TAG_SUB_IFDS], byte_order))
+    best = None
+    for ifd in ifds:
+        if _TAG_NEW_SUBFILE_TYPE not in ifd or _TAG_COMPRESSION not in ifd:
+            continue
+        # The raw data itself is often lossless JPEG too, only previews qualify.
+        if exif.entryLong(ifd[_TAG_NEW_SUBFILE_TYPE], byte_order) != _PREVIEW_SUBFILE or \
+                exif.entryLong(ifd[_TAG_COMPRESSION], byte_order) not in _JPEG_COMPRESSIONS:
+            continue
+        if _TAG_JPEG_OFFSET in ifd and _TAG_JPEG_LENGTH in ifd:
+            candidate = (exif.entryLong(ifd[_TAG_JPEG_OFFSET], byte_order),
+                         exif.entryLong(ifd[_TAG_JPEG_LENGTH], byte_order))
+        elif _TAG_STRIP_OFFSETS in ifd and _TAG_STRIP_BYTE_COUNTS in ifd:
+            offsets = _entryLongs(tiff, ifd[_TAG_STRIP_OFFSETS], byte_order)
+            counts = _entryLongs(tiff, ifd[_TAG_STRIP_BYTE_COUNTS], byte_order)
+            # A JPEG preview is written as a single strip.
+            if len(offsets) != 1 or len(counts) != 1:
+                continue
+            candidate = (offsets[0], counts[0])
+        else:
+            continue
+        if best is None or candidate[1] > best[1]:
+            best = candidate
+    return best
+
+
+def _readHead(path, data, size):
+    if data is not None:
+        return data
+    with open(path, "rb") as f:
+        return f.read(size)
+
+
+def readDateTimeOriginal(path, data=None):
+    """ Header-only read of the DateTimeOriginal of a RAF or DNG, like exif.readDateTimeOriginal for JPEGs. """
+    try:
+        head = _readHead(path, data, _TIFF_HEAD_READ_SIZE)
+        raf_range = _rafJpegRange(head)
+        if raf_range is not None:
+            # RAF keeps its Exif in the embedded JPEG.
+            if data is not None:
+                tiff = exif.readJpegExifBlock(io.BytesIO(data), raf_range[0])
+            else:
+                with open(path, "rb") as f:
+                    tiff = exif.readJpegExifBlock(f, raf_range[0])
+        elif _tiffByteOrder(head) is not None:
+            tiff = head
+        else:
+            return None
+        if tiff is None:
+            return None
+        return exif.parseTiffDateTimeOriginal(tiff)
+    except (OSError, struct.error):
+        return None
+
+
+def embeddedJpeg(path, data=None):
+    """ Returns the bytes of the JPEG preview embedded in a RAF or DNG, None if it has none.
+
+    Only the header and the preview are read, not the raw image data.
+    """
+    try:
+        head = _readHead(path, data, _TIFF_HEAD_READ_SIZE)
+        preview_range = _rafJpegRange(head)
+        if preview_range is None and _tiffByteOrder(head) is not None:
+            preview_range = _dngPreviewRange(head)
+    except struct.error:
+        return None
+    if preview_range is None or preview_range[1] == 0:
+        return None
+    offset, length = preview_range
+    if data is not None:
+        preview = bytes(data[offset:offset + length])
+    else:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            preview = f.read(length)
+    if len(preview) != length or preview[:2] != b"\xff\xd8":
+        return None
+    return preview
+
+
+def jpegSibling(path, names):
+    """ Name in names of the JPEG shot together with the RAW path, None if the RAW was shot alone.
+
+    names are the lower case file names of the RAW's folder.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0].lower()
+    for extension in (".jpg", ".jpeg"):
+        if stem + extension in names:
+            return stem + extension
+    return None
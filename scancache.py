@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+# Bump when the meaning of the cached columns changes so stale rows are dropped.
+_SCHEMA_VERSION = 2
+
+
+class ScanCache(object):
+    """ Persistent cache of resolved source dates, output names and quick fingerprints, keyed by path, size and mtime. """
+
+    def __init__(self, db_path, max_entries=50000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._dirty = {}
+        self._seen = set()
+        if self.enabled():
+            self._load()
+
+    def enabled(self):
+        return self.max_entries > 0
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        connection = sqlite3.connect(self.db_path)
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != _SCHEMA_VERSION:
+            connection.execute("DROP TABLE IF EXISTS files")
+            connection.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, "
+            "date_taken TEXT, jpg_name TEXT, compressed_name TEXT, quick TEXT, last_seen REAL)")
+        return connection
+
+    def _load(self):
+        try:
+            connection = self._connect()
+            try:
+                rows = connection.execute(
+                    "SELECT path, size, mtime_ns, date_taken, jpg_name, compressed_name, quick FROM files").fetchall()
+            finally:
+                connection.close()
+        except sqlite3.DatabaseError:
+            # A corrupt cache is only a lost speedup, start over.
+            self._reset()
+            rows = []
+        self._entries = {row[0]: row[1:] for row in rows}
+
+    def _reset(self):
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+
+    def get(self, path, stat_result):
+        """ Returns (date_taken, jpg_name, compressed_name, quick) if the file is unchanged since it was cached. """
+        entry = self._entries.get(path)
+        if entry is None or entry[0] != stat_result.st_size or entry[1] != stat_result.st_mtime_ns:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            self._seen.add(path)
+        return entry[2:]
+
+    def put(self, path, stat_result, date_taken, jpg_name, compressed_name, quick):
+        entry = (stat_result.st_size, stat_result.st_mtime_ns, date_taken, jpg_name, compressed_name, quick)
+        with self._lock:
+            self._entries[path] = entry
+            self._dirty[path] = entry
+
+    def save(self):
+        if not self.enabled():
+            return
+        with self._lock:
+            dirty = self._dirty
+            seen = self._seen
+            self._dirty = {}
+            self._seen = set()
+        now = time.time()
+        try:
+            connection = self._connect()
+            try:
+                with connection:
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        [(path,) + entry + (now,) for path, entry in dirty.items()])
+                    connection.executemany(
+                        "UPDATE files SET last_seen = ? WHERE path = ?",
+                        [(now, path) for path in seen if path not in dirty])
+                    # Evict the least recently seen files once the cache is over its cap.
+                    count = connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+                    if count > self.max_entries:
+                        connection.execute(
+                            "DELETE FROM files WHERE path IN "
+                            "(SELECT path FROM files ORDER BY last_seen ASC LIMIT ?)",
+                            (count - self.max_entries,))
+            finally:
+                connection.close()
+        except sqlite3.DatabaseError as e:
+            print(f"Warning: could not write scan cache {self.db_path}: {e}", file=sys.stderr)
+            self._reset()
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._dirty = {}
+            self._seen = set()
+        self._reset()
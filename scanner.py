@@ -0,0 +1,125 @@
+import os
+import threading
+
+import raw
+import tracing
+
+IMAGE = "image"
+RAW = "raw"
+MOVIE = "movie"
+
+# Lower case extension -> kind. Files with any other extension are left on the card.
+_EXTENSIONS = {}
+
+
+def registerType(extension, kind):
+    _EXTENSIONS[extension.lower()] = kind
+
+
+for _extension in (".jpg", ".jpeg"):
+    registerType(_extension, IMAGE)
+for _extension in raw.RAW_TYPES:
+    registerType(_extension, RAW)
+registerType(".mov", MOVIE)
+
+
+def classify(name):
+    """ Kind of the file called name, None for files that aren't imported. """
+    return _EXTENSIONS.get(os.path.splitext(name)[1].lower())
+
+
+class ScannedFile(object):
+    """ A card file found by the scanner, with the stat taken while listing its folder. """
+    __slots__ = ("path", "name", "kind", "stat", "inode")
+
+    def __init__(self, path, name, kind, stat_result, inode):
+        self.path = path
+        self.name = name
+        self.kind = kind
+        self.stat = stat_result
+        self.inode = inode
+
+
+def findImportLocations(path):
+    """ Returns the camera folders to import from a volume, its DCIM folder or a camera folder itself. """
+    if not os.path.isdir(path):
+        return []
+    if os.path.basename(os.path.normpath(path)) == "DCIM":
+        dcim = path
+    elif os.path.isdir(os.path.join(path, "DCIM")):
+        dcim = os.path.join(path, "DCIM")
+    else:
+        return [path]
+    with os.scandir(dcim) as entries:
+        return sorted(entry.path for entry in entries if entry.is_dir())
+
+
+def cardName(location):
+    """ Name shown for the card holding location, its volume name when it has a DCIM folder. """
+    parts = os.path.normpath(os.path.abspath(location)).split(os.sep)
+    if "DCIM" in parts[1:]:
+        return parts[parts.index("DCIM", 1) - 1] or os.sep
+    return os.path.basename(os.path.normpath(location)) or location
+
+
+def groupByDevice(import_locations):
+    """ Splits import locations into one list per device, in the order the devices first appear.
+
+    Each card in a reader is its own device, so each list can be read without slowing the others.
+    """
+    groups = {}
+    seen = set()
+    for location in import_locations:
+        if os.path.abspath(location) in seen:
+            continue
+        seen.add(os.path.abspath(location))
+        try:
+            device = os.stat(location).st_dev
+        except OSError:
+            device = location
+        groups.setdefault(device, []).append(location)
+    return list(groups.values())
+
+
+@tracing.traced(category="scan")
+def scanLocation(location):
+    """ Lists one camera folder with a single scandir, returns its ScannedFiles sorted by name. """
+    files = []
+    with os.scandir(location) as entries:
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            kind = classify(entry.name)
+            if kind is None or not entry.is_file():
+                continue
+            files.append(ScannedFile(entry.path, entry.name, kind, entry.stat(), entry.inode()))
+    files.sort(key=lambda scanned: scanned.name)
+    return files
+
+
+class VolumeScan(object):
+    """ The files of a set of import locations, each location listed once on first use.
+
+    The image and movie phases of an import both read from the same scan, so the card is only
+    listed once however many kinds are imported.
+    """
+
+    def __init__(self, import_locations):
+        self.import_locations = list(import_locations)
+        self._listings = {}
+        self._lock = threading.Lock()
+
+    def listLocation(self, location):
+        with self._lock:
+            if location not in self._listings:
+                self._listings[location] = scanLocation(location)
+            return self._listings[location]
+
+    def iterFiles(self, kinds, locations=None):
+        for location in self.import_locations if locations is None else locations:
+            for scanned in self.listLocation(location):
+                if scanned.kind in kinds:
+                    yield scanned
+
+    def files(self, kinds):
+        return list(self.iterFiles(kinds))
@@ -0,0 +1,139 @@
+import threading
+
+# How often a blocked submit wakes up to check for cancellation.
+_POLL_INTERVAL = 0.1
+
+
+class Canceled(Exception):
+    pass
+
+
+class CancelToken(object):
+    """ Cancel flag shared by every part of an import. Calling the token returns whether it is set,
+    so it can be passed wherever an is_canceled() callable is expected.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def isCanceled(self):
+        return self._event.is_set()
+
+    def __call__(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        """ Sleeps for up to timeout seconds, returning early with True if canceled. """
+        return self._event.wait(timeout)
+
+
+def runInterruptible(function, cancel, name):
+    """ Runs function() on its own thread, Ctrl-C calls cancel() and waits for function to return.
+
+    Returns True if Ctrl-C was pressed. The main thread waits on an event rather than joining, a
+    Thread.join interrupted by Ctrl-C can report a running thread as finished.
+    """
+    done = threading.Event()
+
+    def _run():
+        try:
+            function()
+        finally:
+            done.set()
+
+    thread = threading.Thread(target=_run, name=name)
+    thread.start()
+    interrupted = False
+    while not done.is_set():
+        try:
+            done.wait(_POLL_INTERVAL)
+        except KeyboardInterrupt:
+            interrupted = True
+            cancel()
+    thread.join()
+    return interrupted
+
+
+class BoundedExecutor(object):
+    """ Submits to executor while keeping at most max_in_flight tasks queued or running.
+
+    submit() blocks while the limit is reached, so a producer never piles up more than a few
+    tasks ahead of the workers, and raises Canceled as soon as is_canceled() turns true.
+    """
+
+    def __init__(self, executor, max_in_flight, is_canceled=None):
+        self.executor = executor
+        self.is_canceled = is_canceled if is_canceled is not None else (lambda: False)
+        self._slots = threading.BoundedSemaphore(max(1, max_in_flight))
+
+    def submit(self, function, *args, **kwargs):
+        while not self._slots.acquire(timeout=_POLL_INTERVAL):
+            if self.is_canceled():
+                raise Canceled()
+        if self.is_canceled():
+            self._slots.release()
+            raise Canceled()
+        try:
+            future = self.executor.submit(function, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self, wait=True):
+        # Queued tasks that haven't started are dropped when canceled.
+        self.executor.shutdown(wait=wait, cancel_futures=self.is_canceled())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+
+
+class ConcurrencyLimit(object):
+    """ Semaphore whose size can be changed while workers hold it, used to tune a pool at run time. """
+
+    def __init__(self, limit):
+        self.limit = max(1, limit)
+        self.active = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, is_canceled=None):
+        """ Waits for a free slot, returns False instead if is_canceled() turns true first. """
+        with self._condition:
+            while self.active >= self.limit:
+                self._condition.wait(_POLL_INTERVAL)
+                if is_canceled is not None and is_canceled():
+                    return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+    def setLimit(self, limit):
+        with self._condition:
+            self.limit = max(1, limit)
+            self._condition.notify_all()
+
+
+class LimitGroup(object):
+    """ ConcurrencyLimits that are always set together, like the readers of every card in an import. """
+
+    def __init__(self, limits):
+        self.limits = list(limits)
+
+    @property
+    def limit(self):
+        return self.limits[0].limit
+
+    def setLimit(self, limit):
+        for concurrency_limit in self.limits:
+            concurrency_limit.setLimit(limit)
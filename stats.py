@@ -0,0 +1,172 @@
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+STAGES = ("scan", "resolve", "read", "write", "compress", "verify", "stamp", "movies")
+
+
+class _StageStats(object):
+
+    def __init__(self):
+        self.files = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.busy_seconds = 0.0
+        self.first_start = None
+        self.last_end = None
+
+    def snapshot(self, now):
+        # Throughput over the stage's active window, so concurrent workers add up.
+        window = 0.0
+        if self.first_start is not None:
+            window = (self.last_end if self.last_end is not None else now) - self.first_start
+        moved = max(self.bytes_read, self.bytes_written)
+        return {
+            "files": self.files,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "busy_seconds": round(self.busy_seconds, 4),
+            "wall_seconds": round(window, 4),
+            "mb_per_s": round(moved / window / 1e6, 3) if window > 0 else 0.0,
+            "files_per_s": round(self.files / window, 3) if window > 0 else 0.0,
+        }
+
+
+class _Measurement(object):
+
+    def __init__(self):
+        self.files = 1
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+
+class ImportStats(object):
+    """ Thread safe counters for one import, turned into throughput, queue depth and ETA figures. """
+
+    def __init__(self):
+        self.start_time = time.time()
+        self.end_time = None
+        self.files_total = 0
+        self.files_done = 0
+        self.bytes_total = 0
+        self.bytes_done = 0
+        self.queue_depths = {}
+        self.counters = {}
+        self.stages = {name: _StageStats() for name in STAGES}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, stage):
+        """ Times the block as busy time of stage, the yielded object takes the files and bytes it moved. """
+        measurement = _Measurement()
+        start = time.time()
+        try:
+            yield measurement
+        finally:
+            self.record(stage, start, time.time(), measurement.files,
+                        measurement.bytes_read, measurement.bytes_written)
+
+    def record(self, stage, start, end, files=1, bytes_read=0, bytes_written=0):
+        with self._lock:
+            stage_stats = self.stages[stage]
+            stage_stats.files += files
+            stage_stats.bytes_read += bytes_read
+            stage_stats.bytes_written += bytes_written
+            stage_stats.busy_seconds += end - start
+            if stage_stats.first_start is None or start < stage_stats.first_start:
+                stage_stats.first_start = start
+            if stage_stats.last_end is None or end > stage_stats.last_end:
+                stage_stats.last_end = end
+
+    def addBytes(self, stage, bytes_read=0, bytes_written=0):
+        # For stages that stream, like movie copies, where per chunk timing isn't worth recording.
+        now = time.time()
+        with self._lock:
+            stage_stats = self.stages[stage]
+            stage_stats.bytes_read += bytes_read
+            stage_stats.bytes_written += bytes_written
+            if stage_stats.first_start is None:
+                stage_stats.first_start = now
+            stage_stats.last_end = now
+
+    def addTotals(self, files=0, num_bytes=0):
+        with self._lock:
+            self.files_total += files
+            self.bytes_total += num_bytes
+
+    def addDone(self, files=0, num_bytes=0):
+        with self._lock:
+            self.files_done += files
+            self.bytes_done += num_bytes
+
+    def addCount(self, name, count=1):
+        # Free form tallies such as skipped duplicates.
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + count
+
+    def setQueueDepth(self, name, depth):
+        with self._lock:
+            self.queue_depths[name] = depth
+
+    def finish(self):
+        self.end_time = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            now = self.end_time if self.end_time is not None else time.time()
+            elapsed = now - self.start_time
+            files_per_s = self.files_done / elapsed if elapsed > 0 else 0.0
+            bytes_per_s = self.bytes_done / elapsed if elapsed > 0 else 0.0
+            # Bytes give a steadier estimate when movies are part of the import.
+            if self.bytes_total > 0 and bytes_per_s > 0:
+                eta = max(0, self.bytes_total - self.bytes_done) / bytes_per_s
+            elif files_per_s > 0:
+                eta = max(0, self.files_total - self.files_done) / files_per_s
+            else:
+                eta = None
+            return {
+                "elapsed_seconds": round(elapsed, 3),
+                "files_total": self.files_total,
+                "files_done": self.files_done,
+                "bytes_total": self.bytes_total,
+                "bytes_done": self.bytes_done,
+                "files_per_s": round(files_per_s, 3),
+                "mb_per_s": round(bytes_per_s / 1e6, 3),
+                "eta_seconds": round(eta, 1) if eta is not None else None,
+                "queue_depths": dict(self.queue_depths),
+                "counters": dict(self.counters),
+                "stages": {name: stage_stats.snapshot(now) for name, stage_stats in self.stages.items()},
+            }
+
+    def writeSummary(self, output_dir, **extra):
+        """ Writes the final snapshot with machine details as JSON, returns its path. """
+        os.makedirs(output_dir, exist_ok=True)
+        summary = {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.start_time)),
+            "machine": {
+                "hostname": platform.node(),
+                "platform": platform.platform(),
+                "machine": platform.machine(),
+                "cpu_count": os.cpu_count(),
+                "python": sys.version.split()[0],
+            },
+        }
+        summary.update(extra)
+        summary["stats"] = self.snapshot()
+        name = time.strftime("import-%Y%m%d-%H%M%S", time.localtime(self.start_time))
+        path = os.path.join(output_dir, f"{name}-{int(self.start_time * 1000) % 1000:03d}.json")
+        with open(path, "w") as f:
+            json.dump(summary, f, indent=2)
+        return path
+
+
+def formatEta(seconds):
+    if seconds is None:
+        return "--:--"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
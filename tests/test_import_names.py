@@ -0,0 +1,53 @@
+import glob
+import os
+
+import core
+import synthetic_card
+
+
+def _makeCards(root):
+    # The same frame numbers and dates on both cards, the images differ.
+    synthetic_card.makeCard(os.path.join(root, "jpg_card"), 1, 3, 0, image_size=(64, 48), variants=3)
+    synthetic_card.makeCard(os.path.join(root, "raw_card"), 1, 3, 0, image_size=(64, 48), variants=3,
+                            raws="only", raw_size=64 * 1024)
+
+
+def _import(library, cards):
+    for folder in ("JPG", "Compressed"):
+        os.makedirs(os.path.join(library, folder), exist_ok=True)
+    import_locations = [location for card in cards for location in core.scanner.findImportLocations(card)]
+    engine = core.ImportEngine(library, import_locations, True, False, 80, checksums=False)
+    import_plan = engine.plan()
+    engine.run()
+    return import_plan
+
+
+def _names(library, folder):
+    return sorted(os.path.basename(path) for path in glob.glob(os.path.join(library, folder, "*", "*")))
+
+
+def _checkBothImported(library):
+    assert _names(library, "JPG") == [
+        "2024_06_01_1000001-2.RAF", "2024_06_01_1000001.JPG",
+        "2024_06_01_1000002-2.RAF", "2024_06_01_1000002.JPG",
+        "2024_06_01_1000003-2.RAF", "2024_06_01_1000003.JPG"]
+    assert _names(library, "Compressed") == [
+        "2024_06_01_1000001-2c.jpg", "2024_06_01_1000001c.jpg",
+        "2024_06_01_1000002-2c.jpg", "2024_06_01_1000002c.jpg",
+        "2024_06_01_1000003-2c.jpg", "2024_06_01_1000003c.jpg"]
+
+
+def test_raw_only_card_after_jpeg_card(tmp_path):
+    _makeCards(str(tmp_path))
+    library = str(tmp_path / "library")
+    _import(library, [str(tmp_path / "jpg_card")])
+    import_plan = _import(library, [str(tmp_path / "raw_card")])
+    assert import_plan.cards[0]["new"] == 3
+    _checkBothImported(library)
+
+
+def test_raw_only_and_jpeg_cards_in_one_run(tmp_path):
+    _makeCards(str(tmp_path))
+    library = str(tmp_path / "library")
+    _import(library, [str(tmp_path / "jpg_card"), str(tmp_path / "raw_card")])
+    _checkBothImported(library)
@@ -0,0 +1,49 @@
+import datetime
+import os
+
+import organize
+import synthetic_card
+
+DATE = datetime.datetime(2024, 6, 1, 9, 0, 0)
+
+
+def _makeJpeg(path, seed=0):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    synthetic_card.makeJpeg(path, (64, 48), DATE, pixels=synthetic_card._encodePixels((64, 48), 90, seed))
+
+
+def _files(root):
+    return sorted(os.path.relpath(os.path.join(folder, name), root)
+                  for folder, dirs, names in os.walk(root) for name in names)
+
+
+def test_library_inside_source_is_left_alone(tmp_path):
+    source = str(tmp_path / "Pictures")
+    library = os.path.join(source, "PhotoImportLibrary")
+    os.makedirs(os.path.join(library, ".photoimporter"))
+    _makeJpeg(os.path.join(library, "JPG", "2024_06_01", "2024_06_01_1000001.JPG"), 0)
+    _makeJpeg(os.path.join(library, "Compressed", "2024_06_01", "2024_06_01_1000001c.jpg"), 1)
+    _makeJpeg(os.path.join(library, "Holiday", "DSCF0002.JPG"), 2)
+    library_files = _files(library)
+    _makeJpeg(os.path.join(source, "Old", "DSCF0003.JPG"), 3)
+
+    engine = organize.OrganizeEngine(source)
+    engine.run()
+
+    assert _files(library) == library_files
+    assert os.path.exists(os.path.join(source, "2024_06_01", "2024_06_01_0003.JPG"))
+    assert engine.counts["failed"] == 0
+
+
+def test_filed_files_stay_in_place(tmp_path):
+    source = str(tmp_path / "Photos")
+    filed = os.path.join(source, "Trips", "2024_06_01", "2024_06_01_0001.JPG")
+    _makeJpeg(filed)
+    os.makedirs(str(tmp_path / "Sorted"))
+
+    engine = organize.OrganizeEngine(source, str(tmp_path / "Sorted"))
+    engine.run()
+
+    assert os.path.exists(filed)
+    assert engine.counts["filed"] == 1
+    assert _files(str(tmp_path / "Sorted")) == []
@@ -0,0 +1,117 @@
+import ctypes
+import ctypes.util
+import datetime
+import os
+import sys
+
+import tracing
+
+
+def dateTakenToTimestamp(date_taken):
+    """ Converts a '%Y/%m/%d %H:%M:%S' local capture date into a POSIX timestamp. """
+    return datetime.datetime.strptime(date_taken, '%Y/%m/%d %H:%M:%S').timestamp()
+
+
+class _AttrList(ctypes.Structure):
+    _fields_ = [
+        ("bitmapcount", ctypes.c_ushort),
+        ("reserved", ctypes.c_uint16),
+        ("commonattr", ctypes.c_uint32),
+        ("volattr", ctypes.c_uint32),
+        ("dirattr", ctypes.c_uint32),
+        ("fileattr", ctypes.c_uint32),
+        ("forkattr", ctypes.c_uint32),
+    ]
+
+
+class _Timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+
+_ATTR_BIT_MAP_COUNT = 5
+_ATTR_CMN_CRTIME = 0x00000200
+
+
+def _loadSetattrlist():
+    if sys.platform != "darwin":
+        return None
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    function = libc.setattrlist
+    function.argtypes = [ctypes.c_char_p, ctypes.POINTER(_AttrList), ctypes.c_void_p, ctypes.c_size_t, ctypes.c_ulong]
+    function.restype = ctypes.c_int
+    return function
+
+
+_setattrlist = _loadSetattrlist()
+
+
+def _setCreationTimeDarwin(path, timestamp):
+    attr_list = _AttrList(bitmapcount=_ATTR_BIT_MAP_COUNT, commonattr=_ATTR_CMN_CRTIME)
+    seconds = int(timestamp)
+    value = _Timespec(seconds, int((timestamp - seconds) * 1e9))
+    if _setattrlist(os.fsencode(path), ctypes.byref(attr_list), ctypes.byref(value), ctypes.sizeof(value), 0) != 0:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error), path)
+
+
+def _loadKernel32():
+    if sys.platform != "win32":
+        return None
+    from ctypes import wintypes
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    # Without these ctypes passes and returns a C int, which truncates a 64-bit HANDLE.
+    kernel32.CreateFileW.argtypes = [wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD, wintypes.LPVOID,
+                                     wintypes.DWORD, wintypes.DWORD, wintypes.HANDLE]
+    kernel32.CreateFileW.restype = wintypes.HANDLE
+    kernel32.SetFileTime.argtypes = [wintypes.HANDLE, ctypes.POINTER(wintypes.FILETIME),
+                                     ctypes.POINTER(wintypes.FILETIME), ctypes.POINTER(wintypes.FILETIME)]
+    kernel32.SetFileTime.restype = wintypes.BOOL
+    kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+    kernel32.CloseHandle.restype = wintypes.BOOL
+    return kernel32
+
+
+_kernel32 = _loadKernel32()
+
+_FILE_WRITE_ATTRIBUTES = 0x100
+_OPEN_EXISTING = 3
+_FILE_ATTRIBUTE_NORMAL = 0x80
+_INVALID_HANDLE_VALUE = ctypes.c_void_p(-1).value
+
+
+def _setCreationTimeWindows(path, timestamp):
+    from ctypes import wintypes
+    # FILETIME counts 100ns intervals since 1601-01-01.
+    intervals = int((timestamp + 11644473600) * 10000000)
+    creation_time = wintypes.FILETIME(intervals & 0xFFFFFFFF, intervals >> 32)
+    handle = _kernel32.CreateFileW(path, _FILE_WRITE_ATTRIBUTES, 0, None, _OPEN_EXISTING, _FILE_ATTRIBUTE_NORMAL, None)
+    if handle is None or handle == _INVALID_HANDLE_VALUE:
+        raise ctypes.WinError(ctypes.get_last_error())
+    try:
+        if not _kernel32.SetFileTime(handle, ctypes.byref(creation_time), None, None):
+            raise ctypes.WinError(ctypes.get_last_error())
+    finally:
+        _kernel32.CloseHandle(handle)
+
+
+def setFileTimes(path, timestamp):
+    """ Sets modification, access and, where the platform allows it, creation time of path. """
+    os.utime(path, (timestamp, timestamp))
+    if _setattrlist is not None:
+        _setCreationTimeDarwin(path, timestamp)
+    elif _kernel32 is not None:
+        _setCreationTimeWindows(path, timestamp)
+    # Linux has no API to set a file's birth time, the modification time carries the date there.
+
+
+@tracing.traced(category="stamp")
+def stampFiles(files):
+    """ Applies setFileTimes to a batch of (path, date_taken) pairs, returns the paths that failed. """
+    failed = []
+    for path, date_taken in files:
+        try:
+            setFileTimes(path, dateTakenToTimestamp(date_taken))
+        except OSError as e:
+            print(f"Warning: could not set timestamps on {path}: {e}", file=sys.stderr)
+            failed.append(path)
+    return failed
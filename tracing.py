@@ -0,0 +1,192 @@
+import cProfile
+import functools
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+
+# The running Tracer, None while tracing is off so spans cost one global lookup.
+_tracer = None
+
+
+class Tracer(object):
+    """ Collects timed spans from every thread and writes them as a Chrome trace.
+
+    The trace opens in chrome://tracing or https://ui.perfetto.dev with one row per thread.
+    """
+
+    def __init__(self):
+        self.start_ns = time.perf_counter_ns()
+        self.pid = os.getpid()
+        # (name, category, start_ns, end_ns, thread id), list.append is atomic across threads.
+        self.spans = []
+        self.thread_names = {}
+
+    def record(self, name, category, start_ns, end_ns):
+        thread_id = threading.get_ident()
+        if thread_id not in self.thread_names:
+            self.thread_names[thread_id] = threading.current_thread().name
+        self.spans.append((name, category, start_ns, end_ns, thread_id))
+
+    def chromeTrace(self):
+        events = [{"name": "thread_name", "ph": "M", "pid": self.pid, "tid": thread_id, "args": {"name": name}}
+                  for thread_id, name in self.thread_names.items()]
+        events.extend({
+            "name": name, "cat": category, "ph": "X", "pid": self.pid, "tid": thread_id,
+            "ts": (start_ns - self.start_ns) / 1000.0, "dur": (end_ns - start_ns) / 1000.0,
+        } for name, category, start_ns, end_ns, thread_id in list(self.spans))
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def summary(self):
+        """ Returns {name: {calls, total_seconds, mean_ms, max_ms, threads}}, slowest total first. """
+        totals = {}
+        for name, category, start_ns, end_ns, thread_id in list(self.spans):
+            entry = totals.setdefault(name, [0, 0, 0, set()])
+            entry[0] += 1
+            entry[1] += end_ns - start_ns
+            entry[2] = max(entry[2], end_ns - start_ns)
+            entry[3].add(thread_id)
+        return {name: {"calls": calls, "total_seconds": round(total_ns / 1e9, 4),
+                       "mean_ms": round(total_ns / calls / 1e6, 3), "max_ms": round(max_ns / 1e6, 3),
+                       "threads": len(threads)}
+                for name, (calls, total_ns, max_ns, threads) in
+                sorted(totals.items(), key=lambda item: item[1][1], reverse=True)}
+
+    def write(self, path):
+        """ Writes the Chrome trace to path and the summary table next to it, returns the summary path. """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.chromeTrace(), f)
+        summary_path = os.path.splitext(path)[0] + ".summary.txt"
+        with open(summary_path, "w") as f:
+            f.write(formatSummary(self.summary()) + "\n")
+        return summary_path
+
+
+def formatSummary(summary):
+    lines = [f"{'span':<24} {'calls':>8} {'total s':>9} {'mean ms':>9} {'max ms':>9} {'threads':>7}"]
+    for name, entry in summary.items():
+        lines.append(f"{name:<24} {entry['calls']:>8} {entry['total_seconds']:>9.3f} {entry['mean_ms']:>9.3f} "
+                     f"{entry['max_ms']:>9.3f} {entry['threads']:>7}")
+    return "\n".join(lines)
+
+
+def start():
+    """ Starts recording spans, returns the Tracer. """
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def stop():
+    """ Stops recording, returns the Tracer that was running or None. """
+    global _tracer
+    tracer = _tracer
+    _tracer = None
+    return tracer
+
+
+class _Span(object):
+    __slots__ = ("tracer", "name", "category", "start_ns")
+
+    def __init__(self, tracer, name, category):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.record(self.name, self.category, self.start_ns, time.perf_counter_ns())
+        return False
+
+
+class _NoSpan(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name, category="import"):
+    """ Context manager timing its block as name, does nothing while tracing is off. """
+    tracer = _tracer
+    if tracer is None:
+        return _NO_SPAN
+    return _Span(tracer, name, category)
+
+
+def traced(name=None, category="import"):
+    """ Decorator timing every call of a function as a span, named after the function by default. """
+
+    def _decorate(function):
+        span_name = name or function.__name__
+
+        @functools.wraps(function)
+        def _traced(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return function(*args, **kwargs)
+            start_ns = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                tracer.record(span_name, category, start_ns, time.perf_counter_ns())
+        return _traced
+    return _decorate
+
+
+class ThreadProfiler(object):
+    """ cProfile across threads: one profile per thread, merged when the stats are written.
+
+    cProfile only sees the thread that enabled it, so every thread started while the profiler runs
+    enables its own profile on its first call. Threads started elsewhere, like a QThread, join by
+    calling addCurrentThread().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._profiles = {}
+
+    def addCurrentThread(self):
+        thread_id = threading.get_ident()
+        with self._lock:
+            if thread_id in self._profiles:
+                return
+            profile = cProfile.Profile()
+            self._profiles[thread_id] = profile
+        profile.enable()
+
+    def _bootstrap(self, *args):
+        # Runs as the new thread's profile function once, cProfile then takes over.
+        sys.setprofile(None)
+        self.addCurrentThread()
+
+    def start(self):
+        threading.setprofile(self._bootstrap)
+        self.addCurrentThread()
+
+    def stop(self):
+        threading.setprofile(None)
+        with self._lock:
+            profile = self._profiles.get(threading.get_ident())
+        if profile is not None:
+            profile.disable()
+
+    def write(self, path):
+        """ Writes the merged stats to path in the pstats format, for python -m pstats or snakeviz. """
+        with self._lock:
+            profiles = list(self._profiles.values())
+        stats = pstats.Stats(*profiles)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        stats.dump_stats(path)
+        return stats
@@ -0,0 +1,68 @@
+import os
+import time
+
+# Where macOS (/Volumes) and Linux desktops (/media/<user>, /run/media/<user>) mount removable volumes.
+MOUNT_ROOTS = ("/Volumes", "/media", "/run/media")
+
+DEFAULT_INTERVAL = 2.0
+
+
+def isCard(path):
+    return os.path.isdir(os.path.join(path, "DCIM"))
+
+
+def _listDirs(path):
+    try:
+        with os.scandir(path) as entries:
+            return sorted(entry.path for entry in entries if not entry.name.startswith(".") and entry.is_dir())
+    except OSError:
+        return []
+
+
+def listVolumes(roots=MOUNT_ROOTS):
+    """ Mounted volumes under roots, including the per user folders Linux mounts them in. """
+    volumes = []
+    for root in roots:
+        for path in _listDirs(root):
+            if isCard(path) or root == "/Volumes":
+                volumes.append(path)
+                continue
+            # /media/<user>/<volume>, or a volume mounted directly in /media without a DCIM folder.
+            user_volumes = _listDirs(path)
+            volumes.extend(user_volumes if len(user_volumes) > 0 else [path])
+    return volumes
+
+
+def findCards(roots=MOUNT_ROOTS):
+    """ Mounted volumes that hold a DCIM folder. """
+    return [volume for volume in listVolumes(roots) if isCard(volume)]
+
+
+class CardWatcher(object):
+    """ Polls the mount roots for camera cards, reporting the ones that were inserted or removed.
+
+    Polling a handful of folders every few seconds is cheap and works the same for every kind of
+    mount, where file system events differ between macOS, udisks and plain fstab mounts.
+    """
+
+    def __init__(self, roots=MOUNT_ROOTS, interval=DEFAULT_INTERVAL):
+        self.roots = tuple(roots)
+        self.interval = interval
+        self.cards = set()
+
+    def poll(self):
+        """ Returns (inserted, removed), the cards that appeared and went away since the last poll. """
+        current = set(findCards(self.roots))
+        inserted = sorted(current - self.cards)
+        removed = sorted(self.cards - current)
+        self.cards = current
+        return inserted, removed
+
+    def wait(self, is_canceled=None):
+        """ Blocks until cards are inserted and returns them, or [] if is_canceled() turns true first. """
+        while is_canceled is None or not is_canceled():
+            inserted, removed = self.poll()
+            if len(inserted) > 0:
+                return inserted
+            time.sleep(self.interval)
+        return []